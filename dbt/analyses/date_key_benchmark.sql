@@ -0,0 +1,22 @@
+{#
+    Date Key Benchmark
+    ==================
+    Compares string-formatted date keys with the date_key() macro over the
+    sales order lines (the largest fact input). Both queries also check that
+    the keys are identical.
+
+    Compile, then run the two statements with timing enabled:
+        dbt compile --select date_key_benchmark
+        psql -h localhost -U postgres -d data_warehouse \
+            -c '\timing on' -f target/compiled/data_warehouse/analyses/date_key_benchmark.sql
+#}
+
+-- Before: to_char() per row
+select count(*), sum(cast(to_char(soh.orderdate, 'YYYYMMDD') as integer)::bigint) as key_checksum
+from {{ ref('stg_salesorderdetail') }} sod
+join {{ ref('stg_salesorderheader') }} soh on soh.salesorderid = sod.salesorderid;
+
+-- After: date_key() macro
+select count(*), sum({{ date_key('soh.orderdate') }}::bigint) as key_checksum
+from {{ ref('stg_salesorderdetail') }} sod
+join {{ ref('stg_salesorderheader') }} soh on soh.salesorderid = sod.salesorderid;
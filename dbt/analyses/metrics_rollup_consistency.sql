@@ -0,0 +1,79 @@
+{#
+    Metrics Rollup Consistency
+    ==========================
+    Compares the incremental rollups with what a full refresh would build.
+    Each row of the result is a rollup row that exists on only one side
+    (side = 'incremental only' or 'full refresh only'); an empty result means
+    the incremental runs and a full refresh agree.
+
+    1. mart_metrics_daily vs fact_metric_values aggregated from scratch
+    2. mart_metrics_monthly vs mart_metrics_daily aggregated from scratch
+
+    Run after a regular (incremental) run, e.g. after new source data was loaded:
+        ./run_dbt.sh run --select mart_metrics_daily mart_metrics_monthly
+        dbt compile --select metrics_rollup_consistency
+        psql -h localhost -U postgres -d data_warehouse \
+            -f target/compiled/data_warehouse/analyses/metrics_rollup_consistency.sql
+#}
+
+with daily_full as (
+    select
+        fmv.date_key,
+        dm.metric_key,
+        fmv.product_key,
+        fmv.employee_key,
+        fmv.territory_key,
+        fmv.vendor_key,
+        fmv.location_key,
+        sum(fmv.metric_value) as metric_sum,
+        count(*) as metric_count,
+        min(fmv.metric_value) as metric_min,
+        max(fmv.metric_value) as metric_max
+    from {{ ref('fact_metric_values') }} fmv
+    join {{ ref('dim_metric') }} dm on fmv.metric_id = dm.metric_id
+    group by 1, 2, 3, 4, 5, 6, 7
+),
+
+daily_incremental as (
+    select
+        date_key, metric_key, product_key, employee_key, territory_key, vendor_key, location_key,
+        metric_sum, metric_count, metric_min, metric_max
+    from {{ ref('mart_metrics_daily') }}
+),
+
+monthly_full as (
+    select
+        date_key / 100 as month_key,
+        metric_key,
+        product_key,
+        employee_key,
+        territory_key,
+        vendor_key,
+        location_key,
+        sum(metric_sum) as metric_sum,
+        sum(metric_count) as metric_count,
+        min(metric_min) as metric_min,
+        max(metric_max) as metric_max
+    from daily_full
+    group by 1, 2, 3, 4, 5, 6, 7
+),
+
+monthly_incremental as (
+    select
+        month_key, metric_key, product_key, employee_key, territory_key, vendor_key, location_key,
+        metric_sum, metric_count, metric_min, metric_max
+    from {{ ref('mart_metrics_monthly') }}
+)
+
+select 'mart_metrics_daily' as rollup, 'incremental only' as side, date_key as period_key, metric_key, metric_sum, metric_count
+from (select * from daily_incremental except all select * from daily_full) d
+union all
+select 'mart_metrics_daily', 'full refresh only', date_key, metric_key, metric_sum, metric_count
+from (select * from daily_full except all select * from daily_incremental) d
+union all
+select 'mart_metrics_monthly', 'incremental only', month_key, metric_key, metric_sum, metric_count
+from (select * from monthly_incremental except all select * from monthly_full) m
+union all
+select 'mart_metrics_monthly', 'full refresh only', month_key, metric_key, metric_sum, metric_count
+from (select * from monthly_full except all select * from monthly_incremental) m
+order by rollup, period_key, metric_key, side;
@@ -0,0 +1,40 @@
+{#
+    Metrics Serving Layer Benchmark
+    ===============================
+    Storage and query time of the metrics serving layer.
+
+    1. Sizes: the narrow fact and dictionaries vs the tall fact they encode.
+       (Before this layer, mart_metrics was a table about the size of
+       fact_global_metrics plus the dim_metric text on every row; record its
+       size on the old build with the same query to compare.)
+    2. A typical AI query through the mart_metrics view and against the narrow fact.
+
+    Compile, then run with timing enabled:
+        dbt compile --select metrics_serving_benchmark
+        psql -h localhost -U postgres -d data_warehouse \
+            -c '\timing on' -f target/compiled/data_warehouse/analyses/metrics_serving_benchmark.sql
+#}
+
+select
+    relname as relation,
+    pg_size_pretty(pg_total_relation_size(c.oid)) as total_size,
+    pg_total_relation_size(c.oid) as total_bytes,
+    reltuples::bigint as estimated_rows
+from pg_class c
+join pg_namespace n on n.oid = c.relnamespace
+where n.nspname = '{{ target.schema }}'
+  and relname in ('fact_global_metrics', 'fact_metric_values', 'dim_metric', 'dim_metric_attributes', 'mart_metrics')
+order by total_bytes desc;
+
+-- Monthly revenue by territory through the compatibility view
+select territory_key, date_key / 100 as month_key, sum(metric_value) as revenue
+from {{ ref('mart_metrics') }}
+where metric_name = 'Sales Order Revenue'
+group by 1, 2;
+
+-- Same query on the narrow fact
+select fmv.territory_key, fmv.date_key / 100 as month_key, sum(fmv.metric_value) as revenue
+from {{ ref('fact_metric_values') }} fmv
+join {{ ref('dim_metric') }} dm on fmv.metric_id = dm.metric_id
+where dm.metric_name = 'Sales Order Revenue'
+group by 1, 2;
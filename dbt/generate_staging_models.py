@@ -1,58 +1,158 @@
 #!/usr/bin/env python3
 """
 Generate staging dbt models and YAML schema files for all tables in public schema
+
+The whole column catalog is read with one query, over a direct psycopg2
+connection (DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD, same defaults as
+the Streamlit app) or, if that is not available, one `docker exec ... psql`.
+Models are rendered in memory and written concurrently.
+
+Regeneration is incremental: .staging_manifest.json keeps a content hash per
+table, so only models whose columns changed are rewritten (file mtimes and dbt
+partial parsing stay untouched otherwise), and the models of dropped tables
+are deleted.
+
+Usage:
+    python generate_staging_models.py            # write changed models only
+    python generate_staging_models.py --dry-run  # print the diff summary only
+    python generate_staging_models.py --force    # rewrite every model
 """
+import argparse
+import hashlib
+import json
 import subprocess
 import os
 import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
 
 # Paths
 STAGING_DIR = "models/staging"
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 STAGING_PATH = os.path.join(PROJECT_ROOT, STAGING_DIR)
+MANIFEST_PATH = os.path.join(PROJECT_ROOT, ".staging_manifest.json")
+
+DOCKER_CONTAINER = "data_warehouse_postgres"
+WRITE_WORKERS = 16
+FIELD_SEPARATOR = "\x1f"
 
 # Create staging directory
 os.makedirs(STAGING_PATH, exist_ok=True)
 
-def get_tables():
-    """Get list of all tables from public schema"""
-    result = subprocess.run(
-        [
-            "docker", "exec", "data_warehouse_postgres",
-            "psql", "-U", "postgres", "-d", "data_warehouse",
-            "-tAc", 
-            "SELECT table_name FROM information_schema.tables WHERE table_schema = 'public' AND table_type = 'BASE TABLE' ORDER BY table_name;"
-        ],
-        capture_output=True,
-        text=True
-    )
-    tables = [line.strip() for line in result.stdout.strip().split('\n') if line.strip()]
-    return tables
+CATALOG_QUERY = """
+SELECT c.table_name, c.column_name, c.data_type, c.is_nullable
+FROM information_schema.columns c
+JOIN information_schema.tables t
+  ON t.table_schema = c.table_schema AND t.table_name = c.table_name
+WHERE c.table_schema = 'public'
+  AND t.table_type = 'BASE TABLE'
+  AND c.column_name NOT LIKE '\\_airbyte%'
+ORDER BY c.table_name, c.ordinal_position
+"""
 
-def get_columns(table_name):
-    """Get column information for a table"""
+
+def fetch_catalog_psycopg2():
+    """Read the column catalog over a direct connection (None if unavailable)"""
+    if psycopg2 is None:
+        return None
+    try:
+        conn = psycopg2.connect(
+            host=os.getenv("DB_HOST", "localhost"),
+            port=os.getenv("DB_PORT", "5432"),
+            dbname=os.getenv("DB_NAME", "data_warehouse"),
+            user=os.getenv("DB_USER", "postgres"),
+            password=os.getenv("DB_PASSWORD", "postgres"),
+            connect_timeout=5,
+        )
+    except psycopg2.OperationalError as e:
+        print(f"⚠️  Direct connection failed ({str(e).strip()}), falling back to docker exec")
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute(CATALOG_QUERY)
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def fetch_catalog_docker():
+    """Read the column catalog with a single psql call inside the container"""
     result = subprocess.run(
         [
-            "docker", "exec", "data_warehouse_postgres",
+            "docker", "exec", DOCKER_CONTAINER,
             "psql", "-U", "postgres", "-d", "data_warehouse",
-            "-tAc",
-            f"SELECT column_name, data_type, is_nullable FROM information_schema.columns WHERE table_schema = 'public' AND table_name = '{table_name}' AND column_name NOT LIKE '_airbyte%' ORDER BY ordinal_position;"
+            "-tA", "-F", FIELD_SEPARATOR, "-c", CATALOG_QUERY
         ],
         capture_output=True,
         text=True
     )
-    
-    columns = []
-    for line in result.stdout.strip().split('\n'):
+    if result.returncode != 0:
+        raise RuntimeError(f"psql failed: {result.stderr.strip()}")
+    rows = []
+    for line in result.stdout.split('\n'):
         if line.strip():
-            parts = [p.strip() for p in line.split('|')]
-            if len(parts) >= 2:
-                columns.append({
-                    'name': parts[0],
-                    'data_type': parts[1],
-                    'nullable': parts[2] if len(parts) > 2 else 'YES'
-                })
-    return columns
+            parts = [p.strip() for p in line.split(FIELD_SEPARATOR)]
+            if len(parts) == 4:
+                rows.append(tuple(parts))
+    return rows
+
+
+def get_catalog():
+    """Get {table_name: [column, ...]} for all base tables in public schema"""
+    rows = fetch_catalog_psycopg2()
+    source = "psycopg2"
+    if rows is None:
+        rows = fetch_catalog_docker()
+        source = "docker exec"
+
+    catalog = OrderedDict()
+    for table_name, column_name, data_type, is_nullable in rows:
+        catalog.setdefault(table_name, []).append({
+            'name': column_name,
+            'data_type': data_type,
+            'nullable': is_nullable or 'YES'
+        })
+    return catalog, source
+
+
+def write_file(path, content):
+    """Write one generated file"""
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def content_hash(*contents):
+    """Hash of the generated files of one table"""
+    digest = hashlib.sha256()
+    for content in contents:
+        digest.update(content.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def load_manifest():
+    """Load {table_name: hash} from the previous run"""
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    try:
+        with open(MANIFEST_PATH) as f:
+            return json.load(f).get('tables', {})
+    except (OSError, ValueError):
+        print("⚠️  Could not read manifest, regenerating all models")
+        return {}
+
+
+def save_manifest(tables):
+    """Save {table_name: hash} for the next run"""
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump({'tables': dict(sorted(tables.items()))}, f, indent=2)
+        f.write('\n')
 
 def to_snake_case(name):
     """Convert table name to snake_case if needed"""
@@ -102,7 +202,7 @@ def generate_staging_model(table_name, columns):
         column_list.append(f"    {col_name}")
     
     column_str = ',\n'.join(column_list)
-    sql_content = f"""{{{{ config(materialized='view') }}}}
+    sql_content = f"""{{{{ config(**staging_config('{model_name}')) }}}}
 
 select
 {column_str}
@@ -138,37 +238,70 @@ models:
     return yaml_content
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate staging models from the raw catalog")
+    parser.add_argument('--force', action='store_true', help="Rewrite every model, ignoring the manifest")
+    parser.add_argument('--dry-run', action='store_true', help="Print the diff summary without writing")
+    args = parser.parse_args()
+
     print("🚀 Generating staging models and YAML files...")
     print(f"📁 Staging directory: {STAGING_PATH}")
-    
-    tables = get_tables()
-    print(f"📊 Found {len(tables)} tables")
-    
-    for i, table_name in enumerate(tables, 1):
-        print(f"  [{i}/{len(tables)}] Processing {table_name}...")
-        
-        # Get columns
-        columns = get_columns(table_name)
-        
-        if not columns:
-            print(f"    ⚠️  No columns found (skipping)")
-            continue
-        
-        # Generate staging model
+    started = time.perf_counter()
+
+    catalog, source = get_catalog()
+    introspected = time.perf_counter()
+    print(f"📊 Found {len(catalog)} tables via {source} ({introspected - started:.2f}s)")
+
+    previous = load_manifest()
+    manifest = {}
+    added, changed, unchanged = [], [], []
+    files = []
+    for table_name, columns in catalog.items():
         model_name, sql_content = generate_staging_model(table_name, columns)
-        sql_file = os.path.join(STAGING_PATH, f"{model_name}.sql")
-        with open(sql_file, 'w') as f:
-            f.write(sql_content)
-        
-        # Generate YAML schema
         yaml_content = generate_yaml_schema(table_name, columns)
+        sql_file = os.path.join(STAGING_PATH, f"{model_name}.sql")
         yaml_file = os.path.join(STAGING_PATH, f"{model_name}.yml")
-        with open(yaml_file, 'w') as f:
-            f.write(yaml_content)
-    
-    print(f"\n✅ Generated {len(tables)} staging models and YAML files in {STAGING_DIR}/")
+        manifest[table_name] = content_hash(sql_content, yaml_content)
+
+        if (not args.force
+                and previous.get(table_name) == manifest[table_name]
+                and os.path.exists(sql_file) and os.path.exists(yaml_file)):
+            unchanged.append(table_name)
+            continue
+        (changed if table_name in previous else added).append(table_name)
+        files.append((sql_file, sql_content))
+        files.append((yaml_file, yaml_content))
+
+    # Only tables this generator wrote before are removed; hand-written models are left alone
+    removed = sorted(set(previous) - set(catalog))
+    rendered = time.perf_counter()
+    print(f"📝 Rendered {len(catalog)} models ({rendered - introspected:.2f}s)")
+
+    print("\n🔍 Changes:")
+    print(f"  + {len(added)} added")
+    print(f"  ~ {len(changed)} changed")
+    print(f"  - {len(removed)} removed")
+    print(f"  = {len(unchanged)} unchanged")
+    for marker, tables in (('+', added), ('~', changed), ('-', removed)):
+        for table_name in tables:
+            print(f"    {marker} stg_{table_name}")
+
+    if args.dry_run:
+        print("\n🧪 Dry run: nothing written")
+        return
+
+    with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as pool:
+        list(pool.map(lambda item: write_file(*item), files))
+    for table_name in removed:
+        for ext in ('sql', 'yml'):
+            path = os.path.join(STAGING_PATH, f"stg_{table_name}.{ext}")
+            if os.path.exists(path):
+                os.remove(path)
+    save_manifest(manifest)
+    written = time.perf_counter()
+    print(f"\n💾 Wrote {len(files)} files, removed {len(removed)} models ({written - rendered:.2f}s)")
+
+    print(f"\n✅ Staging models in {STAGING_DIR}/ up to date in {written - started:.2f}s")
     print("\n⚠️  Note: You'll need to create a sources.yml file to define the 'raw' source.")
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,25 @@
+{#
+    Customer RFM Macros
+    ===================
+    dim_customer_rfm adds the orders above its last processed salesorderid to
+    the stored per-customer totals. That only holds while the orders at or below
+    that id stay the same, which is not the case after the order history is
+    reloaded (scripts/scale_adventureworks.py --reset, a re-sync of the source).
+#}
+
+{#
+    Pre-hook: empty an existing dim_customer_rfm when its processed orders no
+    longer match the source, i.e. the number of source orders up to the stored
+    max_salesorderid differs from the stored total_orders. The incremental run
+    then rebuilds every customer, as --full-refresh would.
+#}
+{% macro reset_customer_rfm_on_order_history_change(relation) %}
+    {%- if is_incremental() -%}
+    delete from {{ relation }}
+    where (
+        select count(*)
+        from {{ ref('stg_salesorderheader') }}
+        where salesorderid <= (select max(max_salesorderid) from {{ relation }})
+    ) <> (select sum(total_orders) from {{ relation }})
+    {%- endif -%}
+{% endmacro %}
@@ -0,0 +1,50 @@
+{#
+    Date Dimension Macros
+    =====================
+    dim_date is incremental: each day row is written once. Columns that depend on
+    "today" or on the report date go stale as time passes, so they are defined
+    here once and used both when rows are inserted and by dim_date's post-hook,
+    which refreshes only the rows whose values changed.
+
+    Expressions use date_day (the dim_date row) and rd.report_date
+    (dim_report_date).
+
+    Only columns that flip for a few rows when the report date moves are stored.
+    Distances to the report date change on every row each time, so refreshing
+    them would rewrite the whole table; compute them at query time instead:
+        dd.date_day - rd.report_date as days_from_report_date
+        cross join {{ ref('dim_report_date') }} rd
+#}
+
+{% macro dim_date_relative_columns() %}
+    {{ return({
+        'is_current_date': "date_day = current_date",
+        'is_past_date': "date_day < current_date",
+        'is_future_date': "date_day > current_date",
+        'years_ago': "date_part('year', current_date) - date_part('year', date_day)",
+        'is_trailing_30_days': "date_day between rd.report_date - 29 and rd.report_date",
+        'is_trailing_12_months': "date_day > (rd.report_date - interval '12 months')::date and date_day <= rd.report_date",
+        'is_report_year_to_date': "date_day between date_trunc('year', rd.report_date)::date and rd.report_date",
+    }) }}
+{% endmacro %}
+
+
+{# Update stale relative columns of an existing dim_date relation (post-hook). #}
+{% macro refresh_dim_date_relative_columns(relation) %}
+    {%- set columns = dim_date_relative_columns() -%}
+    update {{ relation }} d
+    set
+    {%- for name, expr in columns.items() %}
+        {{ name }} = {{ expr }}{{ ',' if not loop.last }}
+    {%- endfor %}
+    from {{ ref('dim_report_date') }} rd
+    where (
+        {%- for name in columns %}
+        d.{{ name }}{{ ',' if not loop.last }}
+        {%- endfor %}
+    ) is distinct from (
+        {%- for expr in columns.values() %}
+        {{ expr }}{{ ',' if not loop.last }}
+        {%- endfor %}
+    )
+{% endmacro %}
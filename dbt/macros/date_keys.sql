@@ -0,0 +1,25 @@
+{#
+    Date Key Macros
+    ===============
+    Integer date keys (YYYYMMDD) used by every fact, metrics model and dim_date.
+
+    Keys are derived with date arithmetic instead of string formatting:
+    cast(to_char(d, 'YYYYMMDD') as integer) formats and re-parses a string per
+    row, while date_part() returns numbers that are combined directly.
+
+    Usage:
+        {{ date_key('soh.orderdate') }} as order_date_key
+        {{ date_from_key('order_date_key') }} as order_date
+#}
+
+{# YYYYMMDD integer key for a date/timestamp expression (null stays null). #}
+{% macro date_key(date_expr) -%}
+    (date_part('year', {{ date_expr }}) * 10000
+        + date_part('month', {{ date_expr }}) * 100
+        + date_part('day', {{ date_expr }}))::integer
+{%- endmacro %}
+
+{# Date for a YYYYMMDD integer key. #}
+{% macro date_from_key(key_expr) -%}
+    make_date(({{ key_expr }}) / 10000, ({{ key_expr }}) / 100 % 100, ({{ key_expr }}) % 100)
+{%- endmacro %}
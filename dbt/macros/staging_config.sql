@@ -0,0 +1,30 @@
+{#
+    Staging Materialization Policy
+    ==============================
+    Staging models are views over the Airbyte raw tables. A view is re-expanded
+    (column selection, casts, quoting) inside every downstream model that refs it,
+    so heavily referenced staging models are materialized once per run instead.
+
+    A staging model is "hot" when it is listed in var('hot_staging_models').
+    The list is maintained by scripts/staging_fanout.py from the number of
+    downstream models referencing each staging model (threshold:
+    var('hot_staging_min_refs')).
+
+    Hot models become UNLOGGED tables: they are rebuilt from the raw tables on
+    every run, so skipping WAL is safe (PostgreSQL truncates unlogged tables after
+    a crash; the next dbt run repopulates them).
+
+    Disable the policy for a run (e.g. to compare build times):
+        ./run_dbt.sh run --vars '{materialize_hot_staging: false}'
+
+    Usage (first line of every staging model):
+        {{ config(**staging_config('stg_salesorderheader')) }}
+#}
+
+{% macro staging_config(model_name) %}
+    {%- if var('materialize_hot_staging', true) and model_name in var('hot_staging_models', []) -%}
+        {{ return({'materialized': 'table', 'unlogged': true, 'tags': ['hot_staging']}) }}
+    {%- else -%}
+        {{ return({'materialized': 'view'}) }}
+    {%- endif -%}
+{% endmacro %}
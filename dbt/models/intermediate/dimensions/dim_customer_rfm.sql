@@ -0,0 +1,231 @@
+{{ config(
+    materialized='incremental',
+    unique_key='customerid',
+    on_schema_change='fail',
+    pre_hook="{{ reset_customer_rfm_on_order_history_change(this) }}"
+) }}
+
+{#
+    Customer RFM State
+    ==================
+    Compact per-customer state: order totals plus RFM scores, value segment,
+    status and churn risk. Source of the customer scoring columns in
+    dim_customer and mart_customer_analytics.
+
+    Scores are anchored to the report date (dim_report_date), not current_date,
+    so they only change when the data changes.
+
+    Incremental runs rewrite only:
+    - customers with orders newer than the last processed salesorderid
+      (previous totals + the new orders; old orders are not re-read)
+    - customers whose recency-based scores cross a threshold because the
+      report date moved
+
+    recency_days itself changes for every customer whenever the report date
+    moves, so it is not stored: compute it as report_date - last_order_date::date.
+
+    Orders are only added, never re-read, so the pre-hook empties the table when
+    the orders up to the last processed salesorderid changed in number (e.g.
+    after scale_adventureworks.py --reset), and the run rebuilds every customer.
+    Edits to existing orders that keep their count are not detected.
+
+    Rebuild everything with:
+        ./run_dbt.sh run --full-refresh --select dim_customer_rfm+
+#}
+
+with report_date as (
+    select report_date
+    from {{ ref('dim_report_date') }}
+),
+
+{% if is_incremental() %}
+previous_run as (
+    select
+        coalesce(max(max_salesorderid), 0) as max_salesorderid,
+        max(scored_report_date) as scored_report_date
+    from {{ this }}
+),
+{% endif %}
+
+new_orders as (
+    select
+        soh.customerid,
+        soh.salesorderid,
+        soh.orderdate,
+        soh.totaldue
+    from {{ ref('stg_salesorderheader') }} soh
+    {% if is_incremental() %}
+    where soh.salesorderid > (select max_salesorderid from previous_run)
+    {% endif %}
+),
+
+new_order_quantities as (
+    select
+        sod.salesorderid,
+        sum(sod.orderqty) as order_quantity
+    from {{ ref('stg_salesorderdetail') }} sod
+    join new_orders nord on sod.salesorderid = nord.salesorderid
+    group by sod.salesorderid
+),
+
+new_order_summary as (
+    select
+        nord.customerid,
+        count(*) as total_orders,
+        sum(nord.totaldue) as lifetime_value,
+        min(nord.orderdate) as first_order_date,
+        max(nord.orderdate) as last_order_date,
+        coalesce(sum(noq.order_quantity), 0) as total_quantity_purchased,
+        max(nord.salesorderid) as max_salesorderid
+    from new_orders nord
+    left join new_order_quantities noq on nord.salesorderid = noq.salesorderid
+    group by nord.customerid
+),
+
+customer_totals as (
+    {% if is_incremental() %}
+    -- Customers with new orders: previous state plus the new orders
+    select
+        nos.customerid,
+        coalesce(prev.total_orders, 0) + nos.total_orders as total_orders,
+        coalesce(prev.lifetime_value, 0) + nos.lifetime_value as lifetime_value,
+        least(prev.first_order_date, nos.first_order_date) as first_order_date,
+        greatest(prev.last_order_date, nos.last_order_date) as last_order_date,
+        coalesce(prev.total_quantity_purchased, 0) + nos.total_quantity_purchased as total_quantity_purchased,
+        greatest(prev.max_salesorderid, nos.max_salesorderid) as max_salesorderid,
+        true as has_new_orders
+    from new_order_summary nos
+    left join {{ this }} prev on nos.customerid = prev.customerid
+
+    union all
+
+    -- Customers without new orders, re-checked only when the report date moved
+    select
+        prev.customerid,
+        prev.total_orders,
+        prev.lifetime_value,
+        prev.first_order_date,
+        prev.last_order_date,
+        prev.total_quantity_purchased,
+        prev.max_salesorderid,
+        false as has_new_orders
+    from {{ this }} prev
+    cross join report_date rd
+    cross join previous_run pr
+    where rd.report_date is distinct from pr.scored_report_date
+      and not exists (
+          select 1 from new_order_summary nos where nos.customerid = prev.customerid
+      )
+    {% else %}
+    select
+        customerid,
+        total_orders,
+        lifetime_value,
+        first_order_date,
+        last_order_date,
+        total_quantity_purchased,
+        max_salesorderid,
+        true as has_new_orders
+    from new_order_summary
+    {% endif %}
+),
+
+recency as (
+    select
+        ct.*,
+        rd.report_date,
+        rd.report_date - ct.last_order_date::date as recency_days
+    from customer_totals ct
+    cross join report_date rd
+),
+
+scored as (
+    select
+        customerid,
+        total_orders,
+        lifetime_value,
+        lifetime_value / nullif(total_orders, 0) as avg_order_value,
+        first_order_date,
+        last_order_date,
+        total_quantity_purchased,
+        max_salesorderid,
+        has_new_orders,
+        -- RFM Scores (1-5 scale)
+        case
+            when recency_days <= 30 then 5
+            when recency_days <= 60 then 4
+            when recency_days <= 90 then 3
+            when recency_days <= 180 then 2
+            else 1
+        end as recency_score,
+        case
+            when total_orders >= 20 then 5
+            when total_orders >= 10 then 4
+            when total_orders >= 5 then 3
+            when total_orders >= 2 then 2
+            else 1
+        end as frequency_score,
+        case
+            when lifetime_value >= 50000 then 5
+            when lifetime_value >= 20000 then 4
+            when lifetime_value >= 10000 then 3
+            when lifetime_value >= 5000 then 2
+            else 1
+        end as monetary_score,
+        case
+            when lifetime_value >= 50000 then 'High Value'
+            when lifetime_value >= 20000 then 'Medium Value'
+            else 'Low Value'
+        end as customer_segment,
+        case
+            when recency_days <= 90 then 'Active'
+            when recency_days <= 180 then 'At Risk'
+            else 'Inactive'
+        end as customer_status,
+        case
+            when total_orders >= 10 then 'Frequent'
+            when total_orders >= 5 then 'Regular'
+            else 'Occasional'
+        end as purchase_frequency,
+        case
+            when recency_days > 180 then 'High Risk'
+            when recency_days > 90 then 'Medium Risk'
+            else 'Low Risk'
+        end as churn_risk,
+        report_date as scored_report_date
+    from recency
+)
+
+select
+    s.customerid,
+    s.total_orders,
+    s.lifetime_value,
+    s.avg_order_value,
+    s.first_order_date,
+    s.last_order_date,
+    s.total_quantity_purchased,
+    s.max_salesorderid,
+    s.recency_score,
+    s.frequency_score,
+    s.monetary_score,
+    s.recency_score::text || s.frequency_score::text || s.monetary_score::text as rfm_segment,
+    case
+        when s.recency_score >= 4 and s.frequency_score >= 4 and s.monetary_score >= 4 then 'Champions'
+        when s.recency_score >= 3 and s.frequency_score >= 3 and s.monetary_score >= 3 then 'Loyal Customers'
+        when s.recency_score >= 4 and s.frequency_score <= 2 then 'New Customers'
+        when s.recency_score <= 2 and s.frequency_score >= 3 then 'At Risk'
+        when s.recency_score <= 2 and s.frequency_score <= 2 then 'Lost'
+        else 'Potential'
+    end as rfm_category,
+    s.customer_segment,
+    s.customer_status,
+    s.purchase_frequency,
+    s.churn_risk,
+    s.scored_report_date
+from scored s
+{% if is_incremental() %}
+left join {{ this }} prev on s.customerid = prev.customerid
+where s.has_new_orders
+   or (s.recency_score, s.customer_status, s.churn_risk)
+      is distinct from (prev.recency_score, prev.customer_status, prev.churn_risk)
+{% endif %}
@@ -1,19 +1,68 @@
-{{ config(materialized='table') }}
-
-with date_spine as (
-    select date_day::date as date_day
-    from (
-        select generate_series(
-            '2011-01-01'::date,
-            '2014-12-31'::date,
-            '1 day'::interval
-        )::date as date_day
-    ) dates
+{{ config(
+    materialized='incremental',
+    on_schema_change='fail',
+    post_hook="{{ refresh_dim_date_relative_columns(this) }}"
+) }}
+
+{#
+    Date Dimension
+    ==============
+    One row per day. The range is derived from the data: January 1st of the
+    earliest order, ship, due, work order or quota date, through December 31st of
+    the latest such date plus var('date_spine_future_days'). New orders extend
+    the spine without a code change.
+
+    Incremental: each run only inserts the days outside the existing range.
+    Relative-period flags (is_past_date, is_trailing_30_days, ...) are defined
+    in macros/date_dimension.sql and refreshed by the post-hook. Distances to
+    the report date are not stored (they change on every row when it moves):
+    use dd.date_day - rd.report_date with dim_report_date.
+
+    Fiscal columns use var('fiscal_year_start_month') (AdventureWorks: July);
+    the fiscal year is named after the calendar year it ends in.
+
+    After changing columns, rebuild with:
+        ./run_dbt.sh run --full-refresh --select dim_date
+#}
+
+{% set fiscal_start = var('fiscal_year_start_month', 7) %}
+
+with source_dates as (
+    select min(least(orderdate, shipdate, duedate)) as min_date,
+           max(greatest(orderdate, shipdate, duedate)) as max_date
+    from {{ ref('stg_salesorderheader') }}
+    union all
+    select min(least(orderdate, shipdate)), max(greatest(orderdate, shipdate))
+    from {{ ref('stg_purchaseorderheader') }}
+    union all
+    select min(least(startdate, enddate, duedate)), max(greatest(startdate, enddate, duedate))
+    from {{ ref('stg_workorder') }}
+    union all
+    select min(quotadate), max(quotadate)
+    from {{ ref('stg_salespersonquotahistory') }}
+),
+
+spine_bounds as (
+    select
+        date_trunc('year', min(min_date))::date as start_date,
+        (date_trunc('year', max(max_date)::date + {{ var('date_spine_future_days', 365) }})
+            + interval '1 year - 1 day')::date as end_date
+    from source_dates
+),
+
+date_spine as (
+    select dates.date_day::date as date_day
+    from spine_bounds
+    cross join generate_series(start_date, end_date, '1 day'::interval) as dates(date_day)
+    {% if is_incremental() %}
+    where dates.date_day::date < coalesce((select min(date_day) from {{ this }}), 'infinity'::date)
+       or dates.date_day::date > coalesce((select max(date_day) from {{ this }}), '-infinity'::date)
+    {% endif %}
 ),
 
 date_dimension as (
     select
-        cast(to_char(date_day, 'YYYYMMDD') as integer) as date_key,
+        {{ date_key('date_day') }} as date_key,
         date_day,
         date_part('year', date_day) as year,
         date_part('quarter', date_day) as quarter,
@@ -36,21 +85,34 @@ date_dimension as (
             when date_part('dow', date_day) in (0, 6) then 'Weekend'
             else 'Weekday'
         end as day_type,
-        case
-            when date_day = current_date then true
-            else false
-        end as is_current_date,
-        case
-            when date_day < current_date then true
-            else false
-        end as is_past_date,
-        case
-            when date_day > current_date then true
-            else false
-        end as is_future_date,
-        date_part('year', current_date) - date_part('year', date_day) as years_ago
+
+        -- Period boundaries
+        (date_part('year', date_day) * 100 + date_part('month', date_day))::integer as month_key,
+        date_trunc('week', date_day)::date as week_start_date,
+        date_trunc('month', date_day)::date as month_start_date,
+        (date_trunc('month', date_day) + interval '1 month - 1 day')::date as month_end_date,
+        date_trunc('quarter', date_day)::date as quarter_start_date,
+        date_trunc('year', date_day)::date as year_start_date,
+
+        -- ISO 8601 week calendar
+        date_part('isoyear', date_day)::integer as iso_year,
+        date_part('week', date_day)::integer as iso_week,
+        date_part('isodow', date_day)::integer as iso_day_of_week,
+        to_char(date_day, 'IYYY-"W"IW') as iso_year_week,
+
+        -- Fiscal calendar
+        (date_part('year', date_day)
+            + case when date_part('month', date_day) >= {{ fiscal_start }} and {{ fiscal_start }} > 1 then 1 else 0 end
+        )::integer as fiscal_year,
+        ((date_part('month', date_day)::integer - {{ fiscal_start }} + 12) % 12 / 3 + 1) as fiscal_quarter,
+        ((date_part('month', date_day)::integer - {{ fiscal_start }} + 12) % 12 + 1) as fiscal_month,
+
+        -- Relative periods (refreshed by the post-hook)
+        {%- for name, expr in dim_date_relative_columns().items() %}
+        {{ expr }} as {{ name }}{{ ',' if not loop.last }}
+        {%- endfor %}
     from date_spine
+    cross join {{ ref('dim_report_date') }} rd
 )
 
 select * from date_dimension
-
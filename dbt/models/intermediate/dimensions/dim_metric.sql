@@ -1,4 +1,4 @@
-{{ config(materialized='table') }}
+{{ config(materialized='table', unlogged=false) }}
 
 {#
     Metrics Dimension Table
@@ -25,6 +25,9 @@
     - Drill-down analysis from KPIs to root causes
     - Self-service analytics with clear metric definitions
     - Automated alerting and monitoring
+
+    Logged even under the unlogged build profile: the mart_metrics view joins it,
+    and the AI assistant reads the catalog directly.
 #}
 
 with metrics_catalog as (
@@ -968,7 +971,7 @@ select
         end,
         metric_category, 
         metric_key
-    ) as metric_id,
+    )::smallint as metric_id,
     metric_key,
     metric_name,
     metric_category,
@@ -0,0 +1,37 @@
+{{ config(materialized='table', unlogged=false) }}
+
+{#
+    Metric Attribute Dictionary
+    ===========================
+    Dictionary encoding of the text columns of fact_global_metrics.
+
+    The status and context columns (source_table, order_status, location_name, ...)
+    repeat a few hundred distinct combinations across millions of metric rows.
+    Each distinct combination is stored once here; fact_metric_values keeps only
+    the integer attribute_id.
+
+    Logged even under the unlogged build profile: the mart_metrics view decodes
+    attribute_id through it.
+#}
+
+with attribute_sets as (
+    select distinct
+        source_table,
+        online_order_flag,
+        has_discount,
+        inventory_status,
+        order_status,
+        delivery_status,
+        quota_status,
+        location_name,
+        scrap_reason_name
+    from {{ ref('fact_global_metrics') }}
+)
+
+select
+    row_number() over (
+        order by source_table, online_order_flag, has_discount, inventory_status, order_status,
+                 delivery_status, quota_status, location_name, scrap_reason_name
+    )::integer as attribute_id,
+    *
+from attribute_sets
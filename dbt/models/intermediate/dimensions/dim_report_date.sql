@@ -0,0 +1,24 @@
+{{ config(materialized='table', unlogged=false) }}
+
+{#
+    Report Date Dimension
+    =====================
+    Single-row table holding the warehouse snapshot date (max sales order date).
+
+    Every metrics model and mart that needs the report date cross joins this table
+    instead of re-aggregating stg_salesorderheader in its own scalar subquery.
+    It is materialized once per run, so the raw header table is scanned once.
+
+    Always logged (unlogged=false): dashboard pages read it directly, so it must
+    survive a crash even when the unlogged build profile is active.
+#}
+
+with report_date_calc as (
+    select max(orderdate)::date as report_date
+    from {{ ref('stg_salesorderheader') }}
+)
+
+select
+    {{ date_key('report_date') }} as report_date_key,
+    report_date
+from report_date_calc
@@ -47,7 +47,7 @@ quota_performance as (
 
 select
     businessentityid as employee_key,
-    cast(to_char(quotadate, 'YYYYMMDD') as integer) as quota_date_key,
+    {{ date_key('quotadate') }} as quota_date_key,
     territoryid as territory_key,
     quotadate,
     salesquota,
@@ -0,0 +1,64 @@
+{{ config(materialized='table', unlogged=false) }}
+
+{#
+    Metric Values Fact (narrow)
+    ===========================
+    Serving copy of fact_global_metrics with every text column encoded:
+    - metric_key      -> metric_id (smallint, dim_metric)
+    - status/context  -> attribute_id (integer, dim_metric_attributes)
+    - report_date     -> dropped (single value, in dim_report_date)
+
+    What remains is integers and numerics. mart_metrics is a view that decodes
+    these rows back into the original wide layout.
+
+    Rows whose metric_key is missing from dim_metric are dropped: add new metrics
+    to dim_metric (the single source of truth) first.
+
+    Logged even under the unlogged build profile: mart_metrics is a view over
+    this table, and marts must survive a crash.
+#}
+
+select
+    fgm.metric_record_id,
+    dm.metric_id,
+    fgm.date_key,
+    dma.attribute_id,
+    fgm.source_record_id,
+
+    -- Core dimension keys
+    fgm.customer_key,
+    fgm.product_key,
+    fgm.employee_key,
+    fgm.territory_key,
+    fgm.vendor_key,
+    fgm.location_key,
+
+    -- Additional dimension keys
+    fgm.ship_method_key,
+    fgm.credit_card_key,
+    fgm.special_offer_key,
+    fgm.scrap_reason_key,
+    fgm.parent_order_id,
+
+    -- Numeric context columns (null for most metrics)
+    fgm.safety_stock_level,
+    fgm.reorder_point,
+    fgm.number_of_operations,
+    fgm.commission_pct,
+
+    -- Metric value
+    fgm.metric_value
+
+from {{ ref('fact_global_metrics') }} fgm
+join {{ ref('dim_metric') }} dm on fgm.metric_key = dm.metric_key
+-- Plain equality on coalesced values keeps this a hash join (is not distinct from is not hashable)
+join {{ ref('dim_metric_attributes') }} dma
+    on fgm.source_table = dma.source_table
+    and coalesce(fgm.online_order_flag, '') = coalesce(dma.online_order_flag, '')
+    and coalesce(fgm.has_discount, '') = coalesce(dma.has_discount, '')
+    and coalesce(fgm.inventory_status, '') = coalesce(dma.inventory_status, '')
+    and coalesce(fgm.order_status, '') = coalesce(dma.order_status, '')
+    and coalesce(fgm.delivery_status, '') = coalesce(dma.delivery_status, '')
+    and coalesce(fgm.quota_status, '') = coalesce(dma.quota_status, '')
+    and coalesce(fgm.location_name, '') = coalesce(dma.location_name, '')
+    and coalesce(fgm.scrap_reason_name, '') = coalesce(dma.scrap_reason_name, '')
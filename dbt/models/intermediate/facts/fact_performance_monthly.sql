@@ -0,0 +1,217 @@
+{{ config(materialized='table', unlogged=false) }}
+
+{#
+    Performance Fact (Monthly)
+    ==========================
+    Sales performance per employee and per territory, pre-joined with the
+    employee, territory, quota and calendar attributes used by
+    mart_employee_territory_performance and the HR Analytics page.
+
+    Built in one pass: the order lines are scanned once and aggregated with
+    grouping sets into four groupings, identified by performance_type and
+    period_grain:
+        employee  / month     - one row per employee and month with sales
+        territory / month     - one row per territory and month with sales
+        employee  / all_time  - one row per employee (all employees, with or without sales)
+        territory / all_time  - one row per territory (all territories)
+
+    Months come from the integer order_date_key (order_date_key / 100 = YYYYMM),
+    so dim_date is joined once, on the monthly result.
+
+    Logged even under the unlogged build profile: the HR Analytics page reads
+    the all_time rows directly, and a crash must not leave it empty.
+#}
+
+with order_lines as (
+    select
+        fso.salesorderid,
+        fso.employee_key,
+        fso.territory_key,
+        fso.customer_key,
+        fso.order_date_key / 100 as month_key,
+        fsol.product_key,
+        -- Count each order's totaldue once, on its first line
+        case
+            when row_number() over (partition by fso.salesorderid) = 1 then fso.totaldue
+        end as order_totaldue
+    from {{ ref('fact_sales_order') }} fso
+    left join {{ ref('fact_sales_order_line') }} fsol on fso.salesorderid = fsol.salesorderid
+),
+
+performance_aggregates as (
+    select
+        case when grouping(employee_key) = 0 then 'employee' else 'territory' end as performance_type,
+        coalesce(employee_key, territory_key) as performance_id,
+        case when grouping(month_key) = 0 then 'month' else 'all_time' end as period_grain,
+        month_key,
+        count(distinct salesorderid) as order_count,
+        sum(order_totaldue) as revenue,
+        count(distinct customer_key) as unique_customers,
+        count(distinct product_key) as products_sold
+    from order_lines
+    group by grouping sets (
+        (employee_key, month_key),
+        (territory_key, month_key),
+        (employee_key),
+        (territory_key)
+    )
+),
+
+employee_base as (
+    select
+        employee_id,
+        jobtitle,
+        department_name,
+        territoryid,
+        sales_year_to_date,
+        quota_achievement_percent,
+        total_orders_managed,
+        total_sales_revenue,
+        years_of_service,
+        current_pay_rate,
+        payfrequency
+    from {{ ref('dim_employee') }}
+),
+
+territory_base as (
+    select
+        territoryid,
+        territory_name,
+        countryregioncode,
+        territory_group,
+        total_revenue as territory_total_revenue,
+        total_customers,
+        total_orders as territory_total_orders,
+        performance_category
+    from {{ ref('dim_territory') }}
+),
+
+latest_quota as (
+    select distinct on (employee_key)
+        employee_key,
+        salesquota,
+        quota_status
+    from {{ ref('fact_employee_quota') }}
+    order by employee_key, quota_date_key desc
+),
+
+month_dim as (
+    select
+        date_key / 100 as month_key,
+        year,
+        quarter,
+        month,
+        year_quarter,
+        year_month
+    from {{ ref('dim_date') }}
+    where day_of_month = 1
+),
+
+employee_performance as (
+    select
+        'employee' as performance_type,
+        eb.employee_id as performance_id,
+        coalesce(pa.period_grain, 'all_time') as period_grain,
+        pa.month_key,
+        eb.jobtitle,
+        eb.department_name,
+        tb.territory_name,
+        eb.territoryid,
+        tb.countryregioncode,
+        tb.territory_group,
+        pa.order_count,
+        pa.revenue,
+        pa.unique_customers,
+        pa.products_sold,
+        eb.sales_year_to_date,
+        eb.quota_achievement_percent,
+        eb.total_orders_managed,
+        eb.total_sales_revenue,
+        eb.years_of_service,
+        eb.current_pay_rate,
+        eb.payfrequency,
+        lq.salesquota as current_quota,
+        lq.quota_status,
+        tb.performance_category as territory_performance,
+        null::integer as territory_total_orders,
+        null::integer as territory_total_customers
+    from employee_base eb
+    left join performance_aggregates pa
+        on pa.performance_type = 'employee' and pa.performance_id = eb.employee_id
+    left join latest_quota lq on eb.employee_id = lq.employee_key
+    left join territory_base tb on eb.territoryid = tb.territoryid
+),
+
+territory_performance as (
+    select
+        'territory' as performance_type,
+        tb.territoryid as performance_id,
+        coalesce(pa.period_grain, 'all_time') as period_grain,
+        pa.month_key,
+        null::varchar as jobtitle,
+        null::varchar as department_name,
+        tb.territory_name,
+        tb.territoryid,
+        tb.countryregioncode,
+        tb.territory_group,
+        pa.order_count,
+        pa.revenue,
+        pa.unique_customers,
+        null::bigint as products_sold,
+        tb.territory_total_revenue as sales_year_to_date,
+        null::numeric as quota_achievement_percent,
+        null::bigint as total_orders_managed,
+        tb.territory_total_revenue as total_sales_revenue,
+        null::bigint as years_of_service,
+        null::numeric as current_pay_rate,
+        null::bigint as payfrequency,
+        null::numeric as current_quota,
+        null::varchar as quota_status,
+        tb.performance_category as territory_performance,
+        tb.territory_total_orders,
+        tb.total_customers as territory_total_customers
+    from territory_base tb
+    left join performance_aggregates pa
+        on pa.performance_type = 'territory' and pa.performance_id = tb.territoryid
+),
+
+combined as (
+    select * from employee_performance
+    union all
+    select * from territory_performance
+)
+
+select
+    c.performance_type,
+    c.performance_id,
+    c.period_grain,
+    c.month_key,
+    md.year,
+    md.quarter,
+    md.month,
+    md.year_quarter,
+    md.year_month,
+    c.jobtitle,
+    c.department_name,
+    c.territory_name,
+    c.territoryid,
+    c.countryregioncode,
+    c.territory_group,
+    c.order_count,
+    c.revenue,
+    c.unique_customers,
+    c.products_sold,
+    c.sales_year_to_date,
+    c.quota_achievement_percent,
+    c.total_orders_managed,
+    c.total_sales_revenue,
+    c.years_of_service,
+    c.current_pay_rate,
+    c.payfrequency,
+    c.current_quota,
+    c.quota_status,
+    c.territory_performance,
+    c.territory_total_orders,
+    c.territory_total_customers
+from combined c
+left join month_dim md on c.month_key = md.month_key
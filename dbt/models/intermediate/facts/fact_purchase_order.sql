@@ -33,8 +33,8 @@ purchase_order_totals as (
 select
     poh.purchaseorderid,
     -- Date keys
-    cast(to_char(poh.orderdate, 'YYYYMMDD') as integer) as order_date_key,
-    cast(to_char(poh.shipdate, 'YYYYMMDD') as integer) as ship_date_key,
+    {{ date_key('poh.orderdate') }} as order_date_key,
+    {{ date_key('poh.shipdate') }} as ship_date_key,
     -- Dimension keys
     poh.vendorid as vendor_key,
     poh.shipmethodid as ship_method_key,
@@ -56,9 +56,9 @@ currency_rate_info as (
 select
     soh.salesorderid,
     -- Date keys
-    cast(to_char(soh.orderdate, 'YYYYMMDD') as integer) as order_date_key,
-    cast(to_char(soh.duedate, 'YYYYMMDD') as integer) as due_date_key,
-    cast(to_char(soh.shipdate, 'YYYYMMDD') as integer) as ship_date_key,
+    {{ date_key('soh.orderdate') }} as order_date_key,
+    {{ date_key('soh.duedate') }} as due_date_key,
+    {{ date_key('soh.shipdate') }} as ship_date_key,
     -- Dimension keys
     soh.customerid as customer_key,
     soh.salespersonid as employee_key,
@@ -53,7 +53,7 @@ select
     sod.salesorderid,
     sod.salesorderdetailid,
     -- Date key
-    cast(to_char(soh.orderdate, 'YYYYMMDD') as integer) as order_date_key,
+    {{ date_key('soh.orderdate') }} as order_date_key,
     -- Dimension keys
     soh.customerid as customer_key,
     soh.salespersonid as employee_key,
@@ -56,9 +56,9 @@ scrap_reason_info as (
 select
     wo.workorderid,
     -- Date keys
-    cast(to_char(wo.startdate, 'YYYYMMDD') as integer) as start_date_key,
-    cast(to_char(wo.enddate, 'YYYYMMDD') as integer) as end_date_key,
-    cast(to_char(wo.duedate, 'YYYYMMDD') as integer) as due_date_key,
+    {{ date_key('wo.startdate') }} as start_date_key,
+    {{ date_key('wo.enddate') }} as end_date_key,
+    {{ date_key('wo.duedate') }} as due_date_key,
     -- Dimension keys
     wo.productid as product_key,
     wo.scrapreasonid as scrap_reason_key,
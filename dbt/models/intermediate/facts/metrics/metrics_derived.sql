@@ -20,11 +20,12 @@
     Granularity: One row per metric (company-wide aggregates)
     
     Note: metric_name, metric_category, metric_unit come from dim_metric
+          report_date comes from dim_report_date (computed once per run)
 #}
 
 with report_date_calc as (
-    select max(report_date) as report_date
-    from {{ ref('metrics_sales_order') }}
+    select report_date_key, report_date
+    from {{ ref('dim_report_date') }}
 ),
 
 -- Aggregate from metrics_sales_order
@@ -78,7 +79,8 @@ quota_agg as (
 -- Calculate derived metrics
 derived_metrics as (
     select
-        (select report_date from report_date_calc) as report_date,
+        rdc.report_date_key,
+        rdc.report_date,
         
         -- TOTAL_REVENUE: Sum of SO_REVENUE
         soa.total_revenue,
@@ -121,6 +123,7 @@ derived_metrics as (
         coalesce(qa.avg_quota_achievement, 0) as sales_performance
         
     from sales_order_agg soa
+    cross join report_date_calc rdc
     cross join sales_line_agg sla
     cross join inventory_agg ia
     cross join purchase_agg pa
@@ -130,7 +133,7 @@ derived_metrics as (
 
 -- Unpivot to tall format
 select
-    cast(to_char(report_date, 'YYYYMMDD') as integer) as date_key,
+    report_date_key as date_key,
     report_date,
     'derived' as source_table,
     1::bigint as source_record_id,
@@ -10,16 +10,12 @@
     - EQ_ACHIEVEMENT_PCT, EQ_QUOTA_VARIANCE, EQ_BONUS
     
     Note: metric_name, metric_category, and metric_unit come from dim_metric (single source of truth)
+    report_date comes from dim_report_date (computed once per run)
 #}
 
-with report_date_calc as (
-    select max(orderdate)::date as report_date
-    from {{ ref('stg_salesorderheader') }}
-)
-
 select
     quota_date_key as date_key,
-    (select report_date from report_date_calc) as report_date,
+    rd.report_date,
     'employee_quota' as source_table,
     employee_key as source_record_id,
     
@@ -37,6 +33,7 @@ select
     metric_key,
     metric_value
 from {{ ref('fact_employee_quota') }}
+cross join {{ ref('dim_report_date') }} rd
 cross join lateral (
     values
         ('EQ_QUOTA', salesquota::numeric),
@@ -9,16 +9,12 @@
     - INV_QUANTITY, INV_VALUE, INV_ABOVE_SAFETY, INV_REORDER_PCT
     
     Note: metric_name, metric_category, and metric_unit come from dim_metric (single source of truth)
+    report_date comes from dim_report_date (computed once per run)
 #}
 
-with report_date_calc as (
-    select max(orderdate)::date as report_date
-    from {{ ref('stg_salesorderheader') }}
-)
-
 select
-    cast(to_char((select report_date from report_date_calc), 'YYYYMMDD') as integer) as date_key,
-    (select report_date from report_date_calc) as report_date,
+    rd.report_date_key as date_key,
+    rd.report_date,
     'inventory' as source_table,
     row_number() over (order by product_key, location_key) as source_record_id,
     
@@ -38,6 +34,7 @@ select
     metric_key,
     metric_value
 from {{ ref('fact_inventory') }}
+cross join {{ ref('dim_report_date') }} rd
 cross join lateral (
     values
         ('INV_QUANTITY', quantity::numeric),
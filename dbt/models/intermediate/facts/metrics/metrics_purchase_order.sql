@@ -11,16 +11,12 @@
     - PO_FULFILLMENT_RATE, PO_DAYS_TO_SHIP
     
     Note: metric_name, metric_category, and metric_unit come from dim_metric (single source of truth)
+    report_date comes from dim_report_date (computed once per run)
 #}
 
-with report_date_calc as (
-    select max(orderdate)::date as report_date
-    from {{ ref('stg_salesorderheader') }}
-)
-
 select
     order_date_key as date_key,
-    (select report_date from report_date_calc) as report_date,
+    rd.report_date,
     'purchase_order' as source_table,
     purchaseorderid as source_record_id,
     
@@ -38,6 +34,7 @@ select
     metric_key,
     metric_value
 from {{ ref('fact_purchase_order') }}
+cross join {{ ref('dim_report_date') }} rd
 cross join lateral (
     values
         ('PO_AMOUNT', totaldue::numeric),
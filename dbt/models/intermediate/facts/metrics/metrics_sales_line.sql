@@ -10,16 +10,12 @@
     - SOL_PROFIT_MARGIN, SOL_DISCOUNT, SOL_UNIT_PRICE
     
     Note: metric_name, metric_category, and metric_unit come from dim_metric (single source of truth)
+    report_date comes from dim_report_date (computed once per run)
 #}
 
-with report_date_calc as (
-    select max(orderdate)::date as report_date
-    from {{ ref('stg_salesorderheader') }}
-)
-
 select
     order_date_key as date_key,
-    (select report_date from report_date_calc) as report_date,
+    rd.report_date,
     'sales_order_line' as source_table,
     salesorderdetailid as source_record_id,
     
@@ -40,6 +36,7 @@ select
     metric_key,
     metric_value
 from {{ ref('fact_sales_order_line') }}
+cross join {{ ref('dim_report_date') }} rd
 cross join lateral (
     values
         ('SOL_REVENUE', net_line_amount::numeric),
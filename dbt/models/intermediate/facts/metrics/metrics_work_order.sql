@@ -11,16 +11,12 @@
     - WO_PRODUCTION_DAYS, WO_ACTUAL_HOURS, WO_HOURS_PER_UNIT
     
     Note: metric_name, metric_category, and metric_unit come from dim_metric (single source of truth)
+    report_date comes from dim_report_date (computed once per run)
 #}
 
-with report_date_calc as (
-    select max(orderdate)::date as report_date
-    from {{ ref('stg_salesorderheader') }}
-)
-
 select
     start_date_key as date_key,
-    (select report_date from report_date_calc) as report_date,
+    rd.report_date,
     'work_order' as source_table,
     workorderid as source_record_id,
     
@@ -41,6 +37,7 @@ select
     metric_key,
     metric_value
 from {{ ref('fact_work_order') }}
+cross join {{ ref('dim_report_date') }} rd
 cross join lateral (
     values
         ('WO_ORDER_QTY', orderqty::numeric),
@@ -92,41 +92,22 @@ customer_cohorts as (
         dd_first.quarter as cohort_quarter,
         dd_first.year_quarter as cohort_period
     from customer_base cb
-    left join date_dim dd_first on dd_first.date_key = cast(to_char(cb.first_order_date, 'YYYYMMDD') as integer)
+    left join date_dim dd_first on dd_first.date_key = {{ date_key('cb.first_order_date') }}
 ),
 
+-- RFM scores come from the incremental per-customer state, anchored to the report date
 rfm_analysis as (
     select
-        customerid,
-        -- Recency: Days since last order
-        date_part('day', current_date - last_order_date) as recency_days,
-        -- Frequency: Number of orders
-        total_orders as frequency,
-        -- Monetary: Total lifetime value
-        lifetime_value as monetary_value,
-        -- RFM Scores (1-5 scale)
-        case
-            when date_part('day', current_date - last_order_date) <= 30 then 5
-            when date_part('day', current_date - last_order_date) <= 60 then 4
-            when date_part('day', current_date - last_order_date) <= 90 then 3
-            when date_part('day', current_date - last_order_date) <= 180 then 2
-            else 1
-        end as recency_score,
-        case
-            when total_orders >= 20 then 5
-            when total_orders >= 10 then 4
-            when total_orders >= 5 then 3
-            when total_orders >= 2 then 2
-            else 1
-        end as frequency_score,
-        case
-            when lifetime_value >= 50000 then 5
-            when lifetime_value >= 20000 then 4
-            when lifetime_value >= 10000 then 3
-            when lifetime_value >= 5000 then 2
-            else 1
-        end as monetary_score
-    from customer_base
+        cr.customerid,
+        rd.report_date - cr.last_order_date::date as recency_days,
+        cr.recency_score,
+        cr.frequency_score,
+        cr.monetary_score,
+        cr.rfm_segment,
+        cr.rfm_category,
+        cr.churn_risk
+    from {{ ref('dim_customer_rfm') }} cr
+    cross join {{ ref('dim_report_date') }} rd
 )
 
 select
@@ -154,25 +135,15 @@ select
     
     -- RFM Analysis
     rfm.recency_days,
-    rfm.recency_score,
-    rfm.frequency_score,
-    rfm.monetary_score,
-    rfm.recency_score::text || rfm.frequency_score::text || rfm.monetary_score::text as rfm_segment,
-    case
-        when rfm.recency_score >= 4 and rfm.frequency_score >= 4 and rfm.monetary_score >= 4 then 'Champions'
-        when rfm.recency_score >= 3 and rfm.frequency_score >= 3 and rfm.monetary_score >= 3 then 'Loyal Customers'
-        when rfm.recency_score >= 4 and rfm.frequency_score <= 2 then 'New Customers'
-        when rfm.recency_score <= 2 and rfm.frequency_score >= 3 then 'At Risk'
-        when rfm.recency_score <= 2 and rfm.frequency_score <= 2 then 'Lost'
-        else 'Potential'
-    end as rfm_category,
+    -- Customers without orders keep the lowest scores
+    coalesce(rfm.recency_score, 1) as recency_score,
+    coalesce(rfm.frequency_score, 1) as frequency_score,
+    coalesce(rfm.monetary_score, 1) as monetary_score,
+    coalesce(rfm.rfm_segment, '111') as rfm_segment,
+    coalesce(rfm.rfm_category, 'Lost') as rfm_category,
     
     -- Churn indicators
-    case
-        when date_part('day', current_date - cb.last_order_date) > 180 then 'High Risk'
-        when date_part('day', current_date - cb.last_order_date) > 90 then 'Medium Risk'
-        else 'Low Risk'
-    end as churn_risk,
+    coalesce(rfm.churn_risk, 'Low Risk') as churn_risk,
     
     -- Customer value metrics
     (css.total_revenue / nullif(css.order_count, 0)) as revenue_per_order,
@@ -1,4 +1,4 @@
-{{ config(materialized='table') }}
+{{ config(materialized='view') }}
 
 {#
     Metrics Mart
@@ -13,18 +13,25 @@
     - KPI dashboards
     
     Use this table instead of joining fact_global_metrics with dim_metric manually.
+
+    Materialized as a view over the narrow fact_metric_values: metric text comes from
+    dim_metric, status/context text from dim_metric_attributes, report_date from
+    dim_report_date. Columns are unchanged; the long dim_metric text is no longer
+    stored once per metric row.
+    All four relations are pinned unlogged=false, so this view survives a crash
+    under the unlogged build profile like the table marts.
 #}
 
 select
     -- Surrogate key
-    fgm.metric_record_id,
+    fmv.metric_record_id,
     
     -- Date columns
-    fgm.date_key,
-    fgm.report_date,
+    fmv.date_key,
+    rd.report_date,
     
     -- Metric info from dim_metric (single source of truth)
-    fgm.metric_key,
+    dm.metric_key,
     dm.metric_name,
     dm.metric_description,
     dm.metric_category,
@@ -36,45 +43,47 @@ select
     dm.recommended_actions,
     
     -- Metric value
-    fgm.metric_value,
+    fmv.metric_value,
     
     -- Source info
-    fgm.source_table,
-    fgm.source_record_id,
+    dma.source_table,
+    fmv.source_record_id,
     
     -- Core dimension keys
-    fgm.customer_key,
-    fgm.product_key,
-    fgm.employee_key,
-    fgm.territory_key,
-    fgm.vendor_key,
-    fgm.location_key,
+    fmv.customer_key,
+    fmv.product_key,
+    fmv.employee_key,
+    fmv.territory_key,
+    fmv.vendor_key,
+    fmv.location_key,
     
     -- Additional dimension keys
-    fgm.ship_method_key,
-    fgm.credit_card_key,
-    fgm.special_offer_key,
-    fgm.scrap_reason_key,
-    fgm.parent_order_id,
+    fmv.ship_method_key,
+    fmv.credit_card_key,
+    fmv.special_offer_key,
+    fmv.scrap_reason_key,
+    fmv.parent_order_id,
     
     -- Status columns
-    fgm.online_order_flag,
-    fgm.has_discount,
-    fgm.inventory_status,
-    fgm.order_status,
-    fgm.delivery_status,
-    fgm.quota_status,
+    dma.online_order_flag,
+    dma.has_discount,
+    dma.inventory_status,
+    dma.order_status,
+    dma.delivery_status,
+    dma.quota_status,
     
     -- Context columns
-    fgm.location_name,
-    fgm.scrap_reason_name,
-    fgm.safety_stock_level,
-    fgm.reorder_point,
-    fgm.number_of_operations,
-    fgm.commission_pct,
+    dma.location_name,
+    dma.scrap_reason_name,
+    fmv.safety_stock_level,
+    fmv.reorder_point,
+    fmv.number_of_operations,
+    fmv.commission_pct,
     
     -- Metadata
-    fgm.created_at
+    dm.created_at
 
-from {{ ref('fact_global_metrics') }} fgm
-left join {{ ref('dim_metric') }} dm on fgm.metric_key = dm.metric_key
+from {{ ref('fact_metric_values') }} fmv
+join {{ ref('dim_metric') }} dm on fmv.metric_id = dm.metric_id
+join {{ ref('dim_metric_attributes') }} dma on fmv.attribute_id = dma.attribute_id
+cross join {{ ref('dim_report_date') }} rd
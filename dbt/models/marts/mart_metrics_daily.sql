@@ -0,0 +1,97 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='date_key'
+) }}
+
+{#
+    Metrics Daily Rollup
+    ====================
+    fact_metric_values aggregated to one row per metric, day and core dimension
+    keys (product, employee, territory, vendor, location). Holds sum, count, min
+    and max of metric_value, so any additive metric (sum) or average metric
+    (metric_sum / metric_count) can be served without scanning source-record grain.
+
+    customer_key is not a rollup key: per customer the daily grain is almost the
+    source-record grain. Use mart_customer_analytics or mart_metrics for that.
+
+    Incremental: every metric keeps its own watermark, its last rolled-up day.
+    A run recomputes every day holding a value of some metric dated on or after
+    that metric's watermark minus var('metrics_rollup_lookback_days'). A single
+    max(date_key) would not do: purchase orders run months past the sales report
+    date, so new sales rows and report-date snapshots dated before it would never
+    be rolled up. Nor would the earliest watermark: a metric whose source stopped
+    long ago would pin the recompute to everything since then.
+    - new rows of a metric are dated after its watermark, so they are covered
+    - report-date snapshot metrics (inventory, derived KPIs) have the previous
+      report date as watermark, so that day is recomputed; delete+insert on
+      date_key replaces whole days, which drops the old snapshot rows
+    - a metric not rolled up yet (new in dim_metric) recomputes every day it has values
+    Rows dated more than the lookback before their metric's watermark (late
+    edits to old source records) need --full-refresh.
+    analyses/metrics_rollup_consistency.sql compares the result to a full rebuild.
+#}
+
+with
+{% if is_incremental() %}
+rolled_up as (
+    select metric_key, max(date_key) as last_date_key
+    from {{ this }}
+    group by metric_key
+),
+
+changed_days as (
+    -- Days with a value inside its metric's lookback window (every day for a new metric)
+    select distinct fmv.date_key
+    from {{ ref('fact_metric_values') }} fmv
+    join {{ ref('dim_metric') }} dm on fmv.metric_id = dm.metric_id
+    left join rolled_up ru on dm.metric_key = ru.metric_key
+    where ru.last_date_key is null
+       or fmv.date_key >= {{ date_key(date_from_key('ru.last_date_key') ~ ' - ' ~ var('metrics_rollup_lookback_days', 3)) }}
+),
+{% endif %}
+
+metric_values as (
+    select
+        fmv.date_key,
+        fmv.metric_id,
+        fmv.product_key,
+        fmv.employee_key,
+        fmv.territory_key,
+        fmv.vendor_key,
+        fmv.location_key,
+        fmv.metric_value
+    from {{ ref('fact_metric_values') }} fmv
+    {% if is_incremental() %}
+    where fmv.date_key in (select date_key from changed_days)
+    {% endif %}
+)
+
+select
+    mv.date_key,
+    dm.metric_key,
+    dm.metric_name,
+    dm.metric_category,
+    dm.metric_unit,
+    mv.product_key,
+    mv.employee_key,
+    mv.territory_key,
+    mv.vendor_key,
+    mv.location_key,
+    sum(mv.metric_value) as metric_sum,
+    count(*) as metric_count,
+    min(mv.metric_value) as metric_min,
+    max(mv.metric_value) as metric_max
+from metric_values mv
+join {{ ref('dim_metric') }} dm on mv.metric_id = dm.metric_id
+group by
+    mv.date_key,
+    dm.metric_key,
+    dm.metric_name,
+    dm.metric_category,
+    dm.metric_unit,
+    mv.product_key,
+    mv.employee_key,
+    mv.territory_key,
+    mv.vendor_key,
+    mv.location_key
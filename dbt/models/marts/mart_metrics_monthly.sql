@@ -0,0 +1,78 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='month_key'
+) }}
+
+{#
+    Metrics Monthly Rollup
+    ======================
+    mart_metrics_daily re-aggregated to one row per metric, month and core
+    dimension keys. Same measures: metric_sum, metric_count, metric_min, metric_max
+    (average = metric_sum / metric_count).
+
+    Incremental: like the daily rollup, every metric keeps its own watermark
+    (its last rolled-up month). A run recomputes, for all metrics, every month
+    holding a day of some metric on or after the start of the month that is
+    var('metrics_rollup_lookback_days') before that metric's watermark month,
+    which covers every day whose values the daily rollup changed. A metric not
+    rolled up yet recomputes every month it has values.
+#}
+
+with
+{% if is_incremental() %}
+rolled_up as (
+    select metric_key, max(month_key) as last_month_key
+    from {{ this }}
+    group by metric_key
+),
+
+changed_months as (
+    -- Months with a day inside its metric's lookback window (every month for a new metric)
+    select distinct md.date_key / 100 as month_key
+    from {{ ref('mart_metrics_daily') }} md
+    left join rolled_up ru on md.metric_key = ru.metric_key
+    where ru.last_month_key is null
+       or md.date_key >= {{ date_key("date_trunc('month', " ~ date_from_key('ru.last_month_key * 100 + 1') ~ " - " ~ var('metrics_rollup_lookback_days', 3) ~ ")") }}
+),
+{% endif %}
+
+daily as (
+    select *
+    from {{ ref('mart_metrics_daily') }}
+    {% if is_incremental() %}
+    where date_key / 100 in (select month_key from changed_months)
+    {% endif %}
+)
+
+select
+    date_key / 100 as month_key,
+    date_key / 10000 as year,
+    date_key / 100 % 100 as month,
+    metric_key,
+    metric_name,
+    metric_category,
+    metric_unit,
+    product_key,
+    employee_key,
+    territory_key,
+    vendor_key,
+    location_key,
+    sum(metric_sum) as metric_sum,
+    sum(metric_count) as metric_count,
+    min(metric_min) as metric_min,
+    max(metric_max) as metric_max
+from daily
+group by
+    date_key / 100,
+    date_key / 10000,
+    date_key / 100 % 100,
+    metric_key,
+    metric_name,
+    metric_category,
+    metric_unit,
+    product_key,
+    employee_key,
+    territory_key,
+    vendor_key,
+    location_key
@@ -153,8 +153,8 @@ select
     
     -- Sales velocity
     case
-        when pb.total_quantity_sold > 0 and date_part('day', pb.last_sale_date - pb.first_sale_date) > 0
-        then pb.total_quantity_sold / (date_part('day', pb.last_sale_date - pb.first_sale_date) / 30.0)
+        when pb.total_quantity_sold > 0 and (pb.last_sale_date::date - pb.first_sale_date::date) > 0
+        then pb.total_quantity_sold / ((pb.last_sale_date::date - pb.first_sale_date::date) / 30.0)
         else 0
     end as monthly_sales_velocity,
     
@@ -167,8 +167,8 @@ select
     
     -- Days of inventory
     case
-        when pb.total_quantity_sold > 0 and date_part('day', pb.last_sale_date - pb.first_sale_date) > 0
-        then (pi.total_inventory_quantity / (pb.total_quantity_sold / (date_part('day', pb.last_sale_date - pb.first_sale_date) / 30.0))) * 30
+        when pb.total_quantity_sold > 0 and (pb.last_sale_date::date - pb.first_sale_date::date) > 0
+        then (pi.total_inventory_quantity / (pb.total_quantity_sold / ((pb.last_sale_date::date - pb.first_sale_date::date) / 30.0))) * 30
         else null
     end as days_of_inventory,
     
@@ -180,16 +180,17 @@ select
         else 0
     end as profit_margin_percent_calculated,
     
-    -- Product lifecycle
-    date_part('day', current_date - pb.first_sale_date) as days_since_first_sale,
-    date_part('day', current_date - pb.last_sale_date) as days_since_last_sale,
+    -- Product lifecycle (anchored to the report date, like the customer RFM scores)
+    rd.report_date - pb.first_sale_date::date as days_since_first_sale,
+    rd.report_date - pb.last_sale_date::date as days_since_last_sale,
     case
-        when pb.last_sale_date < current_date - interval '90 days' then 'Declining'
-        when pb.last_sale_date < current_date - interval '30 days' then 'Stable'
+        when pb.last_sale_date::date < rd.report_date - 90 then 'Declining'
+        when pb.last_sale_date::date < rd.report_date - 30 then 'Stable'
         else 'Active'
     end as product_lifecycle_stage
     
 from product_base pb
+cross join {{ ref('dim_report_date') }} rd
 left join product_inventory pi on pb.productid = pi.product_key
 left join product_customer_analysis pca on pb.productid = pca.product_key
 left join top_related_product trp on pb.productid = trp.product_id
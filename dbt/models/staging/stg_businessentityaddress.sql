@@ -1,4 +1,4 @@
-{{ config(materialized='view') }}
+{{ config(**staging_config('stg_businessentityaddress')) }}
 
 select
     "rowguid" as rowguid,
@@ -1,4 +1,4 @@
-{{ config(materialized='view') }}
+{{ config(**staging_config('stg_stateprovince')) }}
 
 select
     "Name" as name,
@@ -1,4 +1,4 @@
-{{ config(materialized='view') }}
+{{ config(**staging_config('stg_vjobcandidateeducation')) }}
 
 select
     "Edu_GPA" as edu_gpa,
@@ -1,4 +1,4 @@
-{{ config(materialized='view') }}
+{{ config(**staging_config('stg_vjobcandidateemployment')) }}
 
 select
     "Emp_EndDate" as emp_enddate,
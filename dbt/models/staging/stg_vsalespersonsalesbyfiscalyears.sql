@@ -1,4 +1,4 @@
-{{ config(materialized='view') }}
+{{ config(**staging_config('stg_vsalespersonsalesbyfiscalyears')) }}
 
 select
     "_2002" as _2002,
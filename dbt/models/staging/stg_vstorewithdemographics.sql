@@ -1,4 +1,4 @@
-{{ config(materialized='view') }}
+{{ config(**staging_config('stg_vstorewithdemographics')) }}
 
 select
     "Name" as name,
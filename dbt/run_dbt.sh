@@ -20,8 +20,53 @@ source venv/bin/activate
 # Set DBT_PROFILES_DIR to current directory so dbt uses local profiles.yml
 export DBT_PROFILES_DIR="$SCRIPT_DIR"
 
+# Optional build profile (must come before the dbt command):
+#   standard - all tables logged (default)
+#   unlogged - dimensions and facts built as UNLOGGED tables to cut WAL volume;
+#              marts stay logged. See README.md "Build Profiles".
+#   ./run_dbt.sh --build-profile unlogged run
+if [[ "$1" == "--build-profile" ]]; then
+    export DBT_BUILD_PROFILE="$2"
+    shift 2
+fi
+export DBT_BUILD_PROFILE="${DBT_BUILD_PROFILE:-standard}"
+
+if [[ "$DBT_BUILD_PROFILE" != "standard" && "$DBT_BUILD_PROFILE" != "unlogged" ]]; then
+    echo "❌ Unknown build profile: $DBT_BUILD_PROFILE (expected: standard, unlogged)"
+    exit 1
+fi
+echo "🏗️  Build profile: $DBT_BUILD_PROFILE"
+
+# Incremental models (dim_date, dim_customer_rfm, ...) keep the table they were
+# created with, so a profile switch only takes effect on a full refresh.
+# target/build_profile records the profile of the last complete run/build.
+PROFILE_MARKER="target/build_profile"
+DBT_ARGS=("$@")
+RECORD_PROFILE=false
+if [[ "$1" == "run" || "$1" == "build" ]]; then
+    RECORD_PROFILE=true
+    FULL_REFRESH=false
+    for arg in "$@"; do
+        case "$arg" in
+            --full-refresh) FULL_REFRESH=true ;;
+            # A partial run does not rebuild every incremental model
+            -s|--select|-m|--models|--exclude|--selector) RECORD_PROFILE=false ;;
+        esac
+    done
+    LAST_PROFILE="$(cat "$PROFILE_MARKER" 2>/dev/null || true)"
+    if [[ -n "$LAST_PROFILE" && "$LAST_PROFILE" != "$DBT_BUILD_PROFILE" && "$FULL_REFRESH" == false ]]; then
+        echo "🔁 Build profile changed ($LAST_PROFILE -> $DBT_BUILD_PROFILE): adding --full-refresh"
+        DBT_ARGS+=(--full-refresh)
+    fi
+fi
+
 # Run dbt with all passed arguments
-dbt "$@"
+dbt "${DBT_ARGS[@]}"
+
+if [[ "$RECORD_PROFILE" == true ]]; then
+    mkdir -p target
+    echo "$DBT_BUILD_PROFILE" > "$PROFILE_MARKER"
+fi
 
 # After successful dbt run/build, regenerate AI schema and sync components
 # This keeps all AI components in sync with your dbt models:
@@ -34,4 +79,8 @@ if [[ "$1" == "run" || "$1" == "build" ]]; then
     echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
     python scripts/generate_ai_schema.py
     echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
+    echo ""
+    # Record per-model timings and report critical path / regressions
+    python scripts/build_profiler.py || echo "⚠️  Build profiler failed (dbt run itself succeeded)"
+    echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
 fi
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+dbt Build Profiler
+==================
+Reads target/run_results.json and target/manifest.json after a dbt run and:
+1. Appends per-model execution times to a local history store
+2. Computes the critical path through the model DAG
+3. Flags models that regressed against a rolling baseline
+4. Simulates the run at different thread counts and recommends one
+
+This script is automatically run after `./run_dbt.sh run` and `./run_dbt.sh build`.
+
+Usage:
+    python scripts/build_profiler.py
+    python scripts/build_profiler.py --no-record    # analyse without appending history
+    python scripts/build_profiler.py --top 20       # show more slow models
+    python scripts/build_profiler.py --threads 8    # override the thread count of the run
+
+The run's thread count comes from --threads, else from run_results.json (set
+when the run passed --threads), else from the target in profiles.yml.
+
+Output:
+    logs/build_history.jsonl (one line per model per run)
+"""
+
+import os
+import re
+import sys
+import json
+import heapq
+import argparse
+import statistics
+from pathlib import Path
+from datetime import datetime
+
+# Regression detection defaults
+BASELINE_RUNS = 10          # rolling window of previous runs per model
+REGRESSION_FACTOR = 1.5     # flag if slower than baseline median x factor
+REGRESSION_MIN_SECONDS = 1.0  # ...and slower by at least this many seconds
+MAX_THREADS = 16
+
+
+def load_json(path: Path) -> dict:
+    """Load a dbt artifact, exiting with a readable message if missing."""
+    if not path.exists():
+        print(f"❌ {path} not found. Run dbt first.")
+        sys.exit(1)
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def read_yaml_scalars(path: Path) -> dict:
+    """
+    Scalar values of a simple YAML file by key path, without a YAML dependency,
+    e.g. {('data_warehouse', 'outputs', 'dev', 'threads'): '4'}.
+    """
+    values = {}
+    stack = []  # (indent, key) of the enclosing mappings
+    for line in path.read_text().splitlines():
+        match = re.match(r'^(\s*)([\w-]+):\s*(.*?)\s*(?:#.*)?$', line)
+        if not match:
+            continue
+        indent, key, value = len(match.group(1)), match.group(2), match.group(3)
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        keys = tuple(k for _, k in stack) + (key,)
+        if value:
+            values[keys] = value.strip('\'"')
+        else:
+            stack.append((indent, key))
+    return values
+
+
+def profile_threads(dbt_path: Path, run_args: dict):
+    """Thread count of the run's target in profiles.yml, or None if not found."""
+    project = read_yaml_scalars(dbt_path / 'dbt_project.yml')
+    profile = project.get(('profile',))
+    profiles_dirs = [run_args.get('profiles_dir'), os.getenv('DBT_PROFILES_DIR'), dbt_path, Path.home() / '.dbt']
+    for profiles_dir in filter(None, profiles_dirs):
+        profiles_path = Path(profiles_dir) / 'profiles.yml'
+        if not profile or not profiles_path.exists():
+            continue
+        profiles = read_yaml_scalars(profiles_path)
+        target = run_args.get('target') or profiles.get((profile, 'target'))
+        threads = profiles.get((profile, 'outputs', target, 'threads'))
+        if threads and threads.isdigit():
+            return int(threads)
+    return None
+
+
+def short_name(unique_id: str) -> str:
+    """model.data_warehouse.dim_customer -> dim_customer"""
+    return unique_id.split('.')[-1]
+
+
+def extract_timings(run_results: dict) -> dict:
+    """Return {unique_id: execution_time} for successfully executed models."""
+    timings = {}
+    for result in run_results.get('results', []):
+        unique_id = result.get('unique_id', '')
+        if not unique_id.startswith('model.'):
+            continue
+        if result.get('status') not in ('success', 'pass'):
+            continue
+        timings[unique_id] = float(result.get('execution_time') or 0.0)
+    return timings
+
+
+def build_dag(manifest: dict, nodes: set) -> dict:
+    """Return {unique_id: [parent unique_ids]} restricted to the executed models."""
+    parent_map = manifest.get('parent_map', {})
+    return {
+        node: [parent for parent in parent_map.get(node, []) if parent in nodes]
+        for node in nodes
+    }
+
+
+def topological_order(dag: dict) -> list:
+    """Kahn's algorithm over {node: parents}."""
+    children = {node: [] for node in dag}
+    indegree = {node: len(parents) for node, parents in dag.items()}
+    for node, parents in dag.items():
+        for parent in parents:
+            children[parent].append(node)
+
+    ready = sorted(node for node, degree in indegree.items() if degree == 0)
+    order = []
+    while ready:
+        node = ready.pop()
+        order.append(node)
+        for child in children[node]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                ready.append(child)
+    return order
+
+
+def critical_path(dag: dict, timings: dict) -> tuple:
+    """
+    Longest execution-time path through the DAG.
+
+    Returns:
+        Tuple of (path as list of unique_ids, total seconds)
+    """
+    finish = {}
+    best_parent = {}
+    for node in topological_order(dag):
+        parents = dag[node]
+        start = 0.0
+        best_parent[node] = None
+        for parent in parents:
+            if finish[parent] > start:
+                start = finish[parent]
+                best_parent[node] = parent
+        finish[node] = start + timings.get(node, 0.0)
+
+    if not finish:
+        return [], 0.0
+
+    end = max(finish, key=finish.get)
+    path = []
+    node = end
+    while node is not None:
+        path.append(node)
+        node = best_parent[node]
+    return list(reversed(path)), finish[end]
+
+
+def simulate_makespan(dag: dict, timings: dict, threads: int) -> float:
+    """
+    Estimate wall-clock time of the run with N threads.
+    dbt starts any model whose parents are done; ties go to the longest model.
+    """
+    children = {node: [] for node in dag}
+    remaining = {node: len(parents) for node, parents in dag.items()}
+    for node, parents in dag.items():
+        for parent in parents:
+            children[parent].append(node)
+
+    ready = [(-timings.get(node, 0.0), node) for node, count in remaining.items() if count == 0]
+    heapq.heapify(ready)
+    running = []  # (finish_time, node)
+    clock = 0.0
+
+    while ready or running:
+        while ready and len(running) < threads:
+            neg_duration, node = heapq.heappop(ready)
+            heapq.heappush(running, (clock - neg_duration, node))
+        clock, node = heapq.heappop(running)
+        for child in children[node]:
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                heapq.heappush(ready, (-timings.get(child, 0.0), child))
+
+    return clock
+
+
+def recommend_threads(dag: dict, timings: dict, current_threads: int) -> tuple:
+    """
+    Simulate thread counts and pick the smallest within 5% of the best makespan.
+
+    Returns:
+        Tuple of (recommended thread count, {threads: makespan})
+    """
+    makespans = {}
+    for threads in range(1, MAX_THREADS + 1):
+        makespans[threads] = simulate_makespan(dag, timings, threads)
+        # Past the DAG's available parallelism more threads change nothing
+        if threads > 1 and makespans[threads] == makespans[threads - 1] and threads > current_threads:
+            break
+
+    best = min(makespans.values())
+    recommended = min(t for t, span in makespans.items() if span <= best * 1.05)
+    return recommended, makespans
+
+
+def load_history(history_path: Path) -> list:
+    """Load all history records (one JSON object per line)."""
+    if not history_path.exists():
+        return []
+    records = []
+    with open(history_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return records
+
+
+def append_history(history_path: Path, invocation_id: str, generated_at: str,
+                   threads: int, timings: dict):
+    """Append this run's model timings to the history store."""
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(history_path, 'a') as f:
+        for unique_id, seconds in sorted(timings.items()):
+            f.write(json.dumps({
+                'invocation_id': invocation_id,
+                'generated_at': generated_at,
+                'threads': threads,
+                'model': short_name(unique_id),
+                'execution_time': round(seconds, 3),
+            }) + '\n')
+
+
+def find_regressions(history: list, invocation_id: str, timings: dict) -> list:
+    """
+    Compare each model against the median of its previous BASELINE_RUNS runs.
+
+    Returns:
+        List of (model, current seconds, baseline seconds) sorted by slowdown
+    """
+    previous = {}
+    for record in history:
+        if record.get('invocation_id') == invocation_id:
+            continue
+        previous.setdefault(record['model'], []).append(record['execution_time'])
+
+    regressions = []
+    for unique_id, seconds in timings.items():
+        model = short_name(unique_id)
+        samples = previous.get(model, [])[-BASELINE_RUNS:]
+        if len(samples) < 3:
+            continue
+        baseline = statistics.median(samples)
+        if seconds > baseline * REGRESSION_FACTOR and seconds - baseline >= REGRESSION_MIN_SECONDS:
+            regressions.append((model, seconds, baseline))
+
+    return sorted(regressions, key=lambda r: r[1] - r[2], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the last dbt run")
+    parser.add_argument('--no-record', action='store_true', help="Do not append this run to the history store")
+    parser.add_argument('--top', type=int, default=10, help="Number of slowest models to show")
+    parser.add_argument('--threads', type=int, help="Thread count of the run (default: run_results.json, then profiles.yml)")
+    args = parser.parse_args()
+
+    dbt_path = Path(__file__).parent.parent
+    target_path = dbt_path / 'target'
+    history_path = dbt_path / 'logs' / 'build_history.jsonl'
+
+    run_results = load_json(target_path / 'run_results.json')
+    manifest = load_json(target_path / 'manifest.json')
+
+    metadata = run_results.get('metadata', {})
+    invocation_id = metadata.get('invocation_id', datetime.now().isoformat())
+    generated_at = metadata.get('generated_at', datetime.now().isoformat())
+    run_args = run_results.get('args', {})
+    threads = args.threads or run_args.get('threads') or profile_threads(dbt_path, run_args) or 1
+    threads = int(threads)
+    elapsed = float(run_results.get('elapsed_time') or 0.0)
+
+    timings = extract_timings(run_results)
+    if not timings:
+        print("⚠️  No successful model executions in run_results.json")
+        return
+
+    print("⏱️  Profiling dbt run...")
+    total_work = sum(timings.values())
+    print(f"   Models: {len(timings)}, threads: {threads}, wall clock: {elapsed:.1f}s, total model time: {total_work:.1f}s")
+
+    # Slowest models
+    print(f"\n🐢 Slowest {min(args.top, len(timings))} models:")
+    for unique_id, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        share = (seconds / total_work * 100) if total_work else 0
+        print(f"   {seconds:8.2f}s  {share:5.1f}%  {short_name(unique_id)}")
+
+    # Critical path
+    dag = build_dag(manifest, set(timings))
+    path, path_seconds = critical_path(dag, timings)
+    print(f"\n🧵 Critical path ({path_seconds:.1f}s, {len(path)} models):")
+    print("   " + " → ".join(short_name(node) for node in path))
+
+    # Parallelism
+    parallelism = total_work / path_seconds if path_seconds else 1.0
+    recommended, makespans = recommend_threads(dag, timings, threads)
+    print(f"\n⚙️  Average available parallelism: {parallelism:.1f} (total model time / critical path)")
+    print("   Simulated wall clock by thread count:")
+    for count, span in makespans.items():
+        markers = []
+        if count == threads:
+            markers.append('current')
+        if count == recommended:
+            markers.append('recommended')
+        suffix = f"  ← {', '.join(markers)}" if markers else ''
+        print(f"   {count:>3} threads: {span:8.1f}s{suffix}")
+    if path_seconds >= makespans[recommended] * 0.95:
+        print("   More threads will not help: the run is bound by the critical path.")
+        print("   Speed up the models on the critical path instead.")
+
+    # History and regressions
+    history = load_history(history_path)
+    regressions = find_regressions(history, invocation_id, timings)
+    if regressions:
+        print(f"\n🚨 Regressions vs median of last {BASELINE_RUNS} runs:")
+        for model, seconds, baseline in regressions:
+            print(f"   {model}: {seconds:.2f}s (baseline {baseline:.2f}s, {seconds / baseline:.1f}x)")
+    else:
+        print("\n✅ No regressions against the rolling baseline")
+
+    if not args.no_record:
+        if any(record.get('invocation_id') == invocation_id for record in history):
+            print(f"   Run {invocation_id} already recorded in {history_path.name}")
+        else:
+            append_history(history_path, invocation_id, generated_at, threads, timings)
+            print(f"📝 Recorded {len(timings)} model timings in logs/{history_path.name}")
+
+
+if __name__ == '__main__':
+    main()
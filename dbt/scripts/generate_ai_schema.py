@@ -9,8 +9,24 @@ Reads all dbt _schema.yml files and generates:
 This script is automatically run after `dbt run` to keep the AI context
 in sync with your dbt models.
 
+Runs are incremental: target/ai_schema_cache.json keeps a hash and the parsed
+models of every schema file, so only changed files are re-parsed, and nothing
+is regenerated when no input changed. Outputs are only written when their
+content (ignoring the generation timestamp) changed, so the bind-mounted
+schema_ai.md keeps its bytes and downstream prompt caches stay warm.
+
+schema_ai.md is sent as the system prompt on every AI question, so it is kept
+within a token budget (--token-budget, default AI_SCHEMA_TOKEN_BUDGET or 6000),
+counted with a local tokenizer (--tokenizer: tiktoken[:encoding],
+hf:<tokenizer.json>, approx; default auto). When over budget, the lowest-value
+mart columns and dimension/fact entries are dropped first, ranked by how often
+they appear in the AI query log (streamlit/logs/ai_query_log.jsonl) and by
+their descriptions. What was dropped is listed in target/ai_schema_budget.json.
+
 Usage:
     python scripts/generate_ai_schema.py
+    python scripts/generate_ai_schema.py --force   # ignore the cache, rewrite outputs
+    python scripts/generate_ai_schema.py --token-budget 4000 --tokenizer tiktoken:o200k_base
 
 Output:
     models/schema_ai.md
@@ -18,8 +34,13 @@ Output:
 """
 
 import os
+import re
 import sys
 import json
+import math
+import argparse
+import hashlib
+from collections import Counter
 from pathlib import Path
 from datetime import datetime
 
@@ -30,12 +51,49 @@ except ImportError:
     print("❌ PyYAML not installed. Run: pip install pyyaml")
     sys.exit(1)
 
+# libyaml-backed loader when PyYAML was built with it (much faster), else pure Python
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+CACHE_VERSION = 1
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv('AI_SCHEMA_TOKEN_BUDGET', '6000'))
+
+# Columns of each mart that are never pruned (highest ranked first)
+MIN_MART_COLUMNS = 5
+
+# Lines that change on every run and are ignored when comparing outputs
+VOLATILE_MD_LINE = re.compile(r'^> \*Auto-generated on .*$', re.MULTILINE)
+VOLATILE_JSON_LINE = re.compile(r'^\s*"_generated": .*$', re.MULTILINE)
+
+# How to use a mart, rendered after its column table (never pruned)
+ROLLUP_RULES = """**⚡ ROLLUP RULES:**
+- Totals: `SUM(metric_sum)`
+- Averages: `SUM(metric_sum) / NULLIF(SUM(metric_count), 0)` (NOT `AVG(metric_sum)`)
+- Min / max: `MIN(metric_min)`, `MAX(metric_max)`
+- There is no customer_key: use mart_metrics for per-customer metrics"""
+
+MART_NOTES = {
+    'mart_metrics': """**⚠️ IMPORTANT**: Only `metric_value` is numeric! Do NOT use AVG/SUM on `metric_target`, `alert_criteria`, or `recommended_actions` - they are TEXT.
+
+**📊 FORMAT VALUES BY `metric_unit`:**
+| metric_unit | Format | Example |
+|-------------|--------|---------|
+| USD | Currency with $ and commas | $1,234,567.89 |
+| Percent | Percentage with % | 85.5% |
+| Count | Integer with commas | 1,234 |
+| Days | Number + "days" | 5.2 days |
+| Hours | Number + "hours" | 48 hours |
+| Ratio | Decimal (2 places) | 1.25 |""",
+    'mart_metrics_daily': ROLLUP_RULES,
+    'mart_metrics_monthly': ROLLUP_RULES,
+}
+
 
 def load_yaml_file(path: Path) -> dict:
     """Load a YAML file and return its contents."""
     try:
         with open(path, 'r') as f:
-            return yaml.safe_load(f) or {}
+            return yaml.load(f, Loader=YAML_LOADER) or {}
     except Exception as e:
         print(f"⚠️  Warning: Could not load {path}: {e}")
         return {}
@@ -64,24 +122,79 @@ def load_dbt_profile(dbt_path: Path) -> dict:
     return default
 
 
-def load_all_schemas(models_path: Path) -> dict:
-    """Load all _schema.yml files and return consolidated model info."""
+def file_hash(path: Path) -> str:
+    """SHA-256 of a file's bytes."""
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def find_schema_files(models_path: Path) -> list:
+    """All schema YAML files under models/, in a stable order."""
+    return sorted(models_path.glob('**/*schema*.yml'))
+
+
+def load_cache(cache_path: Path) -> dict:
+    """Load the schema file cache ({} if missing, unreadable or outdated)."""
+    try:
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if cache.get('version') == CACHE_VERSION else {}
+
+
+def save_cache(cache_path: Path, cache: dict):
+    """Save the schema file cache."""
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_path, 'w') as f:
+        json.dump(cache, f, default=str)
+
+
+def inputs_fingerprint(dbt_path: Path, file_hashes: dict) -> str:
+    """Hash of everything the outputs depend on: schema files, profile and this script."""
+    digest = hashlib.sha256()
+    for path in (Path(__file__), dbt_path / 'profiles.yml'):
+        if path.exists():
+            digest.update(file_hash(path).encode())
+    for name, value in sorted(file_hashes.items()):
+        digest.update(f"{name}:{value}".encode())
+    return digest.hexdigest()
+
+
+def load_all_schemas(models_path: Path, file_hashes: dict = None, cache: dict = None) -> dict:
+    """
+    Load all _schema.yml files and return consolidated model info.
+
+    With a cache ({'files': {path: {'hash', 'models'}}}), files whose hash is
+    unchanged are not re-parsed; the cache is updated in place.
+    """
     schemas = {}
-    
-    # Find all schema files
-    schema_files = list(models_path.glob('**/*schema*.yml'))
-    
-    for schema_file in schema_files:
-        content = load_yaml_file(schema_file)
-        if 'models' in content:
-            for model in content['models']:
-                model_name = model.get('name', '')
-                if model_name:
-                    schemas[model_name] = {
-                        'description': model.get('description', ''),
-                        'columns': model.get('columns', []),
-                        'source_file': str(schema_file)
-                    }
+    cached_files = (cache or {}).get('files', {})
+    files = {}
+    parsed = 0
+    
+    for schema_file in find_schema_files(models_path):
+        key = str(schema_file.relative_to(models_path))
+        digest = (file_hashes or {}).get(key) or file_hash(schema_file)
+        entry = cached_files.get(key)
+        if entry and entry.get('hash') == digest:
+            models = entry['models']
+        else:
+            models = load_yaml_file(schema_file).get('models') or []
+            parsed += 1
+        files[key] = {'hash': digest, 'models': models}
+        
+        for model in models:
+            model_name = model.get('name', '')
+            if model_name:
+                schemas[model_name] = {
+                    'description': model.get('description', ''),
+                    'columns': model.get('columns', []),
+                    'source_file': str(schema_file)
+                }
+    
+    if cache is not None:
+        cache['files'] = files
+    print(f"   Parsed {parsed} of {len(files)} schema files ({len(files) - parsed} cached)")
     
     return schemas
 
@@ -134,23 +247,34 @@ def get_allowed_tables(categories: dict) -> list:
     return sorted(allowed)
 
 
-def format_columns_table(columns: list, max_cols: int = 30) -> str:
-    """Format columns as a markdown table."""
+def format_columns_table(columns: list, hidden: int = 0) -> str:
+    """
+    Format columns as a markdown table (`hidden` columns were pruned for the token budget).
+    
+    A Type column is added when the schema declares `data_type` for any column.
+    """
     if not columns:
         return ""
     
-    lines = ["| Column | Description |", "|--------|-------------|"]
+    typed = any(col.get('data_type') for col in columns)
+    if typed:
+        lines = ["| Column | Type | Description |", "|--------|------|-------------|"]
+    else:
+        lines = ["| Column | Description |", "|--------|-------------|"]
     
-    for col in columns[:max_cols]:
+    for col in columns:
         name = col.get('name', '')
         desc = col.get('description', '').replace('|', '\\|').replace('\n', ' ')
         # Truncate long descriptions
         if len(desc) > 60:
             desc = desc[:57] + "..."
-        lines.append(f"| {name} | {desc} |")
+        if typed:
+            lines.append(f"| {name} | {str(col.get('data_type') or '').upper()} | {desc} |")
+        else:
+            lines.append(f"| {name} | {desc} |")
     
-    if len(columns) > max_cols:
-        lines.append(f"| ... | ({len(columns) - max_cols} more columns) |")
+    if hidden:
+        lines.append(f"| ... |{' |' if typed else ''} ({hidden} more columns) |")
     
     return '\n'.join(lines)
 
@@ -167,6 +291,8 @@ def generate_mart_quick_reference(marts: list, schemas: dict) -> str:
         'mart_operations': 'Purchase orders, work orders',
         'mart_employee_territory_performance': 'Quotas, performance',
         'mart_metrics': '⭐ **ALL METRICS** with definitions, targets, categories',
+        'mart_metrics_daily': '⚡ Metric trends by day (pre-aggregated sum/count/min/max)',
+        'mart_metrics_monthly': '⚡ Metric trends by month (pre-aggregated sum/count/min/max)',
     }
     
     for mart in marts:
@@ -182,8 +308,13 @@ def generate_mart_quick_reference(marts: list, schemas: dict) -> str:
     return '\n'.join(lines)
 
 
-def generate_schema_md(dbt_path: Path, schemas: dict, categories: dict) -> str:
-    """Generate the optimized schema_ai.md content."""
+def generate_schema_md(dbt_path: Path, schemas: dict, categories: dict, dropped: set = frozenset()) -> str:
+    """
+    Generate the optimized schema_ai.md content.
+    
+    `dropped` holds pruned entries: (table, column) for mart columns and
+    (table, None) for dimension/fact entries.
+    """
     profile = load_dbt_profile(dbt_path)
     
     # Build the markdown content
@@ -193,6 +324,8 @@ def generate_schema_md(dbt_path: Path, schemas: dict, categories: dict) -> str:
 > 
 > *Auto-generated on {datetime.now().strftime('%Y-%m-%d %H:%M')} by generate_ai_schema.py*
 
+⚠️ **IMPORTANT: Use EXACT table names below. Names are SINGULAR (e.g., `dim_metric` NOT `dim_metrics`).**
+
 ## Quick Reference
 
 {generate_mart_quick_reference(categories['marts'], schemas)}
@@ -208,8 +341,11 @@ def generate_schema_md(dbt_path: Path, schemas: dict, categories: dict) -> str:
         if table in schemas:
             schema = schemas[table]
             desc = schema['description'].split('\n')[0] if schema['description'] else ''
+            columns = [c for c in schema['columns'] if (table, c.get('name', '')) not in dropped]
             content += f"### {table}\n\n{desc}\n\n"
-            content += format_columns_table(schema['columns']) + "\n\n"
+            content += format_columns_table(columns, len(schema['columns']) - len(columns)) + "\n\n"
+            if table in MART_NOTES:
+                content += MART_NOTES[table] + "\n\n"
     
     # Add common queries section
     content += """---
@@ -237,13 +373,26 @@ FROM mart_customer_analytics GROUP BY customer_segment
 SELECT product_name, total_revenue, profit_margin_percent 
 FROM mart_product_analytics ORDER BY total_revenue DESC LIMIT 10
 
--- All metrics values (USE mart_metrics!)
-SELECT metric_name, metric_category, metric_value, metric_unit, report_date
+-- All metrics with values and descriptions (USE mart_metrics!)
+SELECT metric_name, metric_category, metric_value, metric_unit, metric_target, recommended_actions
 FROM mart_metrics ORDER BY metric_category, metric_name
 
--- Metrics by category
-SELECT metric_category, COUNT(*) as metric_count, AVG(metric_value) as avg_value
+-- Metrics aggregated by category (ONLY aggregate metric_value, not text columns!)
+SELECT metric_category, 
+       COUNT(*) as metric_count, 
+       AVG(metric_value) as avg_value,
+       SUM(metric_value) as total_value
 FROM mart_metrics GROUP BY metric_category ORDER BY metric_count DESC
+
+-- Business performance summary (show metrics with their targets and actions)
+SELECT metric_category, metric_name, metric_value, metric_unit, metric_target, recommended_actions
+FROM mart_metrics WHERE metric_level IN ('L4_Strategic', 'L5_KPI')
+ORDER BY metric_category, metric_name
+
+-- Metric trend by month (USE the rollups for time series, not mart_metrics)
+SELECT year, month, SUM(metric_sum) as revenue
+FROM mart_metrics_monthly WHERE metric_key = 'SO_REVENUE' AND territory_key = 1
+GROUP BY year, month ORDER BY year, month
 ```
 
 ---
@@ -271,7 +420,7 @@ JOIN dim_customer dc ON fact.customer_key = dc.customerid  -- NOT dc.customer_ke
     
     # Add dimension tables (condensed)
     for table in categories['dimensions']:
-        if table in schemas:
+        if table in schemas and (table, None) not in dropped:
             schema = schemas[table]
             cols = [c.get('name', '') for c in schema['columns'][:10]]
             content += f"### {table}\n`{', '.join(cols)}`\n\n"
@@ -284,7 +433,7 @@ JOIN dim_customer dc ON fact.customer_key = dc.customerid  -- NOT dc.customer_ke
 """
     
     for table in categories['facts']:
-        if table in schemas:
+        if table in schemas and (table, None) not in dropped:
             schema = schemas[table]
             desc = schema['description'].split('\n')[0] if schema['description'] else ''
             content += f"### {table}\n{desc}\n\n"
@@ -294,13 +443,15 @@ JOIN dim_customer dc ON fact.customer_key = dc.customerid  -- NOT dc.customer_ke
 
 ## SQL Guidelines
 
-1. **Always use mart tables** - they have everything pre-joined
-2. **Use mart_metrics for any metric queries** - it has all metric definitions
-3. Use `SUM()`, `AVG()`, `COUNT()` for aggregations
-4. Include `ORDER BY` for sorted results
-5. Use `LIMIT` for top-N (default 10-20)
-6. Filter NULLs: `WHERE column IS NOT NULL`
-7. Time filters: `WHERE order_year = 2014`
+1. **Use EXACT table names** - `dim_metric` NOT `dim_metrics`, `mart_sales` NOT `mart_sale`
+2. **Always use mart tables** - they have everything pre-joined
+3. **Use mart_metrics for any metric queries** - it has all metric definitions
+   - For metric trends by day/month use `mart_metrics_daily` / `mart_metrics_monthly` (`metric_sum`, `metric_count`, `metric_min`, `metric_max`)
+4. Use `SUM()`, `AVG()`, `COUNT()` for aggregations (only on numeric columns!)
+5. Include `ORDER BY` for sorted results
+6. Use `LIMIT` for top-N (default 10-20)
+7. Filter NULLs: `WHERE column IS NOT NULL`
+8. Time filters: `WHERE order_year = 2014`
 
 ## Response Format
 
@@ -311,27 +462,200 @@ If the question cannot be answered, respond with: `-- ERROR: [reason]`
     return content
 
 
-def generate_allowed_tables_json(allowed_tables: list, output_path: Path):
-    """Generate allowed_tables.json for SQL validator."""
+def approx_token_count(text: str) -> int:
+    """Tokenizer-free estimate: words in ~4-character pieces plus one token per symbol."""
+    words = re.findall(r'\w+', text)
+    symbols = re.findall(r'[^\w\s]', text)
+    return sum(math.ceil(len(w) / 4) for w in words) + len(symbols)
+
+
+def get_token_counter(spec: str):
+    """
+    Return (name, count_function) for a tokenizer spec:
+    tiktoken[:encoding], hf:<path to tokenizer.json>, approx, or auto
+    (tiktoken if installed and its encoding is available, else approx).
+    """
+    kind, _, arg = spec.partition(':')
+    
+    if kind in ('auto', 'tiktoken'):
+        try:
+            import tiktoken
+            encoding = tiktoken.get_encoding(arg or 'o200k_base')
+            return f"tiktoken:{encoding.name}", lambda text: len(encoding.encode(text, disallowed_special=()))
+        except Exception as e:
+            if kind == 'tiktoken':
+                print(f"❌ tiktoken tokenizer unavailable: {e}. Run: pip install tiktoken")
+                sys.exit(1)
+    
+    if kind == 'hf':
+        try:
+            from tokenizers import Tokenizer
+            tokenizer = Tokenizer.from_file(arg)
+        except Exception as e:
+            print(f"❌ Could not load tokenizer {arg}: {e}. Run: pip install tokenizers")
+            sys.exit(1)
+        return f"hf:{Path(arg).name}", lambda text: len(tokenizer.encode(text).ids)
+    
+    if kind in ('auto', 'approx'):
+        return 'approx', approx_token_count
+    
+    print(f"❌ Unknown tokenizer: {spec} (use tiktoken[:encoding], hf:<tokenizer.json>, approx or auto)")
+    sys.exit(1)
+
+
+def load_query_log(log_path: Path) -> list:
+    """Identifier sets of the successful queries in the AI query log."""
+    queries = []
+    if not log_path.exists():
+        return queries
+    with open(log_path, 'r') as f:
+        for line in f:
+            try:
+                sql = json.loads(line).get('sql') or ''
+            except ValueError:
+                continue
+            if sql:
+                queries.append(set(re.findall(r'[a-z_][a-z0-9_]*', sql.lower())))
+    return queries
+
+
+def description_value(item: dict) -> float:
+    """How much an entry's description tells the model (0 none, 1 short, 1.5 detailed)."""
+    desc = str(item.get('description') or '').strip()
+    if not desc:
+        return 0.0
+    return 1.5 if len(desc) > 40 else 1.0
+
+
+def rank_prune_candidates(schemas: dict, categories: dict, queries: list) -> list:
+    """
+    Entries that may be pruned, lowest value first.
+    
+    Value = 10 x number of logged queries using the entry + description value
+    (+1 for key columns, which are needed for joins). The MIN_MART_COLUMNS
+    best columns of each mart and the mart tables themselves are never pruned.
+    """
+    table_usage = Counter()
+    column_usage = Counter()
+    for idents in queries:
+        for table in schemas:
+            if table in idents:
+                table_usage[table] += 1
+                for col in schemas[table]['columns']:
+                    if col.get('name', '').lower() in idents:
+                        column_usage[(table, col.get('name', ''))] += 1
+    
+    candidates = []
+    for table in categories['marts']:
+        if table not in schemas:
+            continue
+        scored = []
+        for position, col in enumerate(schemas[table]['columns']):
+            name = col.get('name', '')
+            is_key = name.endswith(('_key', 'id')) or name == 'id'
+            score = 10 * column_usage[(table, name)] + description_value(col) + (1 if is_key else 0)
+            # Earlier columns win ties: the YAML lists the most important ones first
+            scored.append((score, -position, (table, name)))
+        scored.sort(reverse=True)
+        candidates.extend((score, -neg_pos, key) for score, neg_pos, key in scored[MIN_MART_COLUMNS:])
+    
+    for table in categories['dimensions'] + categories['facts']:
+        if table in schemas:
+            score = 10 * table_usage[table] + description_value(schemas[table])
+            candidates.append((score, 0, (table, None)))
+    
+    # Lowest value first; among equals, later columns first
+    candidates.sort(key=lambda c: (c[0], -c[1]))
+    return candidates
+
+
+def fit_to_budget(render, count_tokens, budget: int, candidates: list):
+    """
+    Drop the fewest lowest-value candidates so render(dropped) fits the budget.
+    Binary search over the number of dropped entries. Returns (content, tokens, dropped list).
+    """
+    content = render(frozenset())
+    tokens = count_tokens(content)
+    if not budget or tokens <= budget:
+        return content, tokens, []
+    
+    keys = [key for _, _, key in candidates]
+    low, high = 1, len(keys)
+    best = None
+    while low <= high:
+        mid = (low + high) // 2
+        trial = render(frozenset(keys[:mid]))
+        trial_tokens = count_tokens(trial)
+        if trial_tokens <= budget:
+            best = (trial, trial_tokens, candidates[:mid])
+            high = mid - 1
+        else:
+            low = mid + 1
+    
+    if best is None:
+        # Even dropping everything prunable does not fit: emit the smallest version
+        trial = render(frozenset(keys))
+        return trial, count_tokens(trial), candidates
+    return best
+
+
+def write_budget_report(report_path: Path, report: dict):
+    """Save what was pruned to fit the token budget."""
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def write_if_changed(path: Path, content: str, volatile: re.Pattern = None) -> bool:
+    """
+    Write content unless the file already holds it (ignoring `volatile` lines,
+    e.g. the generation timestamp). Returns True if the file was written.
+    """
+    if path.exists():
+        existing = path.read_text()
+        if volatile is not None:
+            existing = volatile.sub('', existing)
+            compare = volatile.sub('', content)
+        else:
+            compare = content
+        if existing == compare:
+            return False
+    with open(path, 'w') as f:
+        f.write(content)
+    return True
+
+
+def generate_allowed_tables_json(allowed_tables: list, output_path: Path) -> bool:
+    """Generate allowed_tables.json for SQL validator. Returns True if written."""
     data = {
         "_comment": "Auto-generated by dbt/scripts/generate_ai_schema.py - DO NOT EDIT MANUALLY",
         "_generated": datetime.now().isoformat(),
         "allowed_tables": allowed_tables
     }
     
-    with open(output_path, 'w') as f:
-        json.dump(data, f, indent=2)
-    
-    return len(allowed_tables)
+    return write_if_changed(output_path, json.dumps(data, indent=2), VOLATILE_JSON_LINE)
 
 
 def main():
     """Main function to generate AI schema files."""
+    parser = argparse.ArgumentParser(description="Generate schema_ai.md and allowed_tables.json")
+    parser.add_argument('--force', action='store_true', help="Ignore the cache and rewrite outputs")
+    parser.add_argument('--token-budget', type=int, default=DEFAULT_TOKEN_BUDGET,
+                        help=f"Max tokens for schema_ai.md, 0 = unlimited (default {DEFAULT_TOKEN_BUDGET})")
+    parser.add_argument('--tokenizer', default=os.getenv('AI_SCHEMA_TOKENIZER', 'auto'),
+                        help="tiktoken[:encoding], hf:<tokenizer.json>, approx or auto (default auto)")
+    parser.add_argument('--query-log', type=Path, default=None,
+                        help="AI query log (default ../streamlit/logs/ai_query_log.jsonl)")
+    args = parser.parse_args()
+    
     # Get dbt directory (script is in dbt/scripts/)
     script_dir = Path(__file__).parent
     dbt_path = script_dir.parent
     models_path = dbt_path / 'models'
     output_md_path = models_path / 'schema_ai.md'
+    cache_path = dbt_path / 'target' / 'ai_schema_cache.json'
+    report_path = dbt_path / 'target' / 'ai_schema_budget.json'
+    query_log_path = args.query_log or dbt_path.parent / 'streamlit' / 'logs' / 'ai_query_log.jsonl'
     
     # Path to streamlit AI module
     streamlit_ai_path = dbt_path.parent / 'streamlit' / 'ai'
@@ -340,31 +664,82 @@ def main():
     print("🤖 Generating AI schema context...")
     print(f"   Source: {models_path}")
     
+    # Skip everything when no input changed since the last run
+    cache = {} if args.force else load_cache(cache_path)
+    file_hashes = {
+        str(path.relative_to(models_path)): file_hash(path)
+        for path in find_schema_files(models_path)
+    }
+    tokenizer_name, count_tokens = get_token_counter(args.tokenizer)
+    budget_inputs = dict(file_hashes)
+    budget_inputs['_budget'] = f"{args.token_budget}:{tokenizer_name}"
+    if query_log_path.exists():
+        budget_inputs['_query_log'] = file_hash(query_log_path)
+    fingerprint = inputs_fingerprint(dbt_path, budget_inputs)
+    outputs_exist = output_md_path.exists() and (
+        output_json_path.exists() or not streamlit_ai_path.exists()
+    )
+    if cache.get('fingerprint') == fingerprint and outputs_exist:
+        print(f"✅ No schema changes ({len(file_hashes)} files unchanged), outputs left as is")
+        return
+    
     # Load all schemas
-    schemas = load_all_schemas(models_path)
+    schemas = load_all_schemas(models_path, file_hashes, cache)
     print(f"   Found {len(schemas)} models in schema files")
     
     # Categorize tables
     categories = categorize_tables(schemas)
     print(f"   Marts: {len(categories['marts'])}, Dims: {len(categories['dimensions'])}, Facts: {len(categories['facts'])}")
     
-    # Generate schema_ai.md
-    content = generate_schema_md(dbt_path, schemas, categories)
-    with open(output_md_path, 'w') as f:
-        f.write(content)
-    
-    # Count approximate tokens (rough estimate: 1 token ≈ 4 chars)
-    token_estimate = len(content) // 4
-    print(f"✅ Generated schema_ai.md ({len(content):,} chars, ~{token_estimate:,} tokens)")
+    # Generate schema_ai.md within the token budget
+    queries = load_query_log(query_log_path)
+    candidates = rank_prune_candidates(schemas, categories, queries)
+    content, tokens, pruned = fit_to_budget(
+        lambda dropped: generate_schema_md(dbt_path, schemas, categories, dropped),
+        count_tokens, args.token_budget, candidates
+    )
+    written = write_if_changed(output_md_path, content, None if args.force else VOLATILE_MD_LINE)
+    
+    budget_label = f"budget {args.token_budget:,}" if args.token_budget else "no budget"
+    if written:
+        print(f"✅ Generated schema_ai.md ({len(content):,} chars, {tokens:,} tokens [{tokenizer_name}], {budget_label})")
+    else:
+        print(f"✅ schema_ai.md unchanged ({len(content):,} chars, {tokens:,} tokens [{tokenizer_name}], {budget_label}), not rewritten")
+    
+    print(f"   Ranked with {len(queries)} logged AI queries")
+    if pruned:
+        print(f"✂️  Pruned {len(pruned)} entries to fit the budget (see {report_path.relative_to(dbt_path)}):")
+        for score, _, (table, column) in pruned[:10]:
+            print(f"   - {table}.{column}" if column else f"   - {table} (whole entry)")
+        if len(pruned) > 10:
+            print(f"   ... and {len(pruned) - 10} more")
+    if args.token_budget and tokens > args.token_budget:
+        print(f"⚠️  schema_ai.md is still over budget after pruning everything prunable")
+    write_budget_report(report_path, {
+        'tokenizer': tokenizer_name,
+        'token_budget': args.token_budget,
+        'tokens': tokens,
+        'logged_queries': len(queries),
+        'pruned': [
+            {'table': table, 'column': column, 'score': round(score, 2)}
+            for score, _, (table, column) in pruned
+        ]
+    })
     
     # Generate allowed_tables.json
     allowed_tables = get_allowed_tables(categories)
     if streamlit_ai_path.exists():
-        table_count = generate_allowed_tables_json(allowed_tables, output_json_path)
-        print(f"✅ Generated allowed_tables.json ({table_count} tables)")
+        if generate_allowed_tables_json(allowed_tables, output_json_path):
+            print(f"✅ Generated allowed_tables.json ({len(allowed_tables)} tables)")
+        else:
+            print(f"✅ allowed_tables.json unchanged ({len(allowed_tables)} tables), not rewritten")
     else:
         print(f"⚠️  Skipped allowed_tables.json (streamlit/ai/ not found)")
     
+    cache['version'] = CACHE_VERSION
+    cache['fingerprint'] = fingerprint
+    save_cache(cache_path, cache)
+    
     print(f"💰 Estimated cost savings: ~30% vs YAML-based context")
     
     # Print summary of allowed tables
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+AdventureWorks Data Scaler
+==========================
+Multiplies the raw AdventureWorks tables behind models/staging/stg_*.sql by a
+chosen factor so dbt builds and dashboard queries can be benchmarked at
+production volume on a local PostgreSQL.
+
+Each extra "replica" k (1..factor-1) is a copy of the original rows with:
+- Primary keys offset by k * stride (stride = next power of ten above the
+  original max id), so replica ids stay readable: order 43659 -> 343659
+- Foreign keys into scaled tables offset the same way (orders point at the
+  replica's customers, lines at the replica's orders, ...); keys into
+  unscaled tables (products, employees, vendors, territories) are unchanged
+- Order / work order dates shifted by a random number of days (children
+  inherit the parent's shift), clamped to the original date range so the
+  report date does not move
+- Monetary values unchanged, so header totals still equal their lines
+- Inventory quantities jittered +/-25%
+- New rowguid / _airbyte_raw_id values
+
+Rows are written with COPY FROM STDIN, one replica at a time. The same
+--seed always produces the same data. Original row ranges are recorded in
+public.synthetic_scale, and synthetic rows are removed before every run, so
+re-running with another factor is safe.
+
+Scaled tables:
+    Sales.Customer, Sales.SalesOrderHeader, Sales.SalesOrderDetail,
+    Purchasing.PurchaseOrderHeader, Purchasing.PurchaseOrderDetail,
+    Production.WorkOrder, Production.WorkOrderRouting,
+    Production.Location, Production.ProductInventory
+
+Usage:
+    python scripts/scale_adventureworks.py --factor 10
+    python scripts/scale_adventureworks.py --factor 100 --seed 7
+    python scripts/scale_adventureworks.py --reset       # back to original data
+
+Connection: DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD (same defaults as
+the Streamlit app: localhost:5432/data_warehouse as postgres/postgres).
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+from datetime import date, datetime, timedelta
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+STATE_TABLE = 'public.synthetic_scale'
+COPY_CHUNK_ROWS = 50000
+INVENTORY_JITTER = 0.25
+
+# Scaled tables in dependency order (parents before children).
+#   key:        integer primary key offset per replica (None = composite key)
+#   marker:     (column, table) identifying synthetic rows: column > base max of table
+#   remap:      foreign key column -> scaled parent table
+#   date_root:  anchor date column; rows get a random day shift clamped to its range
+#   date_from:  (column, parent table) - inherit the parent row's day shift
+#   rewrite:    column -> function(new_id, original_value, replica) for derived text
+TABLES = [
+    {
+        'schema': 'Sales', 'table': 'Customer', 'key': 'CustomerID',
+        'rewrite': {'AccountNumber': lambda new_id, value, k: f"AW{int(new_id):08d}"},
+    },
+    {
+        'schema': 'Sales', 'table': 'SalesOrderHeader', 'key': 'SalesOrderID',
+        'remap': {'CustomerID': 'Customer'},
+        'date_root': 'OrderDate',
+        'rewrite': {'SalesOrderNumber': lambda new_id, value, k: f"SO{new_id}"},
+    },
+    {
+        'schema': 'Sales', 'table': 'SalesOrderDetail', 'key': 'SalesOrderDetailID',
+        'remap': {'SalesOrderID': 'SalesOrderHeader'},
+        'date_from': ('SalesOrderID', 'SalesOrderHeader'),
+    },
+    {
+        'schema': 'Purchasing', 'table': 'PurchaseOrderHeader', 'key': 'PurchaseOrderID',
+        'date_root': 'OrderDate',
+    },
+    {
+        'schema': 'Purchasing', 'table': 'PurchaseOrderDetail', 'key': 'PurchaseOrderDetailID',
+        'remap': {'PurchaseOrderID': 'PurchaseOrderHeader'},
+        'date_from': ('PurchaseOrderID', 'PurchaseOrderHeader'),
+    },
+    {
+        'schema': 'Production', 'table': 'WorkOrder', 'key': 'WorkOrderID',
+        'date_root': 'StartDate',
+    },
+    {
+        'schema': 'Production', 'table': 'WorkOrderRouting', 'key': None,
+        'marker': ('WorkOrderID', 'WorkOrder'),
+        'remap': {'WorkOrderID': 'WorkOrder'},
+        'date_from': ('WorkOrderID', 'WorkOrder'),
+    },
+    {
+        'schema': 'Production', 'table': 'Location', 'key': 'LocationID',
+        'rewrite': {'Name': lambda new_id, value, k: f"{value} #{k}"},
+    },
+    {
+        'schema': 'Production', 'table': 'ProductInventory', 'key': None,
+        'marker': ('LocationID', 'Location'),
+        'remap': {'LocationID': 'Location'},
+        'jitter': ['Quantity'],
+    },
+]
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def table_ref(spec: dict) -> str:
+    return f"{quote_ident(spec['schema'])}.{quote_ident(spec['table'])}"
+
+
+def marker_of(spec: dict) -> tuple:
+    """(column, table) whose base max separates original from synthetic rows."""
+    return spec.get('marker') or (spec['key'], spec['table'])
+
+
+def get_connection():
+    """Connect using the same environment variables as the Streamlit app."""
+    if psycopg2 is None:
+        print("❌ psycopg2 not installed. Install with: pip install psycopg2-binary")
+        sys.exit(1)
+    return psycopg2.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("DB_PORT", "5432"),
+        dbname=os.getenv("DB_NAME", "data_warehouse"),
+        user=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD", "postgres"),
+    )
+
+
+def load_state(conn) -> dict:
+    """
+    Return {table: base max id} for every keyed table, recording it on first use.
+    The base max is what the original (unscaled) data looked like.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            create table if not exists {STATE_TABLE} (
+                table_schema text not null,
+                table_name text not null,
+                key_column text not null,
+                base_max_id bigint not null,
+                factor integer not null default 1,
+                seed integer,
+                scaled_at timestamptz,
+                primary key (table_schema, table_name)
+            )
+        """)
+        cur.execute(f"select table_name, base_max_id from {STATE_TABLE}")
+        state = dict(cur.fetchall())
+
+        for spec in TABLES:
+            if not spec['key'] or spec['table'] in state:
+                continue
+            cur.execute(f"select max({quote_ident(spec['key'])}) from {table_ref(spec)}")
+            base_max = cur.fetchone()[0] or 0
+            cur.execute(
+                f"insert into {STATE_TABLE} (table_schema, table_name, key_column, base_max_id) "
+                f"values (%s, %s, %s, %s)",
+                (spec['schema'], spec['table'], spec['key'], base_max),
+            )
+            state[spec['table']] = int(base_max)
+
+    conn.commit()
+    return state
+
+
+def strides(state: dict) -> dict:
+    """Id offset per replica: the next power of ten above the original max id."""
+    return {table: 10 ** len(str(int(base_max))) for table, base_max in state.items()}
+
+
+def reset(conn, state: dict):
+    """Delete all synthetic rows (children first)."""
+    with conn.cursor() as cur:
+        for spec in reversed(TABLES):
+            column, table = marker_of(spec)
+            cur.execute(
+                f"delete from {table_ref(spec)} where {quote_ident(column)} > %s",
+                (state[table],),
+            )
+            if cur.rowcount:
+                print(f"   🗑️  {spec['schema']}.{spec['table']}: removed {cur.rowcount:,} synthetic rows")
+        cur.execute(f"update {STATE_TABLE} set factor = 1, seed = null, scaled_at = null")
+    conn.commit()
+
+
+def load_original_rows(conn, spec: dict, state: dict) -> tuple:
+    """Return (column names, rows) of the original data, in a stable order."""
+    column, table = marker_of(spec)
+    order_by = quote_ident(spec['key'] or column)
+    with conn.cursor() as cur:
+        cur.execute(
+            f"select * from {table_ref(spec)} where {quote_ident(column)} <= %s order by {order_by}",
+            (state[table],),
+        )
+        columns = [desc[0] for desc in cur.description]
+        return columns, cur.fetchall()
+
+
+def copy_value(value) -> str:
+    """Format one value for COPY text format."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        text = 't' if value else 'f'
+    elif isinstance(value, (datetime, date)):
+        text = value.isoformat()
+    elif isinstance(value, (dict, list)):
+        text = json.dumps(value)
+    else:
+        text = str(value)
+    return (text.replace('\\', '\\\\').replace('\t', '\\t')
+                .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def copy_rows(conn, spec: dict, columns: list, rows):
+    """Stream rows into the table with COPY FROM STDIN in chunks."""
+    sql = f"copy {table_ref(spec)} ({', '.join(quote_ident(c) for c in columns)}) from stdin"
+    written = 0
+    buffer = io.StringIO()
+    pending = 0
+    with conn.cursor() as cur:
+        for row in rows:
+            buffer.write('\t'.join(copy_value(v) for v in row))
+            buffer.write('\n')
+            pending += 1
+            if pending >= COPY_CHUNK_ROWS:
+                buffer.seek(0)
+                cur.copy_expert(sql, buffer)
+                written += pending
+                buffer = io.StringIO()
+                pending = 0
+        if pending:
+            buffer.seek(0)
+            cur.copy_expert(sql, buffer)
+            written += pending
+    return written
+
+
+def as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def replica_rows(spec: dict, columns: list, rows: list, k: int, stride: dict,
+                 date_range: tuple, shifts: dict, rng: random.Random, jitter_days: int):
+    """
+    Yield replica k of the original rows and record each row's day shift in
+    shifts[table] so child tables can inherit it.
+    """
+    index = {name: i for i, name in enumerate(columns)}
+    key = spec['key']
+    remap = spec.get('remap', {})
+    rewrite = spec.get('rewrite', {})
+    jitter = spec.get('jitter', [])
+    date_columns = [c for c in columns if c.endswith('Date') and not c.startswith('_airbyte')]
+    date_root = spec.get('date_root')
+    date_from = spec.get('date_from')
+    own_shifts = shifts.setdefault(spec['table'], {})
+
+    for row in rows:
+        values = list(row)
+        original_id = values[index[key]] if key else None
+        new_id = original_id + k * stride[spec['table']] if key else None
+        if key:
+            values[index[key]] = new_id
+
+        for column, parent in remap.items():
+            if values[index[column]] is not None:
+                values[index[column]] += k * stride[parent]
+
+        # Day shift: random for root rows, inherited for child rows
+        shift = 0
+        if date_root and values[index[date_root]] is not None:
+            anchor = as_date(values[index[date_root]])
+            lo, hi = date_range
+            shift = rng.randint(-jitter_days, jitter_days)
+            shift = max((lo - anchor).days, min((hi - anchor).days, shift))
+        elif date_from:
+            parent_column, parent_table = date_from
+            parent_id = row[index[parent_column]]
+            shift = shifts.get(parent_table, {}).get(parent_id, 0)
+        if key:
+            own_shifts[original_id] = shift
+        if shift:
+            for column in date_columns:
+                if isinstance(values[index[column]], (datetime, date)):
+                    values[index[column]] += timedelta(days=shift)
+
+        for column in jitter:
+            if values[index[column]] is not None:
+                factor = 1 + rng.uniform(-INVENTORY_JITTER, INVENTORY_JITTER)
+                values[index[column]] = max(0, int(round(values[index[column]] * factor)))
+
+        for column, rewrite_fn in rewrite.items():
+            if column in index:
+                values[index[column]] = rewrite_fn(new_id, row[index[column]], k)
+
+        for column in ('rowguid', '_airbyte_raw_id'):
+            if column in index and values[index[column]] is not None:
+                values[index[column]] = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+        yield values
+
+
+def scale(conn, state: dict, factor: int, seed: int, jitter_days: int):
+    """Write replicas 1..factor-1 of every scaled table."""
+    stride = strides(state)
+    overflow = [t for t, base in state.items() if (factor - 1) * stride[t] + base > 2**31 - 1]
+    if overflow:
+        print(f"❌ Factor {factor} would overflow integer ids in: {', '.join(overflow)}")
+        sys.exit(1)
+
+    print("📥 Loading original rows...")
+    originals = {}
+    date_ranges = {}
+    for spec in TABLES:
+        columns, rows = load_original_rows(conn, spec, state)
+        originals[spec['table']] = (columns, rows)
+        if spec.get('date_root') and rows:
+            i = columns.index(spec['date_root'])
+            dates = [as_date(r[i]) for r in rows if r[i] is not None]
+            date_ranges[spec['table']] = (min(dates), max(dates))
+        print(f"   {spec['schema']}.{spec['table']}: {len(rows):,} rows")
+
+    totals = {spec['table']: 0 for spec in TABLES}
+    start = time.time()
+    for k in range(1, factor):
+        shifts = {}
+        for spec in TABLES:
+            columns, rows = originals[spec['table']]
+            rng = random.Random(f"{seed}:{spec['table']}:{k}")
+            generated = replica_rows(spec, columns, rows, k, stride,
+                                     date_ranges.get(spec['table']), shifts, rng, jitter_days)
+            totals[spec['table']] += copy_rows(conn, spec, columns, generated)
+        conn.commit()
+        elapsed = time.time() - start
+        print(f"   ✓ Replica {k}/{factor - 1} ({sum(totals.values()):,} rows, {elapsed:.0f}s)")
+
+    with conn.cursor() as cur:
+        cur.execute(
+            f"update {STATE_TABLE} set factor = %s, seed = %s, scaled_at = now()",
+            (factor, seed),
+        )
+    conn.commit()
+    return totals, time.time() - start
+
+
+def analyze(conn):
+    """Refresh planner statistics on the scaled tables."""
+    old_autocommit = conn.autocommit
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        for spec in TABLES:
+            cur.execute(f"analyze {table_ref(spec)}")
+    conn.autocommit = old_autocommit
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scale raw AdventureWorks tables for benchmarking")
+    parser.add_argument('--factor', type=int, help="Target volume multiplier (e.g. 10, 100, 1000)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed (same seed = same data)")
+    parser.add_argument('--jitter-days', type=int, default=30, help="Max random date shift per order")
+    parser.add_argument('--reset', action='store_true', help="Remove synthetic rows and exit")
+    args = parser.parse_args()
+
+    if not args.reset and (args.factor is None or args.factor < 1):
+        parser.error("--factor >= 1 is required unless --reset is given")
+
+    conn = get_connection()
+    try:
+        state = load_state(conn)
+
+        print("🧹 Removing previous synthetic rows...")
+        reset(conn, state)
+        if args.reset or args.factor == 1:
+            analyze(conn)
+            print("✅ Raw tables are back to the original AdventureWorks data")
+            return
+
+        print(f"🚀 Scaling to {args.factor}x (seed {args.seed})")
+        totals, elapsed = scale(conn, state, args.factor, args.seed, args.jitter_days)
+        analyze(conn)
+
+        total_rows = sum(totals.values())
+        print(f"\n✅ Wrote {total_rows:,} synthetic rows in {elapsed:.1f}s "
+              f"({total_rows / elapsed if elapsed else 0:,.0f} rows/s)")
+        for spec in TABLES:
+            print(f"   {spec['schema']}.{spec['table']}: +{totals[spec['table']]:,}")
+        print("\nNext: ./run_dbt.sh run   (then python scripts/build_profiler.py)")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Staging Fan-out Report
+======================
+Counts how many downstream models reference each staging model and derives
+the staging materialization policy (see macros/staging_config.sql):
+staging models referenced by more than N downstream models are "hot" and
+are built as unlogged tables instead of views.
+
+Reference counts come from target/manifest.json (child_map) when available,
+otherwise from scanning ref('stg_*') calls in models/**/*.sql.
+
+Usage:
+    python scripts/staging_fanout.py                 # report only
+    python scripts/staging_fanout.py --min-refs 3    # report with another threshold
+    python scripts/staging_fanout.py --write         # update vars in dbt_project.yml
+
+Compare build time with and without the policy:
+    ./run_dbt.sh run --vars '{materialize_hot_staging: false}'
+    ./run_dbt.sh run
+"""
+
+import re
+import sys
+import json
+import argparse
+from pathlib import Path
+from collections import defaultdict
+
+REF_PATTERN = re.compile(r"ref\(\s*['\"](stg_[a-zA-Z0-9_]+)['\"]\s*\)")
+
+
+def load_project_vars(project_file: Path) -> dict:
+    """Read the current policy vars from dbt_project.yml (without a YAML dependency)."""
+    content = project_file.read_text()
+    min_refs = re.search(r"^\s*hot_staging_min_refs:\s*(\d+)", content, re.MULTILINE)
+    block = re.search(r"^(\s*)hot_staging_models:\s*\n((?:\1\s+- .*\n)*)", content, re.MULTILINE)
+    hot = []
+    if block:
+        hot = [line.strip()[2:].strip() for line in block.group(2).splitlines() if line.strip()]
+    return {
+        'min_refs': int(min_refs.group(1)) if min_refs else 2,
+        'hot_staging_models': hot,
+    }
+
+
+def fanout_from_manifest(manifest_path: Path) -> dict:
+    """Count non-staging children of each staging model from dbt's manifest."""
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+
+    counts = {}
+    for node_id, children in manifest.get('child_map', {}).items():
+        if not node_id.startswith('model.'):
+            continue
+        name = node_id.split('.')[-1]
+        if not name.startswith('stg_'):
+            continue
+        downstream = {
+            child.split('.')[-1] for child in children
+            if child.startswith('model.') and not child.split('.')[-1].startswith('stg_')
+        }
+        counts[name] = len(downstream)
+    return counts
+
+
+def fanout_from_sources(models_path: Path) -> dict:
+    """Count models referencing each staging model by scanning SQL files."""
+    referenced_by = defaultdict(set)
+    staging_models = set()
+
+    for sql_file in models_path.glob('**/*.sql'):
+        model_name = sql_file.stem
+        if model_name.startswith('stg_'):
+            staging_models.add(model_name)
+            continue
+        for ref in REF_PATTERN.findall(sql_file.read_text()):
+            referenced_by[ref].add(model_name)
+
+    return {name: len(referenced_by.get(name, ())) for name in staging_models}
+
+
+def select_hot_models(counts: dict, min_refs: int) -> list:
+    """Staging models referenced by more than min_refs downstream models."""
+    return sorted(name for name, count in counts.items() if count > min_refs)
+
+
+def write_project_vars(project_file: Path, min_refs: int, hot_models: list):
+    """Rewrite hot_staging_min_refs and hot_staging_models in dbt_project.yml in place."""
+    content = project_file.read_text()
+
+    content = re.sub(
+        r"^(\s*hot_staging_min_refs:\s*)\d+",
+        lambda m: f"{m.group(1)}{min_refs}",
+        content,
+        count=1,
+        flags=re.MULTILINE,
+    )
+
+    def replace_list(match):
+        indent = match.group(1)
+        items = ''.join(f"{indent}  - {name}\n" for name in hot_models)
+        return f"{indent}hot_staging_models:{' []' if not hot_models else ''}\n{items}"
+
+    content = re.sub(
+        r"^(\s*)hot_staging_models:.*\n((?:\1\s+- .*\n)*)",
+        replace_list,
+        content,
+        count=1,
+        flags=re.MULTILINE,
+    )
+
+    project_file.write_text(content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report staging model fan-out and hot staging policy")
+    parser.add_argument('--min-refs', type=int, default=None,
+                        help="Materialize staging models referenced by more than this many models")
+    parser.add_argument('--write', action='store_true',
+                        help="Update hot_staging_models in dbt_project.yml")
+    args = parser.parse_args()
+
+    dbt_path = Path(__file__).parent.parent
+    project_file = dbt_path / 'dbt_project.yml'
+    manifest_path = dbt_path / 'target' / 'manifest.json'
+
+    current = load_project_vars(project_file)
+    min_refs = args.min_refs if args.min_refs is not None else current['min_refs']
+
+    if manifest_path.exists():
+        counts = fanout_from_manifest(manifest_path)
+        source = 'target/manifest.json'
+    else:
+        counts = fanout_from_sources(dbt_path / 'models')
+        source = 'models/**/*.sql'
+
+    if not counts:
+        print("❌ No staging models found")
+        sys.exit(1)
+
+    hot_models = select_hot_models(counts, min_refs)
+
+    print(f"📊 Staging fan-out ({len(counts)} staging models, source: {source})")
+    print(f"   Threshold: referenced by more than {min_refs} downstream models\n")
+    for name, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+        if count == 0:
+            continue
+        marker = '🔥 table' if name in hot_models else '   view '
+        print(f"   {marker}  {count:>3}  {name}")
+
+    unreferenced = sum(1 for count in counts.values() if count == 0)
+    print(f"\n   {unreferenced} staging models are not referenced downstream")
+
+    if hot_models == sorted(current['hot_staging_models']) and min_refs == current['min_refs']:
+        print("✅ dbt_project.yml is up to date")
+    elif args.write:
+        write_project_vars(project_file, min_refs, hot_models)
+        print(f"✅ Updated dbt_project.yml ({len(hot_models)} hot staging models)")
+    else:
+        print("⚠️  dbt_project.yml differs from this policy. Re-run with --write to update it.")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,19 +5,47 @@ Natural Language to SQL analytics assistant powered by LLMs.
 
 Components:
 - schema_context: Loads semantic context from dim_metric and schema definitions
+- schema_retriever: Selects the tables and metrics relevant to a question (focused prompt)
 - sql_generator: Converts natural language questions to SQL queries
 - sql_validator: Validates and sanitizes generated SQL for safety
+- cost_guard: Rejects or rewrites generated SQL with expensive query plans
+- query_cache: Persistent normalized-question -> SQL cache
+- similarity_index: Offline TF-IDF index over cached questions (paraphrases, few-shot examples)
+- intent_parser: Rule-based template SQL for common question shapes (LLM fallback)
+- llm_usage: Token usage and provider prompt-cache ratios of the LLM calls
+- recorded_client: Offline stand-in for the LLM clients, replaying recorded responses
+- streaming: Streamed LLM responses, stopped once the SQL statement is complete
+- speculative: Optional parallel SQL candidates; the cheapest valid plan runs
+- pipeline: Post-query task graph (chart, cards, table alongside the analysis) and stage timer
 - visualizer: Auto-generates appropriate visualizations for query results
 """
 
 from .schema_context import SchemaContext
+from .schema_retriever import SchemaRetriever
 from .sql_generator import SQLGenerator
 from .sql_validator import SQLValidator
+from .cost_guard import QueryCostGuard, QueryTooExpensive
+from .query_cache import QueryCache
+from .similarity_index import SimilarityIndex
+from .intent_parser import IntentParser
+from .llm_usage import TokenUsage
+from .recorded_client import RecordedClient
+from .pipeline import TaskGraph, StageTimer
 from .visualizer import ResultVisualizer
 
 __all__ = [
     'SchemaContext',
+    'SchemaRetriever',
     'SQLGenerator', 
     'SQLValidator',
+    'QueryCostGuard',
+    'QueryTooExpensive',
+    'QueryCache',
+    'SimilarityIndex',
+    'IntentParser',
+    'TokenUsage',
+    'RecordedClient',
+    'TaskGraph',
+    'StageTimer',
     'ResultVisualizer'
 ]
@@ -0,0 +1,344 @@
+"""
+Query Cost Guard
+================
+Pre-execution cost gate for generated SQL.
+Plans each query with EXPLAIN (FORMAT JSON) and, when the estimate is above
+the configured limits, tries cheaper rewrites before rejecting it:
+
+1. Rollup: aggregates over mart_metrics are served from mart_metrics_daily
+   (same totals, far fewer rows)
+2. Date filter: scans of mart_sales / mart_metrics are limited to the 12
+   months up to the report date (dim_report_date); the window is written into
+   the SQL as literal date keys and named in the rewrite note
+3. Sampling: TABLESAMPLE on the scanned table, only for averages and other
+   statistics that a sample approximates (no totals, counts, extremes,
+   DISTINCT, top-N or plain row lookups, which a sample gets wrong)
+
+A query that stays over the limits raises QueryTooExpensive. The retry loop in
+SQLGenerator.generate_with_retry feeds the message back to the LLM, so the next
+attempt can be cheaper.
+
+Limits (0 disables a check):
+    AI_MAX_QUERY_COST   - planner total cost of the query (default 1,000,000)
+    AI_MAX_JOIN_ROWS    - estimated rows produced by any join (default 50,000,000)
+"""
+
+import os
+import re
+from datetime import date, timedelta
+from typing import Optional, Tuple
+
+
+class QueryTooExpensive(Exception):
+    """Raised when a query and all its rewrites are over the cost limits."""
+
+
+class QueryCostGuard:
+    """Rejects or rewrites generated queries whose plans are too expensive."""
+
+    # mart_metrics columns that the rollups do not have
+    MART_METRICS_ONLY_COLUMNS = {
+        'metric_record_id', 'report_date', 'metric_description', 'metric_level',
+        'metric_parent', 'metric_target', 'alert_criteria', 'recommended_actions',
+        'metric_value', 'source_table', 'source_record_id', 'customer_key',
+        'ship_method_key', 'credit_card_key', 'special_offer_key', 'scrap_reason_key',
+        'parent_order_id', 'online_order_flag', 'has_discount', 'inventory_status',
+        'order_status', 'delivery_status', 'quota_status', 'location_name',
+        'scrap_reason_name', 'safety_stock_level', 'reorder_point',
+        'number_of_operations', 'commission_pct', 'created_at'
+    }
+
+    # Aggregates over mart_metrics rows and their rollup equivalents
+    ROLLUP_AGGREGATES = [
+        (r'\bSUM\(\s*((?:\w+\.)?)metric_value\s*\)', r'SUM(\1metric_sum)'),
+        (r'\bMIN\(\s*((?:\w+\.)?)metric_value\s*\)', r'MIN(\1metric_min)'),
+        (r'\bMAX\(\s*((?:\w+\.)?)metric_value\s*\)', r'MAX(\1metric_max)'),
+        (r'\bAVG\(\s*((?:\w+\.)?)metric_value\s*\)',
+         r'(SUM(\1metric_sum) / NULLIF(SUM(\1metric_count), 0))'),
+        (r'\bCOUNT\(\s*(?:\*|\d+|(?:\w+\.)?(?:metric_value|metric_key|metric_name|metric_category|metric_unit|date_key))\s*\)',
+         'SUM(metric_count)'),
+    ]
+
+    # Aggregates a sample approximates, and aggregates it gets wrong (scaled or missed rows)
+    SAMPLE_SAFE_AGGREGATES = r'\b(AVG|STDDEV|STDDEV_SAMP|STDDEV_POP|VARIANCE|VAR_SAMP|VAR_POP|PERCENTILE_CONT|PERCENTILE_DISC)\s*\('
+    SAMPLE_UNSAFE_AGGREGATES = r'\b(SUM|COUNT|MIN|MAX|STRING_AGG|ARRAY_AGG|BOOL_AND|BOOL_OR|EVERY)\s*\('
+
+    # Tables whose scans can be limited to recent data, and their integer date key
+    DATE_FILTER_COLUMNS = {
+        'mart_sales': 'order_date_key',
+        'mart_metrics': 'date_key',
+        'mart_metrics_daily': 'date_key',
+    }
+
+    # Tables (not views) that support TABLESAMPLE
+    SAMPLEABLE_TABLES = [
+        'mart_sales', 'fact_sales_order_line', 'fact_global_metrics',
+        'mart_metrics_daily', 'mart_operations', 'fact_sales_order',
+        'mart_customer_analytics', 'mart_product_analytics'
+    ]
+
+    JOIN_NODES = {'Nested Loop', 'Hash Join', 'Merge Join'}
+
+    # Words that can follow a table name but are not an alias
+    NOT_ALIASES = {
+        'where', 'join', 'inner', 'left', 'right', 'full', 'cross', 'natural', 'on',
+        'using', 'group', 'order', 'limit', 'having', 'window', 'union', 'tablesample'
+    }
+
+    def __init__(self, max_cost: Optional[float] = None, max_join_rows: Optional[float] = None):
+        """
+        Initialize the guard.
+
+        Args:
+            max_cost: Max planner total cost (default AI_MAX_QUERY_COST or 1,000,000; 0 = no limit)
+            max_join_rows: Max estimated rows out of any join (default AI_MAX_JOIN_ROWS or 50,000,000; 0 = no limit)
+        """
+        self.max_cost = max_cost if max_cost is not None else float(os.getenv("AI_MAX_QUERY_COST", "1000000"))
+        self.max_join_rows = max_join_rows if max_join_rows is not None else float(os.getenv("AI_MAX_JOIN_ROWS", "50000000"))
+
+    @property
+    def enabled(self) -> bool:
+        """True if any limit is set."""
+        return bool(self.max_cost or self.max_join_rows)
+
+    def check(self, sql: str, conn) -> Tuple[str, Optional[str]]:
+        """
+        Plan a query and return the SQL to run.
+
+        Args:
+            sql: Validated SELECT query
+            conn: Database connection
+
+        Returns:
+            Tuple of (sql_to_run, rewrite_note); rewrite_note is None if the
+            query is run as generated
+
+        Raises:
+            QueryTooExpensive: if the query and every rewrite are over the limits
+            Exception: database errors from EXPLAIN (invalid SQL, missing columns)
+        """
+        sql, note, _ = self.assess(sql, conn)
+        return sql, note
+
+    def assess(self, sql: str, conn) -> Tuple[str, Optional[str], float]:
+        """
+        Like check, also returning the planner cost of the SQL to run
+        (used to pick the cheapest of several candidate queries).
+
+        Returns:
+            Tuple of (sql_to_run, rewrite_note, total_cost)
+        """
+        cost, join_rows = self.estimate(self.explain(sql, conn))
+        problem = self._over_limits(cost, join_rows)
+        if problem is None:
+            return sql, None, cost
+
+        for note, rewritten in self._rewrites(sql, cost, conn):
+            try:
+                rewritten_cost, rewritten_rows = self.estimate(self.explain(rewritten, conn))
+            except Exception:
+                continue  # A rewrite that does not plan is simply skipped
+            if self._over_limits(rewritten_cost, rewritten_rows) is None:
+                return rewritten, note, rewritten_cost
+
+        raise QueryTooExpensive(
+            f"Query too expensive: {problem}. Write a cheaper query: filter by date, "
+            f"use mart_metrics_daily / mart_metrics_monthly for metric aggregates, "
+            f"and avoid joining large tables to each other."
+        )
+
+    def explain(self, sql: str, conn) -> dict:
+        """Return the root plan node of EXPLAIN (FORMAT JSON)."""
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+                result = cur.fetchone()[0]
+        except Exception:
+            # A failed statement aborts the transaction; reset it for the next query
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        return result[0]['Plan']
+
+    def estimate(self, plan: dict) -> Tuple[float, float]:
+        """Return (total cost, largest join output in rows) of a plan."""
+        join_rows = 0.0
+        stack = [plan]
+        while stack:
+            node = stack.pop()
+            if node.get('Node Type') in self.JOIN_NODES:
+                join_rows = max(join_rows, float(node.get('Plan Rows', 0)))
+            stack.extend(node.get('Plans', []))
+        return float(plan.get('Total Cost', 0)), join_rows
+
+    def _over_limits(self, cost: float, join_rows: float) -> Optional[str]:
+        """Describe the exceeded limit, or None if the plan is within limits."""
+        if self.max_cost and cost > self.max_cost:
+            return f"estimated cost {cost:,.0f} > limit {self.max_cost:,.0f}"
+        if self.max_join_rows and join_rows > self.max_join_rows:
+            return f"a join produces ~{join_rows:,.0f} rows > limit {self.max_join_rows:,.0f}"
+        return None
+
+    def _rewrites(self, sql: str, cost: float, conn) -> list:
+        """Candidate rewrites, most faithful first, as (note, sql) pairs."""
+        candidates = []
+
+        rollup = self._rewrite_rollup(sql)
+        if rollup:
+            candidates.append(("Served from the mart_metrics_daily rollup (same totals, fewer rows).", rollup))
+
+        bases = ([rollup] if rollup else []) + [sql]
+        report_date_key = None
+        if any(self._date_filter_target(base) for base in bases):
+            report_date_key = self._report_date_key(conn)
+        for base in bases if report_date_key else []:
+            dated = self._rewrite_date_filter(base, report_date_key)
+            if dated:
+                window, dated_sql = dated
+                candidates.append((f"Limited to the 12 months up to the report date ({window}): "
+                                   f"the full query was too expensive.", dated_sql))
+
+        sampled = self._rewrite_sample(sql, cost)
+        if sampled:
+            percent, sampled_sql = sampled
+            candidates.append((f"Approximate result from a {percent}% sample: the full query was too expensive.", sampled_sql))
+
+        return candidates
+
+    def _is_simple_select(self, sql: str) -> bool:
+        """Single SELECT without CTEs, subqueries or set operations."""
+        return (len(re.findall(r'\bSELECT\b', sql, re.IGNORECASE)) == 1
+                and not re.search(r'\b(WITH|UNION|INTERSECT|EXCEPT)\b', sql, re.IGNORECASE))
+
+    def _rewrite_rollup(self, sql: str) -> Optional[str]:
+        """Aggregate over mart_metrics alone -> same aggregate over mart_metrics_daily."""
+        if not self._is_simple_select(sql) or re.search(r'\bJOIN\b', sql, re.IGNORECASE):
+            return None
+        if not re.search(r'\bFROM\s+mart_metrics\b', sql, re.IGNORECASE):
+            return None
+        if re.search(r'\bSELECT\s+(DISTINCT\s+)?\*', sql, re.IGNORECASE):
+            return None
+        if not re.search(r'\b(SUM|MIN|MAX|AVG)\(\s*(\w+\.)?metric_value\s*\)', sql, re.IGNORECASE):
+            return None
+
+        rewritten = sql
+        for pattern, replacement in self.ROLLUP_AGGREGATES:
+            rewritten = re.sub(pattern, replacement, rewritten, flags=re.IGNORECASE)
+
+        # Other counts (nullable columns, DISTINCT) would count rollup rows, not source rows
+        if re.search(r'\bCOUNT\s*\(', rewritten, re.IGNORECASE):
+            return None
+
+        # Any remaining row-level column means the rollup cannot answer the query
+        identifiers = {w.lower() for w in re.findall(r'\b[a-zA-Z_]\w*\b', self._strip_literals(rewritten))}
+        if identifiers & self.MART_METRICS_ONLY_COLUMNS:
+            return None
+
+        return re.sub(r'\bFROM\s+mart_metrics\b', 'FROM mart_metrics_daily', rewritten, flags=re.IGNORECASE)
+
+    def _date_filter_target(self, sql: str):
+        """(table match, table, date key column) of a scan the date filter applies to, or None."""
+        if not self._is_simple_select(sql):
+            return None
+
+        for table, column in self.DATE_FILTER_COLUMNS.items():
+            match = self._find_table(sql, table)
+            if not match:
+                continue
+            if re.search(rf'\b{column}\b', sql, re.IGNORECASE):
+                return None  # Already filtered or grouped by date; a second filter would not help
+            return match, table, column
+
+        return None
+
+    def _report_date_key(self, conn) -> Optional[int]:
+        """The report date key (YYYYMMDD) from dim_report_date, or None if it cannot be read."""
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT report_date_key FROM dim_report_date")
+                row = cur.fetchone()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            return None
+        return int(row[0]) if row and row[0] is not None else None
+
+    def _rewrite_date_filter(self, sql: str, report_date_key: int) -> Optional[Tuple[str, str]]:
+        """
+        Limit a single-table scan to the 12 months up to the report date.
+
+        The latest date key is not used: purchase order due dates in mart_metrics
+        run months past the report date. The bounds are literal keys, so the SQL
+        shown with the result states the window.
+
+        Returns:
+            Tuple of (window description, rewritten sql), or None
+        """
+        target = self._date_filter_target(sql)
+        if not target:
+            return None
+        match, table, column = target
+
+        end = date(report_date_key // 10000, report_date_key // 100 % 100, report_date_key % 100)
+        try:
+            start = end.replace(year=end.year - 1) + timedelta(days=1)
+        except ValueError:  # February 29th
+            start = end.replace(year=end.year - 1, day=28) + timedelta(days=1)
+        start_key = start.year * 10000 + start.month * 100 + start.day
+
+        alias = match.group('alias') or table
+        condition = f"{alias}.{column} BETWEEN {start_key} AND {report_date_key}"
+        window = f"{column} {start.isoformat()} to {end.isoformat()}"
+        return window, self._add_condition(sql, match.end(), condition)
+
+    def _rewrite_sample(self, sql: str, cost: float) -> Optional[Tuple[int, str]]:
+        """TABLESAMPLE the scanned table, if every aggregate is one a sample approximates."""
+        if not self.max_cost or not self._is_simple_select(sql):
+            return None
+        if not re.search(self.SAMPLE_SAFE_AGGREGATES, sql, re.IGNORECASE):
+            return None  # Plain row lookups would just miss rows
+        if re.search(self.SAMPLE_UNSAFE_AGGREGATES, sql, re.IGNORECASE):
+            return None  # Totals and counts are scaled down, extremes are missed
+        if re.search(r'\b(DISTINCT|OVER)\b', sql, re.IGNORECASE):
+            return None  # Distinct values and window ranks are missed
+        if re.search(r'\bORDER\s+BY\b[\s\S]*\bLIMIT\b', sql, re.IGNORECASE):
+            return None  # A top-N of sampled groups is not the real top-N
+
+        for table in self.SAMPLEABLE_TABLES:
+            match = self._find_table(sql, table)
+            if match:
+                percent = int(max(1, min(50, 100 * self.max_cost / max(cost, 1))))
+                sampled = f"{sql[:match.end()]} TABLESAMPLE SYSTEM ({percent}){sql[match.end():]}"
+                return percent, sampled
+
+        return None
+
+    def _find_table(self, sql: str, table: str):
+        """Match `FROM|JOIN table [AS] [alias]`; the match ends after the alias."""
+        not_alias = '|'.join(sorted(self.NOT_ALIASES))
+        return re.search(
+            rf'\b(?:FROM|JOIN)\s+{table}\b(?:\s+(?:AS\s+)?(?!(?:{not_alias})\b)(?P<alias>[a-zA-Z_]\w*))?',
+            sql, re.IGNORECASE
+        )
+
+    def _add_condition(self, sql: str, from_end: int, condition: str) -> str:
+        """AND a condition into the WHERE clause after position `from_end`."""
+        tail = sql[from_end:]
+        clause_end = re.search(r'\b(GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT|WINDOW)\b', tail, re.IGNORECASE)
+        insert_at = from_end + (clause_end.start() if clause_end else len(tail))
+        where = re.search(r'\bWHERE\b', sql[from_end:insert_at], re.IGNORECASE)
+
+        if where:
+            where_end = from_end + where.end()
+            return (f"{sql[:where_end]} ({sql[where_end:insert_at].strip()}) "
+                    f"AND {condition}\n{sql[insert_at:]}")
+        return f"{sql[:insert_at].rstrip()}\nWHERE {condition}\n{sql[insert_at:]}"
+
+    def _strip_literals(self, sql: str) -> str:
+        """Remove string literals so their contents are not taken for identifiers."""
+        return re.sub(r"'[^']*'", "''", sql)
+
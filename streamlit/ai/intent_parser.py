@@ -0,0 +1,631 @@
+"""
+Intent Parser
+=============
+Deterministic fast path for common question shapes: a measure, optionally
+by dimensions, over a time grain, top/bottom N, with filters. Such questions
+get template SQL in milliseconds, without an LLM call.
+
+Vocabulary:
+- mart_sales: revenue, profit, margin, orders, average order value, units,
+  discount, customers; by territory, country, category, product, customer,
+  segment, status, season, shipping speed; daily / monthly / quarterly /
+  yearly trends
+- mart_customer_analytics: customer lists and breakdowns by lifetime value,
+  with churn risk, RFM category and segment filters
+- mart_metrics_monthly / mart_metrics_daily: any dim_metric entry named in
+  the question (SchemaContext.get_metrics_catalog), by territory, product or
+  category, aggregated as the rollup rules say (sums for USD and Count,
+  averages otherwise)
+- filters: years ("in 2014", "in 2012 and 2013", "since 2012",
+  "between 2012 and 2013"), territory and category names (read once from
+  dim_territory / dim_product), and the segment, churn risk, RFM and status
+  buckets defined in dbt; several values of one column are combined with IN
+
+The SQL is filled in only with identifiers from this vocabulary and with
+values that are either known (catalog keys, dimension values, buckets) or
+parsed integers, so no question text reaches the SQL.
+
+Confidence is the share of the question's content words (not filler words)
+that the grammar explains; an unexplained modifier such as "average",
+"excluding" or "growth" sets it to 0, and so does a top-N over a dimension
+and a time grain at once ("revenue by year for the top 5 territories"),
+which needs a ranking subquery the templates do not build. Below
+AI_INTENT_MIN_CONFIDENCE the question goes to the LLM.
+
+Settings:
+    AI_INTENT_FASTPATH        - 0 disables the fast path (default 1)
+    AI_INTENT_MIN_CONFIDENCE  - minimum confidence for template SQL (default 0.8)
+"""
+
+import os
+import re
+from typing import Optional
+
+import pandas as pd
+
+from .query_cache import STOP_WORDS
+
+INTENT_FASTPATH_ENABLED = os.getenv("AI_INTENT_FASTPATH", "1") != "0"
+DEFAULT_MIN_CONFIDENCE = float(os.getenv("AI_INTENT_MIN_CONFIDENCE", "0.8"))
+
+# Words that carry no intent beyond the STOP_WORDS of the query cache
+FILLER_WORDS = STOP_WORDS | {
+    'how', 'many', 'much', 'with', 'be', 'been', 'it', 'its', 'that', 'this', 'did',
+    'total', 'overall', 'breakdown', 'broken', 'down', 'across', 'amount', 'count',
+    'number', 'see', 'know', 'want', 'need', 'like', 'data', 'each', 'from', 'current'
+}
+
+# Words that change the meaning of a question the grammar does not model;
+# left unexplained, they send the question to the LLM
+BLOCKING_WORDS = {
+    'not', 'no', 'without', 'except', 'excluding', 'exclude', 'average', 'avg', 'median',
+    'growth', 'change', 'compare', 'compared', 'versus', 'vs', 'percentage', 'percent',
+    'share', 'ratio', 'rate', 'last', 'previous', 'prior', 'next', 'yoy', 'cumulative', 'running'
+}
+
+# Limit of top/bottom questions without a number ("highest", "top products")
+DEFAULT_TOP_N = 10
+
+YEAR_PATTERN = re.compile(r'(19|20)\d\d')
+
+# Filter kinds of the year filters (other filters are (column, value) pairs)
+YEAR_FILTERS = ('year_range', 'year_in', 'year_min', 'year_max')
+
+
+def _stem(word: str) -> str:
+    """Crude plural stemming, applied to questions and vocabulary alike."""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+_FILLERS = {_stem(word) for word in FILLER_WORDS}
+_BLOCKING = {_stem(word) for word in BLOCKING_WORDS}
+
+
+def _tokens(text: str) -> list:
+    return [_stem(word) for word in re.findall(r'[a-z0-9]+', text.lower())]
+
+
+def _literal(value) -> str:
+    """SQL literal of a vocabulary value or a parsed integer."""
+    if isinstance(value, int):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _alias(name: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_') or 'value'
+
+
+class IntentParser:
+    """Rule-based parser from common questions to template SQL."""
+
+    # Measures: phrases -> (alias, expression), per table
+    SALES_MEASURES = {
+        ('revenue', 'sales', 'sales amount', 'income', 'selling'): ('revenue', 'SUM(net_line_amount)'),
+        ('profit', 'gross profit'): ('profit', 'SUM(total_profit)'),
+        ('profit margin', 'margin'): ('profit_margin_percent', 'SUM(total_profit) * 100.0 / NULLIF(SUM(net_line_amount), 0)'),
+        ('orders', 'order count', 'number of orders'): ('order_count', 'COUNT(DISTINCT salesorderid)'),
+        ('average order value', 'avg order value', 'aov', 'order value'):
+            ('avg_order_value', 'SUM(net_line_amount) / NULLIF(COUNT(DISTINCT salesorderid), 0)'),
+        ('quantity', 'units', 'units sold', 'items sold', 'sold'): ('units_sold', 'SUM(orderqty)'),
+        ('discount', 'discount amount'): ('discount', 'SUM(discount_amount)'),
+        ('number of customers', 'customer count', 'many customers', 'unique customers'):
+            ('customer_count', 'COUNT(DISTINCT customer_key)'),
+    }
+    DEFAULT_CUSTOMER_MEASURE = ('lifetime_value', 'lifetime_value')
+    CUSTOMER_MEASURES = {
+        ('lifetime value', 'customer lifetime value', 'clv', 'ltv', 'value'): DEFAULT_CUSTOMER_MEASURE,
+        ('revenue', 'sales'): ('total_revenue', 'total_revenue'),
+        ('profit',): ('total_profit', 'total_profit'),
+        ('orders', 'order count', 'number of orders'): ('order_count', 'order_count'),
+        ('days since last order', 'recency'): ('recency_days', 'recency_days'),
+    }
+
+    # Dimensions: phrases -> column, per table
+    SALES_DIMENSIONS = {
+        ('territory', 'region', 'sales territory'): 'territory_name',
+        ('territory group',): 'territory_group',
+        ('country',): 'countryregioncode',
+        ('category', 'product category'): 'category_name',
+        ('subcategory', 'product subcategory'): 'subcategory_name',
+        ('product',): 'product_name',
+        ('customer',): 'customer_name',
+        ('segment', 'customer segment'): 'customer_segment',
+        ('status', 'order status'): 'order_status',
+        ('season',): 'order_season',
+        ('shipping speed',): 'shipping_speed_category',
+    }
+    CUSTOMER_DIMENSIONS = {
+        ('segment', 'customer segment'): 'customer_segment',
+        ('churn risk', 'churn'): 'churn_risk',
+        ('rfm category', 'rfm', 'rfm segment'): 'rfm_category',
+        ('cohort',): 'cohort_period',
+        ('territory', 'region'): 'territory_name',
+        ('status', 'customer status'): 'customer_status',
+        ('purchase frequency',): 'purchase_frequency',
+        ('favorite category',): 'favorite_category',
+    }
+    METRIC_DIMENSIONS = {
+        ('territory', 'region'): 'dt.territory_name',
+        ('product',): 'dp.product_name',
+        ('category', 'product category'): 'dp.category_name',
+    }
+
+    # Columns that the territory and category names can filter, per table
+    VALUE_COLUMNS = {
+        'mart_sales': {'territory_name', 'category_name'},
+        'mart_customer_analytics': {'territory_name'},
+        'metrics': {'territory_name', 'category_name'},
+    }
+
+    # Value buckets defined in the dbt models: phrases -> (column, value)
+    SEGMENT_FILTERS = {
+        ('high value',): ('customer_segment', 'High Value'),
+        ('medium value',): ('customer_segment', 'Medium Value'),
+        ('low value',): ('customer_segment', 'Low Value'),
+        ('active',): ('customer_status', 'Active'),
+        ('inactive',): ('customer_status', 'Inactive'),
+    }
+    CUSTOMER_FILTERS = {
+        ('at risk of churning', 'churning', 'likely to churn', 'high churn risk', 'high risk', 'churn risk high'):
+            ('churn_risk', 'High Risk'),
+        ('medium churn risk', 'medium risk'): ('churn_risk', 'Medium Risk'),
+        ('low churn risk', 'low risk'): ('churn_risk', 'Low Risk'),
+        ('champions',): ('rfm_category', 'Champions'),
+        ('loyal customers', 'loyal'): ('rfm_category', 'Loyal Customers'),
+        ('new customers',): ('rfm_category', 'New Customers'),
+        ('lost customers',): ('rfm_category', 'Lost'),
+    }
+
+    # Time grains: phrases -> grain
+    GRAINS = {
+        ('daily', 'per day', 'by day', 'each day', 'day by day'): 'day',
+        ('monthly', 'per month', 'by month', 'each month', 'month over month', 'trend', 'over time'): 'month',
+        ('quarterly', 'per quarter', 'by quarter', 'each quarter'): 'quarter',
+        ('yearly', 'annual', 'annually', 'per year', 'by year', 'each year', 'year over year'): 'year',
+    }
+
+    ORDER_WORDS = {
+        ('highest', 'most', 'best', 'largest', 'biggest', 'leading'): 'DESC',
+        ('lowest', 'least', 'worst', 'smallest', 'fewest'): 'ASC',
+    }
+
+    CUSTOMER_NAME = "COALESCE(store_name, firstname || ' ' || lastname)"
+
+    def __init__(self, schema_context, min_confidence: float = DEFAULT_MIN_CONFIDENCE):
+        """
+        Initialize the parser (the vocabulary is built on first use).
+
+        Args:
+            schema_context: SchemaContext (dim_metric catalog and database connection)
+            min_confidence: Minimum share of explained words for template SQL
+        """
+        self.schema_context = schema_context
+        self.min_confidence = min_confidence
+        self.enabled = INTENT_FASTPATH_ENABLED
+        self._metrics = None
+        self._values = None
+
+        # Hit rate and latency (this process)
+        self.questions = 0
+        self.hits = 0
+        self.hit_seconds = 0.0
+        self.fallback_seconds = 0.0
+
+    def parse(self, question: str) -> Optional[dict]:
+        """
+        Parse a question into template SQL.
+
+        Returns:
+            Dictionary with 'sql', 'confidence' (0-1), 'description' and
+            'table', or None if the question names no known measure or entity
+        """
+        tokens = _tokens(question)
+        if not tokens:
+            return None
+        filler = [word in _FILLERS for word in tokens]
+        consumed = [False] * len(tokens)  # Claimed by a rule (filler words may be part of a phrase)
+        self._load()
+
+        table = self._pick_table(tokens)
+        if table is None:
+            return None
+
+        intent = {'table': table, 'measures': [], 'dimensions': [], 'filters': [],
+                  'grain': None, 'order': None, 'limit': None}
+        self._parse_ranking(tokens, consumed, intent)
+        self._parse_years(tokens, consumed, intent)
+
+        if table == 'metrics':
+            measures = self._metrics
+            dimensions = self.METRIC_DIMENSIONS
+            filters = {}
+        elif table == 'mart_customer_analytics':
+            measures = self.CUSTOMER_MEASURES
+            dimensions = self.CUSTOMER_DIMENSIONS
+            filters = {**self.SEGMENT_FILTERS, **self.CUSTOMER_FILTERS}
+        else:
+            measures = self.SALES_MEASURES
+            dimensions = self.SALES_DIMENSIONS
+            filters = self.SEGMENT_FILTERS
+
+        vocabulary = [(phrases, 'filter', value) for phrases, value in filters.items()]
+        vocabulary += [
+            (phrases, 'filter', value) for phrases, value in self._values.items()
+            if value[0] in self.VALUE_COLUMNS[table]
+        ]
+        vocabulary += [(phrases, 'measure', value) for phrases, value in measures.items()]
+        vocabulary += [(phrases, 'grain', value) for phrases, value in self.GRAINS.items()]
+        vocabulary += [(phrases, 'dimension', value) for phrases, value in dimensions.items()]
+        if table == 'mart_customer_analytics':
+            vocabulary.append((('customer', 'customer list'), 'entity', None))  # A customer list
+        if table == 'metrics':
+            vocabulary.append((('metric', 'kpi', 'value'), 'filler', None))
+
+        for kind, value in self._match(tokens, consumed, vocabulary):
+            if kind == 'measure' and value not in intent['measures']:
+                intent['measures'].append(value)
+            elif kind == 'dimension' and value not in intent['dimensions']:
+                intent['dimensions'].append(value)
+            elif kind == 'filter':
+                intent['filters'].append(value)
+            elif kind == 'grain':
+                intent['grain'] = intent['grain'] or value
+
+        content = [i for i, word in enumerate(tokens) if not filler[i]]
+        if not content:
+            return None
+        if any(tokens[i] in _BLOCKING and not consumed[i] for i in content):
+            confidence = 0.0
+        elif intent['limit'] and intent['grain'] and intent['dimensions']:
+            confidence = 0.0  # Top N of dimension-period rows is not the top N of the dimension
+        else:
+            confidence = sum(consumed[i] for i in content) / len(content)
+        sql = self._render(intent)
+        if sql is None:
+            return None
+        return {'sql': sql, 'confidence': confidence, 'description': self._describe(intent), 'table': intent['table']}
+
+    def record(self, hit: bool, seconds: float):
+        """Count a question answered by template SQL (hit) or by the LLM, and how long it took."""
+        self.questions += 1
+        if hit:
+            self.hits += 1
+            self.hit_seconds += seconds
+        else:
+            self.fallback_seconds += seconds
+
+    def stats(self) -> dict:
+        """Hit rate and average time to an answer, for template SQL and for the LLM fallback."""
+        fallbacks = self.questions - self.hits
+        return {
+            'questions': self.questions,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.questions if self.questions else 0.0,
+            'avg_hit_ms': 1000 * self.hit_seconds / self.hits if self.hits else 0.0,
+            'avg_fallback_ms': 1000 * self.fallback_seconds / fallbacks if fallbacks else 0.0
+        }
+
+    def _load(self):
+        """Metric names from dim_metric, territory and category names (once)."""
+        if self._metrics is not None:
+            return
+        self._metrics = {}
+        try:
+            catalog = self.schema_context.get_metrics_catalog()
+        except Exception:
+            catalog = None
+        if catalog is not None and not catalog.empty:
+            for row in catalog.to_dict('records'):
+                name = row.get('metric_name')
+                if name:
+                    metric = {'key': row['metric_key'], 'name': name, 'unit': row.get('metric_unit') or ''}
+                    self._metrics[(str(name).lower(),)] = metric
+
+        self._values = {}
+        for column, query in (
+            ('territory_name', "SELECT DISTINCT territory_name FROM dim_territory WHERE territory_name IS NOT NULL"),
+            ('category_name', "SELECT DISTINCT category_name FROM dim_product WHERE category_name IS NOT NULL"),
+        ):
+            try:
+                names = pd.read_sql(query, self.schema_context.conn).iloc[:, 0]
+            except Exception:
+                # A failed statement aborts the transaction; reset it for the next query
+                try:
+                    self.schema_context.conn.rollback()
+                except Exception:
+                    pass
+                continue
+            for name in names:
+                self._values[(str(name).lower(),)] = (column, str(name))
+
+    def _match(self, tokens: list, consumed: list, vocabulary: list) -> list:
+        """
+        Match vocabulary phrases against unconsumed tokens, longest phrases first.
+
+        Returns:
+            (kind, value) of each match, in question order
+        """
+        phrases = [
+            (tuple(_tokens(phrase)), kind, value)
+            for phrase_list, kind, value in vocabulary
+            for phrase in phrase_list
+        ]
+        phrases.sort(key=lambda item: -len(item[0]))
+        matches = []
+        for phrase, kind, value in phrases:
+            size = len(phrase)
+            if not size:
+                continue
+            for start in range(len(tokens) - size + 1):
+                if tuple(tokens[start:start + size]) == phrase and not any(consumed[start:start + size]):
+                    consumed[start:start + size] = [True] * size
+                    matches.append((start, kind, value))
+        return [(kind, value) for _, kind, value in sorted(matches, key=lambda m: m[0])]
+
+    def _pick_table(self, tokens: list) -> Optional[str]:
+        """
+        Choose the table from the words of the question: customer-only terms,
+        then dim_metric names longer than any built-in measure, then sales
+        measures, then a plain customer list.
+        """
+        def longest(vocabulary) -> int:
+            """Content words in the longest phrase of the vocabulary found in the question."""
+            found = 0
+            for phrases in vocabulary:
+                for phrase in phrases:
+                    words = _tokens(phrase)
+                    size = len(words)
+                    if any(tokens[i:i + size] == words for i in range(len(tokens) - size + 1)):
+                        found = max(found, sum(word not in _FILLERS for word in words))
+            return found
+
+        customer_only = [
+            ('lifetime value', 'clv', 'ltv', 'churn', 'churning', 'rfm', 'cohort', 'recency'),
+            *self.CUSTOMER_FILTERS
+        ]
+        if longest(customer_only):
+            return 'mart_customer_analytics'
+        sales = longest(self.SALES_MEASURES)
+        if self._metrics and longest(self._metrics) > sales:
+            return 'metrics'
+        if sales:
+            return 'mart_sales'
+        if 'customer' in tokens:
+            return 'mart_customer_analytics'
+        return None
+
+    def _parse_ranking(self, tokens: list, consumed: list, intent: dict):
+        """Top / bottom N and highest / lowest."""
+        for i, word in enumerate(tokens):
+            if consumed[i]:
+                continue
+            if word in ('top', 'bottom'):
+                intent['order'] = 'DESC' if word == 'top' else 'ASC'
+                consumed[i] = True
+                if i + 1 < len(tokens) and tokens[i + 1].isdigit() and not YEAR_PATTERN.fullmatch(tokens[i + 1]):
+                    intent['limit'] = int(tokens[i + 1])
+                    consumed[i + 1] = True
+                else:
+                    intent['limit'] = DEFAULT_TOP_N
+                continue
+            for words, order in self.ORDER_WORDS.items():
+                if word in words:
+                    intent['order'] = order
+                    intent['limit'] = intent['limit'] or DEFAULT_TOP_N
+                    consumed[i] = True
+
+    def _parse_years(self, tokens: list, consumed: list, intent: dict):
+        """
+        Year filters: "in 2014", "in 2012, 2013 and 2014" (IN), "since 2012",
+        "before 2014", "between 2012 and 2013" / "from 2012 to 2013" (range).
+        Years a rule does not use stay unconsumed, so the LLM gets the question.
+        """
+        years = [i for i, word in enumerate(tokens) if YEAR_PATTERN.fullmatch(word) and not consumed[i]]
+        if not years:
+            return
+        start = years[0]
+        first = int(tokens[start])
+        before = tokens[start - 1] if start > 0 else ''
+        if (len(years) >= 2 and before in ('between', 'from') and years[1] == start + 2
+                and tokens[start + 1] in ('and', 'to')):
+            intent['filters'].append(('year_range', (first, int(tokens[years[1]]))))
+            used = [start - 1, start, start + 1, years[1]]
+        elif before in ('since', 'after'):
+            intent['filters'].append(('year_min', first + (before == 'after')))
+            used = [start - 1, start]
+        elif before == 'before':
+            intent['filters'].append(('year_max', first - 1))
+            used = [start - 1, start]
+        elif len(years) == 1:
+            intent['filters'].append(('year_range', (first, first)))
+            used = [start]
+        else:
+            intent['filters'].append(('year_in', tuple(sorted({int(tokens[i]) for i in years}))))
+            used = years
+        for i in used:
+            consumed[i] = True
+
+    def _render(self, intent: dict) -> Optional[str]:
+        if intent['table'] == 'metrics':
+            return self._render_metrics(intent)
+        if intent['table'] == 'mart_customer_analytics':
+            return self._render_customers(intent)
+        return self._render_sales(intent)
+
+    def _year_conditions(self, filters: list, column: str, scale: int = 1) -> list:
+        """Conditions of the year filters on `column` (scale 10000 for YYYYMMDD date keys)."""
+        conditions = []
+        for kind, value in filters:
+            if kind == 'year_range':
+                low, high = sorted(value)
+                if scale == 1:
+                    conditions.append(f"{column} = {_literal(low)}" if low == high
+                                      else f"{column} BETWEEN {_literal(low)} AND {_literal(high)}")
+                else:
+                    conditions.append(f"{column} BETWEEN {low * scale + 101} AND {high * scale + 1231}")
+            elif kind == 'year_in':
+                if scale == 1:
+                    conditions.append(f"{column} IN ({', '.join(_literal(year) for year in value)})")
+                else:
+                    conditions.append("(" + " OR ".join(
+                        f"{column} BETWEEN {year * scale + 101} AND {year * scale + 1231}" for year in value
+                    ) + ")")
+            elif kind == 'year_min':
+                conditions.append(f"{column} >= {value * scale + (101 if scale > 1 else 0)}")
+            elif kind == 'year_max':
+                conditions.append(f"{column} <= {value * scale + (1231 if scale > 1 else 0)}")
+        return conditions
+
+    def _value_conditions(self, filters: list, prefix: dict = None) -> list:
+        """
+        Conditions of the column = value filters (prefix maps columns to qualified
+        names); several values of one column ("Northwest and Canada") become IN.
+        """
+        prefix = prefix or {}
+        values = {}
+        for column, value in filters:
+            if column not in YEAR_FILTERS and value not in values.setdefault(column, []):
+                values[column].append(value)
+        conditions = []
+        for column, column_values in values.items():
+            if len(column_values) == 1:
+                conditions.append(f"{prefix.get(column, column)} = {_literal(column_values[0])}")
+            else:
+                conditions.append(f"{prefix.get(column, column)} IN ({', '.join(_literal(v) for v in column_values)})")
+        return conditions
+
+    def _render_sales(self, intent: dict) -> Optional[str]:
+        if not intent['measures']:
+            return None
+        grains = {
+            'day': ['order_date'],
+            'month': ['order_year', 'order_month'],
+            'quarter': ['order_year', 'order_quarter'],
+            'year': ['order_year']
+        }.get(intent['grain'], [])
+        group = intent['dimensions'] + grains
+        select = group + [f"{expression} AS {alias}" for alias, expression in intent['measures']]
+        where = [f"{column} IS NOT NULL" for column in intent['dimensions']]
+        where += self._year_conditions(intent['filters'], 'order_year')
+        where += self._value_conditions(intent['filters'])
+        order = self._order(intent, grains, intent['measures'][0][0])
+        return self._sql(select, 'mart_sales', where, group, order, intent['limit'])
+
+    def _render_customers(self, intent: dict) -> Optional[str]:
+        measures = intent['measures'] or [self.DEFAULT_CUSTOMER_MEASURE]
+        if intent['grain'] or any(kind.startswith('year') for kind, _ in intent['filters']):
+            return None  # No time columns to trend or filter on
+        where = self._value_conditions(intent['filters'])
+        if intent['dimensions']:
+            select = list(intent['dimensions']) + ["COUNT(*) AS customer_count"]
+            for alias, expression in measures:
+                select += [f"AVG({expression}) AS avg_{alias}", f"SUM({expression}) AS total_{alias}"]
+            where = [f"{column} IS NOT NULL" for column in intent['dimensions']] + where
+            order = self._order(intent, [], f"total_{measures[0][0]}")
+            return self._sql(select, 'mart_customer_analytics', where, intent['dimensions'], order, intent['limit'])
+
+        # A list of customers
+        select = [f"{self.CUSTOMER_NAME} AS customer_name"]
+        select += [expression if expression == alias else f"{expression} AS {alias}" for alias, expression in measures]
+        select += [column for column in ('customer_segment', 'churn_risk', 'rfm_category') if column not in select]
+        order = f"{measures[0][0]} {intent['order'] or 'DESC'}"
+        if measures[0][0] == 'recency_days' and intent['order'] is None:
+            order = "recency_days DESC"
+        return self._sql(select, 'mart_customer_analytics', where, [], [order], intent['limit'])
+
+    def _render_metrics(self, intent: dict) -> Optional[str]:
+        if len(intent['measures']) != 1:
+            return None
+        metric = intent['measures'][0]
+        alias = _alias(metric['name'])
+        if metric['unit'] in ('USD', 'Count'):
+            expression = "SUM(m.metric_sum)"
+        else:
+            expression = "SUM(m.metric_sum) / NULLIF(SUM(m.metric_count), 0)"
+
+        if intent['grain'] == 'day':
+            table, grains, year_column, scale = 'mart_metrics_daily', ['m.date_key'], 'm.date_key', 10000
+        else:
+            table, year_column, scale = 'mart_metrics_monthly', 'm.year', 1
+            grains = {
+                'month': ['m.year', 'm.month'],
+                'quarter': ['m.year', '(m.month - 1) / 3 + 1'],
+                'year': ['m.year']
+            }.get(intent['grain'], [])
+
+        columns = intent['dimensions'] + [column for column, _ in intent['filters'] if column in ('territory_name', 'category_name')]
+        joins = []
+        if any(column.startswith('dt.') or column == 'territory_name' for column in columns):
+            joins.append("LEFT JOIN dim_territory dt ON m.territory_key = dt.territoryid")
+        if any(column.startswith('dp.') or column == 'category_name' for column in columns):
+            joins.append("LEFT JOIN dim_product dp ON m.product_key = dp.productid")
+
+        group = intent['dimensions'] + grains
+        select = list(intent['dimensions'])
+        select += [f"{grain} AS quarter" if grain.startswith('(') else grain for grain in grains]
+        select.append(f"{expression} AS {alias}")
+        where = [f"m.metric_key = {_literal(metric['key'])}"]
+        where += [f"{column} IS NOT NULL" for column in intent['dimensions']]
+        where += self._year_conditions(intent['filters'], year_column, scale)
+        where += self._value_conditions(intent['filters'], {'territory_name': 'dt.territory_name', 'category_name': 'dp.category_name'})
+        order = self._order(intent, grains, alias)
+        source = "\n".join([f"{table} m"] + joins)
+        return self._sql(select, source, where, group, order, intent['limit'])
+
+    def _order(self, intent: dict, grains: list, measure: str) -> list:
+        """Time order for trends, otherwise the measure (highest first unless asked otherwise)."""
+        if grains and intent['order'] is None:
+            return list(grains)
+        if intent['dimensions'] or intent['order']:
+            return [f"{measure} {intent['order'] or 'DESC'}"]
+        return list(grains)
+
+    def _sql(self, select: list, source: str, where: list, group: list, order: list, limit: Optional[int]) -> str:
+        lines = ["SELECT " + ",\n       ".join(select), f"FROM {source}"]
+        if where:
+            lines.append("WHERE " + "\n  AND ".join(where))
+        if group:
+            lines.append("GROUP BY " + ", ".join(group))
+        if order:
+            lines.append("ORDER BY " + ", ".join(order))
+        if limit:
+            lines.append(f"LIMIT {int(limit)}")
+        return "\n".join(lines)
+
+    def _describe(self, intent: dict) -> str:
+        """Short description of the parsed intent, for the page."""
+        if intent['table'] == 'metrics':
+            measures = [m['name'] for m in intent['measures']]
+        else:
+            measures = [alias.replace('_', ' ') for alias, _ in intent['measures']]
+        if intent['table'] == 'mart_customer_analytics' and not intent['dimensions']:
+            parts = [f"customers by {measures[0] if measures else 'lifetime value'}"]
+        else:
+            parts = [" and ".join(measures)]
+        dimensions = [d.split('.')[-1].replace('_', ' ') for d in intent['dimensions']]
+        if dimensions:
+            parts.append("by " + ", ".join(dimensions))
+        if intent['grain']:
+            parts.append(f"per {intent['grain']}")
+        filters = []
+        for column, value in intent['filters']:
+            if column == 'year_range':
+                filters.append(str(value[0]) if value[0] == value[1] else f"{min(value)}-{max(value)}")
+            elif column == 'year_in':
+                filters.append(", ".join(str(year) for year in value))
+            elif column == 'year_min':
+                filters.append(f"since {value}")
+            elif column == 'year_max':
+                filters.append(f"until {value}")
+            else:
+                filters.append(str(value))
+        if filters:
+            parts.append(f"({', '.join(filters)})")
+        if intent['limit']:
+            parts.append(f"{'top' if intent['order'] != 'ASC' else 'bottom'} {intent['limit']}")
+        return " ".join(parts)
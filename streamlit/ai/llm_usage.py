@@ -0,0 +1,96 @@
+"""
+LLM Usage
+=========
+Token usage of the LLM calls, including provider-side prompt caching.
+
+The schema part of the system prompt is identical for every question, so it
+is sent as a byte-stable prefix that the providers can cache:
+- Anthropic: the prefix block is marked with cache_control (ephemeral)
+- OpenAI: prompts sharing a prefix of 1024+ tokens are cached automatically
+
+The usage metadata of each response is parsed into one format, so the page can
+report how much of the input was served from the provider cache.
+
+Setting:
+    AI_PROMPT_CACHE  - 0 disables prompt caching (default 1); the schema is
+                       then trimmed to the question instead (see SchemaRetriever)
+"""
+
+import os
+import threading
+from typing import Optional
+
+PROMPT_CACHING = os.getenv("AI_PROMPT_CACHE", "1") != "0"
+
+
+def _get(obj, name: str, default=0):
+    """Attribute of an SDK object or key of a dict (recorded responses)."""
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        value = obj.get(name, default)
+    else:
+        value = getattr(obj, name, default)
+    return default if value is None else value
+
+
+def parse_openai_usage(usage) -> dict:
+    """Normalize OpenAI usage (prompt_tokens includes the cached tokens)."""
+    return {
+        'input_tokens': _get(usage, 'prompt_tokens'),
+        'cached_tokens': _get(_get(usage, 'prompt_tokens_details', None), 'cached_tokens'),
+        'cache_write_tokens': 0,  # OpenAI does not report cache writes
+        'output_tokens': _get(usage, 'completion_tokens')
+    }
+
+
+def parse_anthropic_usage(usage) -> dict:
+    """Normalize Anthropic usage (input_tokens excludes cache reads and writes)."""
+    cached = _get(usage, 'cache_read_input_tokens')
+    written = _get(usage, 'cache_creation_input_tokens')
+    return {
+        'input_tokens': _get(usage, 'input_tokens') + cached + written,
+        'cached_tokens': cached,
+        'cache_write_tokens': written,
+        'output_tokens': _get(usage, 'output_tokens')
+    }
+
+
+class TokenUsage:
+    """Running totals of the token usage of LLM calls."""
+
+    FIELDS = ('input_tokens', 'cached_tokens', 'cache_write_tokens', 'output_tokens')
+
+    def __init__(self):
+        self.calls = 0
+        self.unmetered_calls = 0
+        self.totals = dict.fromkeys(self.FIELDS, 0)
+        self.last = None
+        self._lock = threading.Lock()  # Speculative SQL candidates record from worker threads
+
+    def record(self, usage: Optional[dict]):
+        """Add the normalized usage of one call (None: not reported, e.g. a stream closed early)."""
+        with self._lock:
+            self.calls += 1
+            self.last = usage
+            if usage is None:
+                self.unmetered_calls += 1
+                return
+            for field in self.FIELDS:
+                self.totals[field] += usage.get(field, 0)
+
+    @property
+    def cached_ratio(self) -> float:
+        """Share of input tokens read from the provider cache."""
+        if not self.totals['input_tokens']:
+            return 0.0
+        return self.totals['cached_tokens'] / self.totals['input_tokens']
+
+    def summary(self) -> dict:
+        """Totals, call counts and cached ratio (of the calls with reported usage)."""
+        return {
+            'calls': self.calls,
+            'unmetered_calls': self.unmetered_calls,
+            **self.totals,
+            'cached_ratio': self.cached_ratio
+        }
@@ -0,0 +1,157 @@
+"""
+Post-Query Pipeline
+===================
+Runs the independent steps after a query (chart, metric cards, table
+formatting) on worker threads while the LLM analysis streams in,
+so the network-bound analysis and the CPU-bound chart building overlap.
+
+- TaskGraph: runs functions as soon as their dependencies are done; the
+  caller collects results in completion order and renders each piece as soon
+  as it is ready (Streamlit calls stay on the script thread)
+- StageTimer: wall-clock time of each stage, and how much the overlap saved
+  compared to running the stages one after another
+
+Setting:
+    AI_PIPELINE_WORKERS  - worker threads (default 3; 0 runs every task inline,
+                           in order, as a sequential baseline)
+"""
+
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Iterator, Tuple
+
+DEFAULT_WORKERS = int(os.getenv("AI_PIPELINE_WORKERS", "3"))
+
+
+class StageTimer:
+    """Start and end of named stages, in seconds since the timer was created."""
+
+    def __init__(self):
+        self._start = perf_counter()
+        self.stages = OrderedDict()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as stage `name`."""
+        start = perf_counter() - self._start
+        try:
+            yield
+        finally:
+            self.stages[name] = (start, perf_counter() - self._start)
+
+    def summary(self) -> dict:
+        """
+        Stage durations, wall time and the time saved by overlapping.
+
+        Returns:
+            Dictionary with 'stages' (name -> seconds, by start), 'wall' (first start to
+            last end), 'sequential' (sum of the stages) and 'saved'
+        """
+        ordered = sorted(self.stages.items(), key=lambda item: item[1][0])
+        durations = OrderedDict((name, end - start) for name, (start, end) in ordered)
+        if not self.stages:
+            return {'stages': durations, 'wall': 0.0, 'sequential': 0.0, 'saved': 0.0}
+        wall = max(end for _, end in self.stages.values()) - min(start for start, _ in self.stages.values())
+        sequential = sum(durations.values())
+        return {'stages': durations, 'wall': wall, 'sequential': sequential, 'saved': max(0.0, sequential - wall)}
+
+    def format(self) -> str:
+        """One-line summary, e.g. "analysis 4.1s · chart 0.4s | 4.2s (sequential 4.5s, saved 0.3s)"."""
+        summary = self.summary()
+        stages = " · ".join(f"{name} {seconds:.1f}s" for name, seconds in summary['stages'].items())
+        return (f"{stages} | {summary['wall']:.1f}s "
+                f"(sequential {summary['sequential']:.1f}s, saved {summary['saved']:.1f}s)")
+
+
+class TaskGraph:
+    """Small task-graph executor: each task runs on a thread once its dependencies are done."""
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, timer: StageTimer = None):
+        """
+        Initialize the graph.
+
+        Args:
+            max_workers: Worker threads (0 = run tasks inline, in the order added)
+            timer: Optional StageTimer recording each task as a stage
+        """
+        self.max_workers = max_workers
+        self.timer = timer
+        self._tasks = OrderedDict()
+        self._results = {}
+        self._running = {}
+        self._inline_done = []
+        self._executor = None
+
+    def add(self, name: str, fn, *dependencies: str):
+        """
+        Add a task; it is called with the results of its dependencies, in order.
+
+        Args:
+            name: Task name (also its stage name in the timer)
+            fn: Function to run
+            dependencies: Names of tasks whose results it needs
+        """
+        self._tasks[name] = (fn, dependencies)
+
+    def start(self):
+        """Start every task without pending dependencies."""
+        if self.max_workers > 0:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="post-query")
+        self._submit_ready()
+
+    def completed(self) -> Iterator[Tuple[str, object]]:
+        """
+        (name, result) of the tasks finished since the last call, without waiting.
+        A task's exception is raised here.
+        """
+        yield from self._collect(block=False)
+
+    def wait(self) -> Iterator[Tuple[str, object]]:
+        """(name, result) of every remaining task, in completion order."""
+        try:
+            while self._running or self._inline_done:
+                yield from self._collect(block=True)
+        finally:
+            if self._executor:
+                self._executor.shutdown(wait=False)
+
+    def _pending(self) -> list:
+        return [name for name in self._tasks if name not in self._results and name not in self._running]
+
+    def _run(self, name: str, fn, args: list):
+        if self.timer is None:
+            return fn(*args)
+        with self.timer.stage(name):
+            return fn(*args)
+
+    def _submit_ready(self):
+        """Start the tasks whose dependencies all have results."""
+        for name in self._pending():
+            fn, dependencies = self._tasks[name]
+            if all(d in self._results for d in dependencies):
+                args = [self._results[d] for d in dependencies]
+                if self._executor is None:
+                    self._results[name] = self._run(name, fn, args)
+                    self._inline_done.append(name)
+                    self._submit_ready()
+                    return
+                self._running[name] = self._executor.submit(self._run, name, fn, args)
+
+    def _collect(self, block: bool) -> Iterator[Tuple[str, object]]:
+        while self._inline_done:
+            name = self._inline_done.pop(0)
+            yield name, self._results[name]
+        if not self._running:
+            return
+
+        futures = {future: name for name, future in self._running.items()}
+        done, _ = wait(futures, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = futures[future]
+            del self._running[name]
+            self._results[name] = future.result()
+            yield name, self._results[name]
+        self._submit_ready()
@@ -0,0 +1,257 @@
+"""
+Query Cache
+===========
+Persistent cache from normalized question to validated SQL.
+Shared across sessions and processes (SQLite file), so repeated questions
+such as the suggested ones skip the LLM entirely.
+
+Questions are normalized for case, whitespace, punctuation and stop words.
+Numbers that appear exactly once in the SQL (e.g. "top 10" -> LIMIT 10, "2014")
+become parameters, so "top 5 customers" reuses the SQL of "top 10 customers".
+A number that appears more than once (e.g. "top 2" with ROUND(..., 2)) keeps
+the question under its literal key: the SQL does not say which one to replace.
+
+Entries are tied to a fingerprint of allowed_tables.json and schema_ai.md
+and are dropped when either file changes.
+
+Location: AI_QUERY_CACHE (default streamlit/logs/ai_query_cache.db)
+"""
+
+import os
+import re
+import hashlib
+import sqlite3
+from pathlib import Path
+from typing import Optional, Tuple
+
+CACHE_PATH = Path(os.getenv(
+    "AI_QUERY_CACHE",
+    Path(__file__).parent.parent / 'logs' / 'ai_query_cache.db'
+))
+
+# Words that do not change what is asked
+STOP_WORDS = {
+    'a', 'an', 'the', 'of', 'for', 'in', 'on', 'at', 'to', 'by', 'per', 'and',
+    'me', 'my', 'our', 'us', 'we', 'i', 'you', 'please', 'can', 'could', 'would',
+    'show', 'list', 'give', 'tell', 'get', 'find', 'display',
+    'what', 'which', 'who', 'is', 'are', 'was', 'were', 'do', 'does', 'have', 'has',
+    'there', 'all', 'about'
+}
+
+NUMBER_PATTERN = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+def normalize_question(question: str) -> Tuple[str, list]:
+    """
+    Normalize a question for cache lookup.
+
+    Returns:
+        Tuple of (normalized text with numbers as <n>, list of the numbers in order)
+    """
+    text = question.lower()
+    numbers = NUMBER_PATTERN.findall(text)
+    text = NUMBER_PATTERN.sub(' <n> ', text)
+    words = re.findall(r'<n>|[a-z0-9_]+', text)
+    return ' '.join(w for w in words if w not in STOP_WORDS), numbers
+
+
+class QueryCache:
+    """Persistent normalized-question -> SQL cache."""
+
+    def __init__(self, path: Path = CACHE_PATH, watched_files: list = None):
+        """
+        Initialize the cache.
+
+        Args:
+            path: SQLite file shared by all sessions and processes
+            watched_files: Files whose change invalidates the cache
+                           (allowed_tables.json and schema_ai.md)
+        """
+        self.path = Path(path)
+        self.watched_files = [Path(p) for p in (watched_files or [])]
+        self.hits = 0
+        self.misses = 0
+        self.available = True
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as db:
+                db.execute("""
+                    CREATE TABLE IF NOT EXISTS query_cache (
+                        question_key TEXT PRIMARY KEY,
+                        fingerprint TEXT NOT NULL,
+                        question TEXT NOT NULL,
+                        sql_template TEXT NOT NULL,
+                        hit_count INTEGER NOT NULL DEFAULT 0,
+                        created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                db.execute("CREATE TABLE IF NOT EXISTS cache_stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        except (OSError, sqlite3.Error):
+            self.available = False  # e.g. read-only mount: run without a cache
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=5)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def fingerprint(self) -> str:
+        """Hash of the watched files (schema and table whitelist)."""
+        digest = hashlib.sha256()
+        for path in self.watched_files:
+            digest.update(str(path.name).encode())
+            if path.exists():
+                digest.update(path.read_bytes())
+        return digest.hexdigest()[:16]
+
+    def _key(self, question: str, sql: str = None) -> Tuple[str, list, bool]:
+        """
+        Cache key for a question: (key, numbers, parameterized).
+        Numbers are parameters only if they are distinct and each appears exactly
+        once in the SQL; otherwise they stay part of the key.
+        """
+        normalized, numbers = normalize_question(question)
+        if sql is None or (len(set(numbers)) == len(numbers)
+                           and all(len(re.findall(rf'\b{re.escape(n)}\b', sql)) == 1 for n in numbers)):
+            return normalized, numbers, True
+        return f"{normalized} | {' '.join(numbers)}", numbers, False
+
+    def get(self, question: str) -> Optional[str]:
+        """Return cached SQL for a question, or None (counted as hit or miss)."""
+        if not self.available:
+            return None
+
+        normalized, numbers = normalize_question(question)
+        literal_key = f"{normalized} | {' '.join(numbers)}" if numbers else None
+        fingerprint = self.fingerprint()
+        try:
+            with self._connect() as db:
+                row = None
+                for key in filter(None, [literal_key, normalized]):
+                    row = db.execute(
+                        "SELECT question_key, sql_template FROM query_cache WHERE question_key = ? AND fingerprint = ?",
+                        (key, fingerprint)
+                    ).fetchone()
+                    if row:
+                        break
+                sql = self._fill(row[1], numbers) if row else None
+                if sql is not None:
+                    db.execute("UPDATE query_cache SET hit_count = hit_count + 1 WHERE question_key = ?", (row[0],))
+                self._count(db, 'hits' if sql is not None else 'misses')
+        except sqlite3.Error:
+            return None
+
+        if sql is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return sql
+
+    def put(self, question: str, sql: str):
+        """Store the validated SQL of a successful question."""
+        if not self.available:
+            return
+
+        key, numbers, parameterized = self._key(question, sql)
+        template = sql
+        if parameterized:
+            for index, number in enumerate(numbers):
+                template = re.sub(rf'\b{re.escape(number)}\b', f'{{{{n{index}}}}}', template)
+
+        try:
+            with self._connect() as db:
+                fingerprint = self.fingerprint()
+                # Schema or whitelist changed: everything cached before is stale
+                db.execute("DELETE FROM query_cache WHERE fingerprint <> ?", (fingerprint,))
+                db.execute(
+                    "INSERT OR REPLACE INTO query_cache (question_key, fingerprint, question, sql_template) VALUES (?, ?, ?, ?)",
+                    (key, fingerprint, question, template)
+                )
+        except sqlite3.Error:
+            pass
+
+    def invalidate(self, question: str):
+        """Drop a question's entry (e.g. its SQL failed on execution)."""
+        if not self.available:
+            return
+        normalized, numbers = normalize_question(question)
+        keys = [normalized] + ([f"{normalized} | {' '.join(numbers)}"] if numbers else [])
+        try:
+            with self._connect() as db:
+                db.executemany("DELETE FROM query_cache WHERE question_key = ?", [(k,) for k in keys])
+        except sqlite3.Error:
+            pass
+
+    def version(self) -> tuple:
+        """Changes whenever entries are added, replaced or dropped."""
+        if not self.available:
+            return ()
+        try:
+            with self._connect() as db:
+                fingerprint = self.fingerprint()
+                count, last = db.execute(
+                    "SELECT COUNT(*), MAX(rowid) FROM query_cache WHERE fingerprint = ?", (fingerprint,)
+                ).fetchone()
+        except sqlite3.Error:
+            return ()
+        return fingerprint, count, last
+
+    def entries(self) -> list:
+        """All current (question, sql) pairs, SQL filled with the question's own numbers."""
+        if not self.available:
+            return []
+        try:
+            with self._connect() as db:
+                rows = db.execute(
+                    "SELECT question, sql_template FROM query_cache WHERE fingerprint = ? ORDER BY rowid",
+                    (self.fingerprint(),)
+                ).fetchall()
+        except sqlite3.Error:
+            return []
+        pairs = []
+        for question, template in rows:
+            sql = self._fill(template, normalize_question(question)[1])
+            if sql is not None:
+                pairs.append((question, sql))
+        return pairs
+
+    def stats(self) -> dict:
+        """Entries and hit rate, for this process and across all processes."""
+        stats = {
+            'entries': 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.0,
+            'total_hits': 0,
+            'total_misses': 0,
+            'total_hit_rate': 0.0
+        }
+        if not self.available:
+            return stats
+        try:
+            with self._connect() as db:
+                stats['entries'] = db.execute(
+                    "SELECT COUNT(*) FROM query_cache WHERE fingerprint = ?", (self.fingerprint(),)
+                ).fetchone()[0]
+                counts = dict(db.execute("SELECT name, value FROM cache_stats").fetchall())
+        except sqlite3.Error:
+            return stats
+        total_hits, total_misses = counts.get('hits', 0), counts.get('misses', 0)
+        stats['total_hits'] = total_hits
+        stats['total_misses'] = total_misses
+        if total_hits + total_misses:
+            stats['total_hit_rate'] = total_hits / (total_hits + total_misses)
+        return stats
+
+    def _count(self, db: sqlite3.Connection, name: str):
+        db.execute(
+            "INSERT INTO cache_stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def _fill(self, template: str, numbers: list) -> Optional[str]:
+        """Put the question's numbers into a SQL template (None if they do not fit)."""
+        placeholders = set(re.findall(r'\{\{n(\d+)\}\}', template))
+        if any(int(index) >= len(numbers) for index in placeholders):
+            return None
+        return re.sub(r'\{\{n(\d+)\}\}', lambda m: numbers[int(m.group(1))], template)
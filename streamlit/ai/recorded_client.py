@@ -0,0 +1,186 @@
+"""
+Recorded Client
+===============
+Offline stand-in for the OpenAI and Anthropic clients, for running the
+assistant without an API key or network (development, demos, checks of the
+prompt caching).
+
+Responses are replayed in order from a list or a JSONL file, one object per
+line: {"text": "SELECT ...", "usage": {...}}. "usage" is optional and in the
+provider's own format. Without it, the client simulates the provider cache:
+- Anthropic: the system blocks up to the last cache_control mark are read
+  from the cache if the same prefix was sent before, otherwise written
+- OpenAI: the longest prefix shared with an earlier prompt is cached, in
+  128-token steps from 1024 tokens
+
+Requests with stream=True get a RecordedStream of SDK-shaped events, a few
+characters per delta; `events_sent` shows where a consumer closed it.
+
+Tokens are estimated at 4 characters each. Every request is kept in
+`requests` (and every stream in `streams`) for inspection.
+
+Usage:
+    SQLGenerator(conn, provider="anthropic", client=RecordedClient(path="responses.jsonl"))
+"""
+
+import json
+import hashlib
+from pathlib import Path
+from types import SimpleNamespace
+
+CHARS_PER_TOKEN = 4
+
+# OpenAI caches prompts of at least 1024 tokens, in 128-token increments
+OPENAI_MIN_CACHED_TOKENS = 1024
+OPENAI_CACHE_INCREMENT = 128
+
+# Characters per streamed text delta
+STREAM_CHUNK_CHARS = 8
+
+
+def _namespace(value):
+    """Dicts (recorded JSON) to attribute objects, like the SDK responses."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_namespace(v) for v in value]
+    return value
+
+
+def _tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+def _chunks(text: str) -> list:
+    return [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+
+
+class RecordedStream:
+    """Recorded stream events, closable like the SDK streams."""
+
+    def __init__(self, events: list):
+        self._events = events
+        self.events_sent = 0
+        self.closed = False
+
+    def __iter__(self):
+        for event in self._events:
+            if self.closed:
+                return
+            self.events_sent += 1
+            yield event
+
+    def close(self):
+        self.closed = True
+
+
+class RecordedClient:
+    """Replays recorded responses through the OpenAI and Anthropic call shapes."""
+
+    def __init__(self, responses: list = None, path: Path = None):
+        """
+        Initialize the client.
+
+        Args:
+            responses: Recorded responses ({"text", "usage"} dicts or plain strings)
+            path: JSONL file of recorded responses (used if responses is None)
+        """
+        if responses is None and path is not None:
+            with open(path, 'r') as f:
+                responses = [json.loads(line) for line in f if line.strip()]
+        self.responses = [r if isinstance(r, dict) else {'text': r} for r in (responses or [])]
+        self.requests = []
+        self.streams = []
+        self._position = 0
+        self._cached_prefixes = set()
+        self._openai_prompts = []
+
+        self.messages = SimpleNamespace(create=self._create_anthropic)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_openai))
+
+    def _next(self) -> dict:
+        """The next recorded response (cycles through them)."""
+        if not self.responses:
+            return {'text': '-- ERROR: no recorded response'}
+        response = self.responses[self._position % len(self.responses)]
+        self._position += 1
+        return response
+
+    def _create_anthropic(self, **request):
+        self.requests.append(request)
+        response = self._next()
+        usage = response.get('usage') or self._simulate_anthropic_usage(request, response['text'])
+        if request.get('stream'):
+            start_usage = {k: v for k, v in usage.items() if k != 'output_tokens'}
+            events = [SimpleNamespace(type='message_start', message=_namespace({'usage': {**start_usage, 'output_tokens': 1}}))]
+            events += [
+                SimpleNamespace(type='content_block_delta', index=0, delta=SimpleNamespace(type='text_delta', text=piece))
+                for piece in _chunks(response['text'])
+            ]
+            events += [
+                SimpleNamespace(type='message_delta', usage=SimpleNamespace(output_tokens=usage.get('output_tokens', 0))),
+                SimpleNamespace(type='message_stop')
+            ]
+            return self._stream(events)
+        return SimpleNamespace(
+            content=[SimpleNamespace(type='text', text=response['text'])],
+            usage=_namespace(usage)
+        )
+
+    def _create_openai(self, **request):
+        self.requests.append(request)
+        response = self._next()
+        usage = response.get('usage') or self._simulate_openai_usage(request, response['text'])
+        if request.get('stream'):
+            events = [
+                SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=piece))], usage=None)
+                for piece in _chunks(response['text'])
+            ]
+            if (request.get('stream_options') or {}).get('include_usage'):
+                events.append(SimpleNamespace(choices=[], usage=_namespace(usage)))
+            return self._stream(events)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(role='assistant', content=response['text']))],
+            usage=_namespace(usage)
+        )
+
+    def _stream(self, events: list) -> RecordedStream:
+        stream = RecordedStream(events)
+        self.streams.append(stream)
+        return stream
+
+    def _simulate_anthropic_usage(self, request: dict, text: str) -> dict:
+        system = request.get('system', '')
+        blocks = system if isinstance(system, list) else [{'type': 'text', 'text': system}]
+        marked = [i for i, block in enumerate(blocks) if block.get('cache_control')]
+        cut = marked[-1] + 1 if marked else 0
+
+        prefix = ''.join(block['text'] for block in blocks[:cut])
+        rest = ''.join(block['text'] for block in blocks[cut:])
+        rest += ''.join(str(m['content']) for m in request.get('messages', []))
+
+        usage = {'input_tokens': _tokens(rest), 'output_tokens': _tokens(text),
+                 'cache_creation_input_tokens': 0, 'cache_read_input_tokens': 0}
+        if prefix:
+            key = hashlib.sha256(prefix.encode()).hexdigest()
+            field = 'cache_read_input_tokens' if key in self._cached_prefixes else 'cache_creation_input_tokens'
+            usage[field] = _tokens(prefix)
+            self._cached_prefixes.add(key)
+        return usage
+
+    def _simulate_openai_usage(self, request: dict, text: str) -> dict:
+        prompt = ''.join(str(m['content']) for m in request.get('messages', []))
+        shared = 0
+        for earlier in self._openai_prompts:
+            length = 0
+            for a, b in zip(prompt, earlier):
+                if a != b:
+                    break
+                length += 1
+            shared = max(shared, length)
+        self._openai_prompts.append(prompt)
+
+        cached = _tokens(prompt[:shared])
+        cached = 0 if cached < OPENAI_MIN_CACHED_TOKENS else cached - cached % OPENAI_CACHE_INCREMENT
+        return {'prompt_tokens': _tokens(prompt), 'completion_tokens': _tokens(text),
+                'prompt_tokens_details': {'cached_tokens': cached}}
@@ -10,8 +10,9 @@ Auto-synced with dbt models via allowed_tables.json generated by dbt run.
 import os
 import json
 import pandas as pd
-from typing import Optional
+from typing import Optional, Tuple
 from pathlib import Path
+from .schema_retriever import SchemaRetriever, sql_tables
 
 # Try to import yaml for loading dbt schema files
 try:
@@ -39,6 +40,7 @@ class SchemaContext:
         self._yaml_schemas_cache: Optional[dict] = None
         self._dbt_profile_cache: Optional[dict] = None
         self._markdown_schema_cache: Optional[str] = None
+        self._static_prompt_cache: Optional[str] = None
         
         # Path to dbt directory
         # In Docker: /dbt/models/ (mounted volume)
@@ -51,6 +53,7 @@ class SchemaContext:
         else:
             self.dbt_path = local_dbt_path
         self.dbt_models_path = self.dbt_path / 'models'
+        self.retriever = SchemaRetriever(self)
     
     def load_markdown_schema(self) -> str:
         """
@@ -156,6 +159,11 @@ class SchemaContext:
             self._metrics_cache = pd.read_sql(query, self.conn)
             return self._metrics_cache
         except Exception as e:
+            # A failed statement aborts the transaction; reset it for the next query
+            try:
+                self.conn.rollback()
+            except Exception:
+                pass
             # Return empty DataFrame if table doesn't exist
             return pd.DataFrame()
     
@@ -407,33 +415,99 @@ LIMIT 100"""
             )
         ]
     
-    def build_system_prompt(self) -> str:
+    def build_system_prompt(self, similar_examples: list = None, question: str = None,
+                            cached_prefix: bool = False) -> str:
         """
         Build the complete system prompt for SQL generation.
         Uses markdown schema if available (more token-efficient).
         
+        Args:
+            similar_examples: Optional (question, sql) pairs of similar answered
+                              questions, appended as few-shot examples
+            question: If given, only the tables and metrics relevant to it are
+                      included (see SchemaRetriever); the full schema is used
+                      if nothing matches
+            cached_prefix: Keep the schema whole for provider prompt caching
+                           (see build_prompt_parts)
+        
+        Returns:
+            System prompt string with full (or question-focused) context
+        """
+        return ''.join(self.build_prompt_parts(similar_examples, question, cached_prefix))
+    
+    def build_prompt_parts(self, similar_examples: list = None, question: str = None,
+                           cached_prefix: bool = False) -> Tuple[str, str]:
+        """
+        Build the system prompt as a static prefix and a per-question suffix.
+        
+        With cached_prefix the prefix is the full schema, built once and
+        byte-identical for every question, so the provider can cache it; the
+        tables and metrics relevant to the question are then named in the
+        suffix instead of trimming the schema.
+        
         Returns:
-            System prompt string with full context
+            Tuple of (prefix, suffix); the system prompt is prefix + suffix
         """
+        examples = self.format_similar_examples(similar_examples)
+        if cached_prefix:
+            hint = self.retriever.build_hint(question) if question else ""
+            return self.get_static_prompt(), hint + examples
+        return self._build_schema_prompt(question), examples
+    
+    def get_static_prompt(self) -> str:
+        """The full-schema system prompt, built once per session so it stays byte-stable."""
+        if self._static_prompt_cache is None:
+            self._static_prompt_cache = self._build_schema_prompt()
+        return self._static_prompt_cache
+    
+    def _build_schema_prompt(self, question: str = None) -> str:
+        """System prompt without few-shot examples (focused on the question if given)."""
         # Try to use optimized markdown schema first (saves ~30% tokens)
         if self.use_markdown:
             markdown_schema = self.load_markdown_schema()
+            if markdown_schema and question:
+                markdown_schema = self.retriever.build_schema(question) or markdown_schema
             if markdown_schema:
                 return f"""You are a SQL expert for the AdventureWorks data warehouse on PostgreSQL.
-Convert natural language questions into accurate SQL queries.
+Convert natural language questions into accurate SQL queries. End each query with a semicolon.
 
 {markdown_schema}"""
         
         # Fallback to YAML-based schema (more tokens, but works without schema_ai.md)
-        return self._build_yaml_based_prompt()
+        return self._build_yaml_based_prompt(question)
     
-    def _build_yaml_based_prompt(self) -> str:
+    def format_similar_examples(self, similar_examples: list = None) -> str:
+        """
+        Format similar answered questions as few-shot examples.
+        Kept at the end of the prompt so the schema part stays identical across questions.
+        """
+        if not similar_examples:
+            return ""
+        examples = "\n\n".join(
+            f"Question: {question}\nSQL:\n```sql\n{sql}\n```"
+            for question, sql in similar_examples
+        )
+        return f"""
+
+## Similar Questions Answered Before (verified SQL):
+{examples}"""
+    
+    def _build_yaml_based_prompt(self, question: str = None) -> str:
         """Build system prompt from YAML files (fallback method)."""
         metrics_df = self.get_metrics_catalog()
         tables = self.get_table_schemas()
         examples = self.get_example_queries()
         dbt_profile = self.load_dbt_profile()
         
+        # Only the tables, metrics and examples relevant to the question
+        selection = self.retriever.select(question) if question else None
+        if selection:
+            tables = {t: desc for t, desc in tables.items() if t in selection['tables']}
+            metric_keys = [m['metric_key'] for m in selection['metrics']]
+            if not metrics_df.empty:
+                metrics_df = metrics_df[metrics_df['metric_key'].astype(str).isin(metric_keys)]
+            examples = [(q, sql) for q, sql in examples if sql_tables(sql) <= set(tables)]
+        
         # Build database connection context
         db_context = f"""Database: {dbt_profile.get('database', 'data_warehouse')}
 Schema: {dbt_profile.get('schema', 'dbt')}
@@ -507,7 +581,7 @@ Example correct join:
 {examples_context}
 
 ## Response Format:
-Return ONLY the SQL query without any explanation or markdown formatting.
+Return ONLY the SQL query without any explanation or markdown formatting, ending with a semicolon.
 If the question cannot be answered with the available data, respond with:
 -- ERROR: [explanation of why the query cannot be generated]
 """
@@ -532,4 +606,4 @@ mart_metrics: ⭐ USE FOR ALL METRIC QUERIES! metric_name, metric_category, metr
 
 ⚠️ Join PKs: dim_customer.customerid, dim_product.productid, dim_territory.territoryid, dim_employee.employee_id
 
-USE mart tables - they're pre-joined! Return ONLY SQL."""
+USE mart tables - they're pre-joined! Return ONLY SQL, ending with a semicolon."""
@@ -0,0 +1,335 @@
+"""
+Schema Retriever
+================
+Question-focused schema context for the first SQL attempt.
+Instead of the whole of schema_ai.md, the system prompt gets only the tables,
+metrics and SQL patterns relevant to the question:
+
+1. Tables (from the schema_ai.md sections, or the dbt YAML descriptions) and
+   dim_metric entries are indexed offline as TF-IDF vectors of words and
+   character n-grams; SQL patterns count towards the tables they query
+2. The top-N tables for the question are selected (at least one mart), plus
+   the related tables on the join graph that the question also matches;
+   matching metrics are listed, and pull in mart_metrics when they match the
+   question better than any table
+3. The prompt keeps the header, the quick reference, the join keys and
+   patterns of the selected tables, the guidelines and the response format,
+   and names the tables that were left out
+
+When nothing matches, the full schema is used. SQLGenerator only focuses the
+first attempt; retries always get the full schema.
+
+With provider prompt caching (AI_PROMPT_CACHE, on by default) the schema is
+not trimmed, so the cached prefix stays the same for every question; the
+selection is then named in a short hint after it (build_hint).
+
+Settings:
+    AI_SCHEMA_RETRIEVAL   - 0 disables retrieval (default 1)
+    AI_SCHEMA_TOP_TABLES  - tables selected before graph expansion (default 4)
+"""
+
+import os
+import re
+from collections import Counter, OrderedDict, defaultdict
+from typing import Optional
+
+from .similarity_index import TfidfIndex, question_features
+
+RETRIEVAL_ENABLED = os.getenv("AI_SCHEMA_RETRIEVAL", "1") != "0"
+DEFAULT_TOP_TABLES = int(os.getenv("AI_SCHEMA_TOP_TABLES", "4"))
+
+# Below these scores a table or metric is not considered relevant; tables
+# must also score at least RELATIVE_TABLE_SCORE x the best table
+MIN_TABLE_SCORE = 0.05
+RELATIVE_TABLE_SCORE = 0.4
+MIN_METRIC_SCORE = 0.2
+
+# Metrics listed in a focused prompt
+MAX_METRICS = 10
+
+# Foreign key columns and the dimension they join (schema_ai.md overrides this)
+DEFAULT_JOIN_KEYS = {
+    'customer_key': 'dim_customer',
+    'product_key': 'dim_product',
+    'territory_key': 'dim_territory',
+    'employee_key': 'dim_employee',
+    'vendor_key': 'dim_vendor',
+    'date_key': 'dim_date',
+    'metric_key': 'dim_metric',
+}
+
+TABLE_NAME_PATTERN = re.compile(r'\b((?:mart|dim|fact)_[a-z0-9_]+)\b')
+SQL_TABLE_PATTERN = re.compile(r'\b(?:FROM|JOIN)\s+([a-zA-Z_]\w*)', re.IGNORECASE)
+
+
+def text_features(text: str) -> Counter:
+    """question_features of a text, with snake_case identifiers also split into words."""
+    return question_features(text.replace('_', ' ') + ' ' + text)
+
+
+def sql_tables(sql: str) -> set:
+    """Tables a SQL query or snippet reads from."""
+    return {t.lower() for t in SQL_TABLE_PATTERN.findall(sql)}
+
+
+def parse_schema_markdown(markdown: str) -> dict:
+    """
+    Split schema_ai.md into the parts a focused prompt is built from.
+
+    Returns:
+        Dictionary with 'header' (text before the first section), 'sections'
+        (ordered (title, intro, subsections) where subsections map a ### title
+        to its text), 'patterns' (SQL snippets of Common SQL Patterns),
+        'join_keys' (fk column -> (dimension, table row)) and 'join_example'
+    """
+    parsed = {'header': '', 'sections': [], 'patterns': [], 'join_keys': OrderedDict(), 'join_example': ''}
+    parts = re.split(r'^(?=## )', markdown, flags=re.MULTILINE)
+    parsed['header'] = parts[0].strip()
+
+    for part in parts[1:]:
+        title, _, body = part.partition('\n')
+        title = title[3:].strip()
+        body = re.sub(r'\n-{3,}\s*$', '', body.rstrip()).strip()
+        chunks = re.split(r'^(?=### )', body, flags=re.MULTILINE)
+        subsections = OrderedDict()
+        for chunk in chunks[1:]:
+            sub_title = chunk.partition('\n')[0][4:].strip()
+            subsections[sub_title] = chunk.strip()
+        parsed['sections'].append((title, chunks[0].strip(), subsections))
+
+        if title.startswith('Common SQL Patterns'):
+            code = re.search(r'```sql\n(.*?)```', body, re.DOTALL)
+            if code:
+                parsed['patterns'] = [p.strip() for p in re.split(r'\n\s*\n', code.group(1)) if p.strip()]
+
+        for sub_title, text in subsections.items():
+            if not sub_title.startswith('Join Key Reference'):
+                continue
+            for row in re.findall(r'^\|.*\|$', text, re.MULTILINE):
+                cells = [c.strip().strip('`') for c in row.strip('|').split('|')]
+                if len(cells) == 3 and TABLE_NAME_PATTERN.fullmatch(cells[0]):
+                    parsed['join_keys'][cells[2]] = (cells[0], row)
+            example = text.find('**Example')
+            if example >= 0:
+                parsed['join_example'] = text[example:].strip()
+
+    return parsed
+
+
+class SchemaRetriever:
+    """Selects the tables and metrics relevant to a question and builds a focused schema."""
+
+    def __init__(self, schema_context, top_tables: int = DEFAULT_TOP_TABLES):
+        """
+        Initialize the retriever (the index is built on first use).
+
+        Args:
+            schema_context: SchemaContext providing schema_ai.md, the YAML table
+                            schemas and the dim_metric catalog
+            top_tables: Tables selected by score before graph expansion
+        """
+        self.schema_context = schema_context
+        self.top_tables = top_tables
+        self._built = False
+        self._markdown = None
+        self._tables = OrderedDict()
+        self._graph = defaultdict(set)
+        self._metrics = []
+        self._table_index = TfidfIndex([])
+        self._metric_index = TfidfIndex([])
+
+    def _build(self):
+        """Index the tables, their join graph and the metrics catalog."""
+        if self._built:
+            return
+        self._built = True
+
+        markdown = self.schema_context.load_markdown_schema() if self.schema_context.use_markdown else ""
+        if markdown:
+            self._markdown = parse_schema_markdown(markdown)
+            for _, _, subsections in self._markdown['sections']:
+                for title, text in subsections.items():
+                    if TABLE_NAME_PATTERN.fullmatch(title):
+                        self._tables[title] = text
+            join_keys = {fk: dim for fk, (dim, _) in self._markdown['join_keys'].items()} or DEFAULT_JOIN_KEYS
+            patterns = self._markdown['patterns']
+        else:
+            self._tables = OrderedDict(self.schema_context.get_table_schemas())
+            join_keys = DEFAULT_JOIN_KEYS
+            patterns = [sql for _, sql in self.schema_context.get_example_queries()]
+
+        # Join graph: foreign keys and tables named in a table's description
+        for table, text in self._tables.items():
+            neighbours = {dim for fk, dim in join_keys.items() if re.search(rf'\b{fk}\b', text)}
+            neighbours |= set(TABLE_NAME_PATTERN.findall(text))
+            for neighbour in neighbours & set(self._tables) - {table}:
+                self._graph[table].add(neighbour)
+                self._graph[neighbour].add(table)
+
+        # A table is described by its name, its section and the patterns that query it
+        documents = {table: f"{table} {table} {text}" for table, text in self._tables.items()}
+        for pattern in patterns:
+            for table in sql_tables(pattern) & set(documents):
+                documents[table] += '\n' + pattern
+        self._table_index = TfidfIndex([text_features(text) for text in documents.values()])
+
+        self._metrics = self._load_metrics()
+        self._metric_index = TfidfIndex([
+            text_features(f"{m['metric_key']} {m['metric_name']} {m['metric_category']} {m['metric_description']}")
+            for m in self._metrics
+        ])
+
+    def _load_metrics(self) -> list:
+        """dim_metric entries as dicts (empty if the catalog cannot be read)."""
+        try:
+            catalog = self.schema_context.get_metrics_catalog()
+        except Exception:
+            return []
+        if catalog is None or catalog.empty:
+            return []
+        columns = ['metric_key', 'metric_name', 'metric_category', 'metric_unit', 'metric_description']
+        return [
+            {column: '' if row.get(column) is None else str(row.get(column)) for column in columns}
+            for row in catalog.to_dict('records')
+        ]
+
+    def select(self, question: str) -> Optional[dict]:
+        """
+        Pick the tables and metrics relevant to a question.
+
+        Returns:
+            Dictionary with 'tables' (names, in schema order) and 'metrics'
+            (dim_metric entries), or None if retrieval is disabled or no
+            table matches the question
+        """
+        if not RETRIEVAL_ENABLED:
+            return None
+        self._build()
+        if not self._tables:
+            return None
+
+        names = list(self._tables)
+        features = text_features(question)
+        scores = {names[doc_id]: score for doc_id, score in self._table_index.scores(features).items()}
+        best = max(scores.values(), default=0.0)
+        cutoff = max(MIN_TABLE_SCORE, RELATIVE_TABLE_SCORE * best)
+        ranked = [t for t in sorted(scores, key=lambda t: -scores[t]) if scores[t] >= cutoff]
+        if not ranked:
+            return None
+
+        selected = ranked[:self.top_tables]
+        if not any(t.startswith('mart_') for t in selected):
+            marts = sorted((t for t in scores if t.startswith('mart_')), key=lambda t: -scores[t])
+            if marts:
+                selected.append(marts[0])
+
+        metric_scores = sorted(self._metric_index.scores(features).items(), key=lambda item: -item[1])
+        metrics = [self._metrics[doc_id] for doc_id, score in metric_scores[:MAX_METRICS] if score >= MIN_METRIC_SCORE]
+        # A question about a metric rather than a table (e.g. "inventory turnover trend")
+        if metrics and metric_scores[0][1] > best and 'mart_metrics' in self._tables and 'mart_metrics' not in selected:
+            selected.append('mart_metrics')
+
+        # Related tables the question also matches (e.g. the dimension of a filter)
+        for table in list(selected):
+            for neighbour in sorted(self._graph[table], key=lambda t: -scores.get(t, 0)):
+                if neighbour not in selected and scores.get(neighbour, 0) >= cutoff:
+                    if len(selected) >= 2 * self.top_tables:
+                        break
+                    selected.append(neighbour)
+
+        return {'tables': [t for t in names if t in selected], 'metrics': metrics}
+
+    def build_schema(self, question: str) -> Optional[str]:
+        """
+        Focused schema_ai.md for a question.
+
+        Returns:
+            Markdown with only the relevant sections, or None to use the full
+            schema (retrieval disabled, no schema_ai.md, or nothing matched)
+        """
+        selection = self.select(question)
+        if selection is None or self._markdown is None:
+            return None
+
+        tables = set(selection['tables'])
+        selected_text = '\n'.join(self._tables[t] for t in tables)
+        omitted = [t for t in self._tables if t not in tables]
+
+        other_tables = (
+            "## Other Tables (not shown)\n\n"
+            + ', '.join(f"`{t}`" for t in omitted)
+            + "\n\nOnly the tables relevant to this question are described above."
+        ) if omitted else ""
+
+        parts = [self._markdown['header']]
+        for title, intro, subsections in self._markdown['sections']:
+            if other_tables and title.startswith(('SQL Guidelines', 'Response Format')):
+                parts.append(other_tables)
+                other_tables = ""
+
+            if title.startswith('Common SQL Patterns'):
+                patterns = [p for p in self._markdown['patterns'] if sql_tables(p) <= tables]
+                if selection['metrics']:
+                    parts.append(self._format_metrics(selection['metrics']))
+                if patterns:
+                    parts.append(f"## {title}\n\n```sql\n" + '\n\n'.join(patterns) + "\n```")
+                continue
+
+            if not subsections:
+                parts.append(f"## {title}\n\n{intro}".rstrip())
+                continue
+
+            kept = []
+            for sub_title, text in subsections.items():
+                if sub_title.startswith('Join Key Reference'):
+                    kept.append(self._format_join_keys(sub_title, text, tables, selected_text))
+                elif sub_title in tables:
+                    kept.append(text)
+                elif not TABLE_NAME_PATTERN.fullmatch(sub_title):
+                    kept.append(text)  # Notes such as the rollup rules stay with their section
+            if any(kept):
+                parts.append('\n\n'.join(p for p in [f"## {title}", intro] + kept if p))
+
+        parts.append(other_tables)
+        return '\n\n'.join(p for p in parts if p)
+
+    def build_hint(self, question: str) -> str:
+        """
+        The selection for a question as a short note, for prompts that keep the
+        full schema (provider prompt caching).
+
+        Returns:
+            Markdown section naming the relevant tables and metrics, or "" if
+            retrieval is disabled or nothing matched
+        """
+        selection = self.select(question)
+        if selection is None:
+            return ""
+        lines = ["Most relevant tables: " + ', '.join(f"`{t}`" for t in selection['tables'])]
+        if selection['metrics']:
+            lines.append("Most relevant metrics (metric_key): " + ', '.join(
+                f"`{m['metric_key']}` ({m['metric_name']})" for m in selection['metrics']
+            ))
+        return "\n\n## Focus for This Question\n" + '\n'.join(lines)
+
+    def _format_join_keys(self, title: str, text: str, tables: set, selected_text: str) -> str:
+        """Join key rows of the selected dimensions and of the keys the selected tables carry."""
+        rows = [
+            row for fk, (dim, row) in self._markdown['join_keys'].items()
+            if dim in tables or re.search(rf'\b{fk}\b', selected_text)
+        ]
+        if not rows:
+            return ""
+        header = '\n'.join(re.findall(r'^\|.*\|$', text, re.MULTILINE)[:2])
+        example = self._markdown['join_example']
+        return f"### {title}\n\n{header}\n" + '\n'.join(rows) + (f"\n\n{example}" if example else "")
+
+    def _format_metrics(self, metrics: list) -> str:
+        """The dim_metric entries matching the question."""
+        lines = [
+            f"- `{m['metric_key']}` - {m['metric_name']} ({m['metric_unit']}, {m['metric_category']})"
+            for m in metrics
+        ]
+        return ("## Relevant Metrics (dim_metric)\n\n"
+                "Filter mart_metrics and the rollups by these `metric_key` values:\n"
+                + '\n'.join(lines))
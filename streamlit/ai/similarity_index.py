@@ -0,0 +1,142 @@
+"""
+Similarity Index
+================
+Offline question similarity over the successful (question, SQL) pairs in the
+query cache. No external service: questions are compared as TF-IDF vectors of
+words and character n-grams (cosine similarity).
+
+Used by SQLGenerator for paraphrases that miss the exact cache:
+- a neighbour above the confidence threshold (with the same numbers) is
+  answered with its cached SQL, skipping the LLM
+- otherwise the top-k neighbours are added to the system prompt as few-shot
+  examples
+
+Threshold: AI_SIMILARITY_THRESHOLD (default 0.9)
+"""
+
+import os
+import math
+from collections import Counter, defaultdict
+from typing import Optional, Tuple
+
+from .query_cache import QueryCache, normalize_question
+
+DEFAULT_THRESHOLD = float(os.getenv("AI_SIMILARITY_THRESHOLD", "0.9"))
+
+# Ignore neighbours too far away to help even as examples
+MIN_EXAMPLE_SCORE = 0.3
+
+
+def question_features(question: str) -> Counter:
+    """Words plus character 3- and 4-grams of the normalized question."""
+    normalized, _ = normalize_question(question)
+    features = Counter()
+    for word in normalized.split():
+        features[f"w:{word}"] += 1
+        padded = f" {word} "
+        for n in (3, 4):
+            for i in range(len(padded) - n + 1):
+                features[padded[i:i + n]] += 1
+    return features
+
+
+class TfidfIndex:
+    """TF-IDF vectors of a fixed list of documents, searched by cosine similarity."""
+
+    def __init__(self, documents: list):
+        """
+        Build the index.
+
+        Args:
+            documents: One feature Counter per document (see question_features)
+        """
+        self.size = len(documents)
+        document_frequency = Counter()
+        for features in documents:
+            document_frequency.update(features.keys())
+        self._idf = {
+            feature: math.log((1 + self.size) / (1 + count)) + 1
+            for feature, count in document_frequency.items()
+        }
+
+        self._postings = defaultdict(list)
+        for doc_id, features in enumerate(documents):
+            for feature, weight in self.vector(features).items():
+                self._postings[feature].append((doc_id, weight))
+
+    def vector(self, features: Counter) -> dict:
+        """L2-normalized TF-IDF weights (unknown features get the highest IDF)."""
+        default_idf = math.log(1 + self.size) + 1
+        weights = {f: (1 + math.log(tf)) * self._idf.get(f, default_idf) for f, tf in features.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {f: w / norm for f, w in weights.items()}
+
+    def scores(self, features: Counter) -> dict:
+        """Cosine similarity of a query to every document sharing a feature, by doc id."""
+        scores = defaultdict(float)
+        for feature, weight in self.vector(features).items():
+            for doc_id, doc_weight in self._postings.get(feature, ()):
+                scores[doc_id] += weight * doc_weight
+        return scores
+
+
+class SimilarityIndex:
+    """In-memory TF-IDF index over the query cache, rebuilt when the cache changes."""
+
+    def __init__(self, cache: QueryCache, threshold: float = DEFAULT_THRESHOLD):
+        """
+        Initialize the index.
+
+        Args:
+            cache: Query cache holding the successful (question, SQL) pairs
+            threshold: Cosine similarity above which cached SQL is reused directly
+        """
+        self.cache = cache
+        self.threshold = threshold
+        self._version = None
+        self._entries = []
+        self._index = TfidfIndex([])
+
+    def refresh(self):
+        """Rebuild the index if the cache changed since the last build."""
+        version = self.cache.version()
+        if version == self._version:
+            return
+        self._version = version
+        self._entries = self.cache.entries()
+        self._index = TfidfIndex([question_features(q) for q, _ in self._entries])
+
+    def search(self, question: str, k: int = 3) -> list:
+        """
+        Find the most similar answered questions.
+
+        Returns:
+            Up to k (score, question, sql) tuples, best first
+        """
+        self.refresh()
+        if not self._entries:
+            return []
+
+        scores = self._index.scores(question_features(question))
+        best = sorted(scores.items(), key=lambda item: -item[1])[:k]
+        return [
+            (score, self._entries[doc_id][0], self._entries[doc_id][1])
+            for doc_id, score in best
+            if score >= MIN_EXAMPLE_SCORE
+        ]
+
+    def best_match(self, question: str, neighbours: list = None) -> Optional[Tuple[float, str, str]]:
+        """
+        The neighbour whose SQL can answer the question as is: above the
+        threshold and asking about the same numbers (years, top-N, ...).
+        """
+        if neighbours is None:
+            neighbours = self.search(question, k=1)
+        if not neighbours:
+            return None
+        score, neighbour_question, sql = neighbours[0]
+        if score < self.threshold:
+            return None
+        if normalize_question(neighbour_question)[1] != normalize_question(question)[1]:
+            return None
+        return score, neighbour_question, sql
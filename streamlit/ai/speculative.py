@@ -0,0 +1,80 @@
+"""
+Speculative SQL Generation
+==========================
+Settings and helpers for the optional speculative mode of
+SQLGenerator.generate_with_retry.
+
+Instead of up to 3 serial attempts (LLM call + query each), several diverse
+candidates are requested at once:
+- each candidate gets a different variant: focused or full schema, and one
+  of the configured temperatures
+- candidates are validated and planned with EXPLAIN on worker threads as
+  soon as they arrive
+- shortly after the first valid plan, the cheapest valid plan is executed and
+  the other candidates are cancelled (their streams are closed)
+- if no candidate works, the serial retries continue from attempt 2 with the
+  candidates' errors as feedback
+
+Settings:
+    AI_SPECULATIVE               - 1 enables the mode (default 0)
+    AI_SPECULATIVE_CANDIDATES    - candidates per question (default 3)
+    AI_SPECULATIVE_CONCURRENCY   - candidates in flight at once (default 3)
+    AI_SPECULATIVE_TOKEN_BUDGET  - estimated tokens (prompt + max output) all
+                                   candidates may use (default 20000; 0 = no limit)
+    AI_SPECULATIVE_TEMPERATURES  - comma-separated temperatures (default "0,0.7")
+    AI_SPECULATIVE_WAIT          - seconds to wait for cheaper candidates after
+                                   the first valid plan (default 1.5)
+"""
+
+import os
+from typing import List
+
+SPECULATIVE_ENABLED = os.getenv("AI_SPECULATIVE", "0") == "1"
+SPECULATIVE_CANDIDATES = int(os.getenv("AI_SPECULATIVE_CANDIDATES", "3"))
+SPECULATIVE_CONCURRENCY = int(os.getenv("AI_SPECULATIVE_CONCURRENCY", "3"))
+SPECULATIVE_TOKEN_BUDGET = int(os.getenv("AI_SPECULATIVE_TOKEN_BUDGET", "20000"))
+SPECULATIVE_TEMPERATURES = [float(t) for t in os.getenv("AI_SPECULATIVE_TEMPERATURES", "0,0.7").split(",") if t.strip()]
+SPECULATIVE_WAIT = float(os.getenv("AI_SPECULATIVE_WAIT", "1.5"))
+
+CHARS_PER_TOKEN = 4
+
+
+class CandidateCancelled(Exception):
+    """Raised in a candidate's stream once another candidate has been chosen."""
+
+
+def candidate_variants(count: int) -> List[dict]:
+    """
+    Prompt variants for `count` candidates: focused and full schema for each
+    temperature, in that order, repeated if needed.
+
+    Returns:
+        List of {'focused_schema': bool, 'temperature': float} dicts
+    """
+    temperatures = SPECULATIVE_TEMPERATURES or [0.0]
+    variants = [
+        {'focused_schema': focused, 'temperature': temperature}
+        for temperature in temperatures
+        for focused in (True, False)
+    ]
+    return [variants[i % len(variants)] for i in range(count)]
+
+
+def estimate_tokens(messages: list, max_output_tokens: int) -> int:
+    """Rough token cost of a request: prompt characters / 4 plus the output limit."""
+    return sum(len(str(m['content'])) for m in messages) // CHARS_PER_TOKEN + max_output_tokens
+
+
+def within_budget(estimates: List[int], budget: int = SPECULATIVE_TOKEN_BUDGET) -> int:
+    """
+    Number of candidates (in order) whose estimated tokens fit the budget.
+    The first candidate is always allowed.
+    """
+    if not budget:
+        return len(estimates)
+    total = 0
+    for count, estimate in enumerate(estimates):
+        total += estimate
+        if total > budget:
+            return max(1, count)
+    return len(estimates)
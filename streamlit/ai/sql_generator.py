@@ -6,27 +6,78 @@ Supports OpenAI GPT-4 and Anthropic Claude models.
 """
 
 import os
-from typing import Optional, Tuple
+import re
+import json
+import time
+import threading
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
 from .schema_context import SchemaContext
 from .sql_validator import SQLValidator
+from .cost_guard import QueryCostGuard
+from .query_cache import QueryCache
+from .similarity_index import SimilarityIndex
+from .llm_usage import PROMPT_CACHING, TokenUsage, parse_openai_usage, parse_anthropic_usage
+from .streaming import STREAMING_ENABLED, statement_end, openai_text, anthropic_text
+from .intent_parser import IntentParser
+from .speculative import (
+    SPECULATIVE_ENABLED, SPECULATIVE_CANDIDATES, SPECULATIVE_CONCURRENCY, SPECULATIVE_WAIT,
+    CandidateCancelled, candidate_variants, estimate_tokens, within_budget
+)
+
+# Successful questions and their SQL, one JSON object per line.
+# Read by dbt/scripts/generate_ai_schema.py to rank tables and columns
+# when pruning schema_ai.md to its token budget.
+QUERY_LOG_PATH = Path(os.getenv(
+    "AI_QUERY_LOG",
+    Path(__file__).parent.parent / 'logs' / 'ai_query_log.jsonl'
+))
+
+# Output limit of a SQL generation call
+SQL_MAX_TOKENS = 1000
+
+# Questions that refer back to the conversation ("what about 2013?", "break
+# it down by month", "same for bikes"). They are not looked up in the query
+# cache or answered by the intent parser, and their SQL is not cached.
+FOLLOW_UP_PATTERN = re.compile(
+    r"^\s*(and|but|or|now|then|only|just|what about|how about|"
+    r"break|drill|split|sort|filter|exclude|excluding|without|except|why)\b"
+    r"|\b(it|its|they|them|their|those|these|same|instead|previous|above|again|also|too|else)\b",
+    re.IGNORECASE
+)
 
 
 class SQLGenerator:
     """Generates SQL queries from natural language using LLMs."""
     
-    def __init__(self, conn, provider: str = "openai"):
+    def __init__(self, conn, provider: str = "openai", client=None):
         """
         Initialize the SQL generator.
         
         Args:
             conn: Database connection for schema context
             provider: LLM provider ("openai" or "anthropic")
+            client: Optional client to use instead of the provider SDK's
+                    (e.g. RecordedClient for offline runs)
         """
         self.conn = conn
         self.provider = provider
         self.schema_context = SchemaContext(conn)
         self.validator = SQLValidator(strict_mode=True)
-        self._client = None
+        self.cost_guard = QueryCostGuard()
+        # Invalidated when the table whitelist or the schema context changes
+        self.query_cache = QueryCache(watched_files=[
+            Path(__file__).parent / 'allowed_tables.json',
+            self.schema_context.dbt_models_path / 'schema_ai.md'
+        ])
+        self.similarity_index = SimilarityIndex(self.query_cache)
+        self.intent_parser = IntentParser(self.schema_context)
+        self.usage = TokenUsage()
+        self._client = client
+        self._db_lock = threading.Lock()  # One connection, shared by speculative candidates
         self._conversation_history = []
     
     def _get_client(self):
@@ -59,13 +110,20 @@ class SQLGenerator:
         
         return self._client
     
-    def generate(self, question: str, use_conversation: bool = True) -> Tuple[str, bool, Optional[str]]:
+    def generate(self, question: str, use_conversation: bool = True,
+                 similar_examples: list = None, focused_schema: bool = True,
+                 on_token=None) -> Tuple[str, bool, Optional[str]]:
         """
         Generate SQL from a natural language question.
         
         Args:
             question: The natural language question
             use_conversation: Whether to use conversation history for context
+            similar_examples: Optional (question, sql) few-shot pairs for a first question
+            focused_schema: Give a first question only the schema relevant to it
+                            (False = full schema, e.g. on retries)
+            on_token: Optional callback(text_so_far) to stream the SQL as it is
+                      generated; the stream is closed once the statement is complete
             
         Returns:
             Tuple of (sql_query, is_valid, error_message)
@@ -75,27 +133,16 @@ class SQLGenerator:
         except (ImportError, ValueError) as e:
             return "", False, str(e)
         
-        # Build messages
-        if use_conversation and self._conversation_history:
-            # Use quick context for follow-ups
-            system_prompt = self.schema_context.get_quick_context()
-            messages = self._conversation_history.copy()
-            messages[0] = {"role": "system", "content": system_prompt}
-        else:
-            # Use full context for first question
-            system_prompt = self.schema_context.build_system_prompt()
-            messages = [{"role": "system", "content": system_prompt}]
-            self._conversation_history = messages.copy()
-        
-        # Add user question
-        messages.append({"role": "user", "content": question})
+        follow_up = use_conversation and bool(self._conversation_history)
+        messages, system_parts = self._build_messages(question, follow_up, similar_examples, focused_schema)
+        if not follow_up:
+            self._conversation_history = messages[:1]
         
         # Generate SQL based on provider
+        if not STREAMING_ENABLED:
+            on_token = None
         try:
-            if self.provider == "openai":
-                sql = self._generate_openai(client, messages)
-            else:
-                sql = self._generate_anthropic(client, messages, system_prompt)
+            sql = self._call_llm(client, messages, system_parts, on_token)
         except Exception as e:
             return "", False, f"LLM API error: {str(e)}"
         
@@ -103,37 +150,239 @@ class SQLGenerator:
         is_valid, cleaned_sql, error = self.validator.validate(sql)
         
         if is_valid:
-            # Add to conversation history
-            self._conversation_history.append({"role": "user", "content": question})
-            self._conversation_history.append({"role": "assistant", "content": cleaned_sql})
-            
-            # Keep history manageable (last 10 exchanges)
-            if len(self._conversation_history) > 22:  # system + 10 pairs
-                self._conversation_history = [self._conversation_history[0]] + self._conversation_history[-20:]
+            self._remember(question, cleaned_sql)
         
         return cleaned_sql or sql, is_valid, error
     
+    def _build_messages(self, question: str, follow_up: bool, similar_examples: list = None,
+                        focused_schema: bool = True) -> Tuple[list, Tuple[str, str]]:
+        """
+        Messages for a SQL generation call; the system prompt is a static
+        prefix (cacheable) plus a per-question suffix.
+        
+        Returns:
+            Tuple of (messages, (system_prefix, system_suffix))
+        """
+        if follow_up:
+            # Use quick context for follow-ups
+            system_parts = (self.schema_context.get_quick_context(), "")
+            messages = self._conversation_history.copy()
+            messages[0] = {"role": "system", "content": ''.join(system_parts)}
+        else:
+            # Use full (or question-focused) context for first question
+            system_parts = self.schema_context.build_prompt_parts(
+                similar_examples,
+                question=question if focused_schema else None,
+                cached_prefix=PROMPT_CACHING
+            )
+            messages = [{"role": "system", "content": ''.join(system_parts)}]
+        
+        # Add user question
+        messages.append({"role": "user", "content": question})
+        return messages, system_parts
+    
+    def _call_llm(self, client, messages: list, system_parts: Tuple[str, str], on_token=None,
+                  temperature: float = None) -> str:
+        """Generate SQL with the configured provider."""
+        if self.provider == "openai":
+            return self._generate_openai(client, messages, on_token, temperature)
+        return self._generate_anthropic(client, messages, system_parts, on_token, temperature)
+    
+    def _remember(self, question: str, sql: str):
+        """Add a question and its SQL to the conversation history."""
+        if not self._conversation_history:
+            self._conversation_history = [{"role": "system", "content": self.schema_context.get_static_prompt()}]
+        self._conversation_history.append({"role": "user", "content": question})
+        self._conversation_history.append({"role": "assistant", "content": sql})
+        
+        # Keep history manageable (last 10 exchanges)
+        if len(self._conversation_history) > 22:  # system + 10 pairs
+            self._conversation_history = [self._conversation_history[0]] + self._conversation_history[-20:]
+    
     def generate_with_retry(self, question: str, conn, max_retries: int = 3, 
-                           status_callback=None) -> Tuple[str, bool, Optional[str], list]:
+                           status_callback=None, probe: str = "execute", sql_callback=None,
+                           speculative: bool = None
+                           ) -> Tuple[str, bool, Optional[str], list, Optional[pd.DataFrame]]:
         """
         Generate SQL with automatic retry on errors.
         
+        Each attempt first goes through the cost guard (EXPLAIN): expensive
+        queries are rewritten or rejected, and a rejection is fed back to the
+        next attempt like any other error. It is then checked once, depending
+        on `probe`:
+        - "execute": run the query; the successful result is returned, so the
+          caller does not have to run it again
+        - "explain": only plan it with EXPLAIN (no rows read); the result is
+          None and the caller runs the final query once
+        
         Args:
             question: The natural language question
             conn: Database connection for testing queries
             max_retries: Maximum number of retry attempts (default 3)
             status_callback: Optional callback function(attempt, message) for status updates
+            probe: "execute" (default) or "explain"
+            sql_callback: Optional callback(text_so_far) receiving each attempt's SQL
+                          as it streams in (not called for speculative candidates)
+            speculative: Request several candidates at once for the first attempt and
+                         run the cheapest valid plan (default AI_SPECULATIVE, see speculative.py)
+            
+        The first attempt gets only the schema relevant to the question;
+        retries get the full schema, in case the retriever missed a table.
+        
+        Standalone questions (see is_standalone) are looked up in the query
+        cache first; a hit skips the LLM, and successful SQL is cached. On a
+        miss, a close paraphrase of an answered question reuses its SQL, and
+        otherwise the nearest answered questions become few-shot examples.
+        Before the LLM, the intent parser tries template SQL for common
+        question shapes (top-N, by dimension, over time).
             
         Returns:
-            Tuple of (sql_query, is_valid, error_message, attempt_history)
+            Tuple of (sql_query, is_valid, error_message, attempt_history, result_df);
+            attempt records carry a 'rewrite' note when the cost guard changed the SQL
+            and 'cached' when the SQL came from the query cache, 'intent' (a
+            description) when it came from the intent parser; speculative
+            candidates all have attempt 1 and a 'candidate' number and 'cost',
+            with the chosen one last
         """
-        import pandas as pd
+        # Follow-ups depend on the conversation, so only standalone questions use the cache
+        standalone = self.is_standalone(question)
+        neighbours = []
+        if standalone:
+            cached_sql = self.query_cache.get(question)
+            cached_question = question
+            if cached_sql is None:
+                neighbours = self.similarity_index.search(question, k=3)
+                match = self.similarity_index.best_match(question, neighbours)
+                if match:
+                    _, cached_question, cached_sql = match
+            if cached_sql:
+                try:
+                    sql, rewrite_note, result_df = self._guard_and_probe(cached_sql, conn, probe)
+                except Exception:
+                    self.query_cache.invalidate(cached_question)  # Stale or too expensive: fall back to the LLM
+                else:
+                    if cached_question != question:
+                        self.query_cache.put(question, cached_sql)  # Exact hit next time
+                    self._remember(question, sql)
+                    self._log_query(question, sql, 0)
+                    attempt_record = {
+                        'attempt': 1,
+                        'sql': sql,
+                        'validation_error': None,
+                        'execution_error': None,
+                        'rewrite': rewrite_note,
+                        'cached': True,
+                        'similar_to': cached_question if cached_question != question else None,
+                        'success': True
+                    }
+                    return sql, True, None, [attempt_record], result_df
+        
+        # Common question shapes get template SQL, without an LLM call
+        intent_started = None
+        if standalone and self.intent_parser.enabled:
+            intent_started = time.perf_counter()
+            fast = self._try_intent(question, conn, probe)
+            if fast is not None:
+                self.intent_parser.record(hit=True, seconds=time.perf_counter() - intent_started)
+                return fast
+        
+        result = self._generate_with_llm(question, conn, max_retries, status_callback, probe,
+                                         sql_callback, speculative, standalone, neighbours)
+        if intent_started is not None:
+            self.intent_parser.record(hit=False, seconds=time.perf_counter() - intent_started)
+        return result
+    
+    def _try_intent(self, question: str, conn, probe: str
+                    ) -> Optional[Tuple[str, bool, Optional[str], list, Optional[pd.DataFrame]]]:
+        """
+        Answer a question with the intent parser's template SQL.
         
+        Returns:
+            The generate_with_retry result, or None if the parse is not
+            confident enough or the query fails (the LLM takes over)
+        """
+        intent = self.intent_parser.parse(question)
+        if intent is None or intent['confidence'] < self.intent_parser.min_confidence:
+            return None
+        
+        try:
+            sql, rewrite_note, result_df = self._guard_and_probe(intent['sql'], conn, probe)
+        except Exception:
+            return None
+        
+        self._remember(question, sql)
+        self._log_query(question, sql, 0)
+        attempt_record = {
+            'attempt': 1,
+            'sql': sql,
+            'validation_error': None,
+            'execution_error': None,
+            'rewrite': rewrite_note,
+            'cached': False,
+            'intent': intent['description'],
+            'success': True
+        }
+        return sql, True, None, [attempt_record], result_df
+    
+    def _guard_and_probe(self, sql: str, conn, probe: str) -> Tuple[str, Optional[str], Optional[pd.DataFrame]]:
+        """
+        Validate, cost-check and probe SQL that did not come from the LLM
+        (cached or template SQL), like an LLM attempt.
+        
+        Returns:
+            Tuple of (sql_to_run, rewrite_note, result_df)
+        
+        Raises:
+            ValueError: if the SQL does not validate
+            QueryTooExpensive: if the cost guard rejects it
+            Exception: database errors
+        """
+        is_valid, sql, error = self.validator.validate(sql)
+        if not is_valid:
+            raise ValueError(error)
+        rewrite_note = None
+        if self.cost_guard.enabled:
+            sql, rewrite_note = self.cost_guard.check(sql, conn)
+        if probe == "explain" and self.cost_guard.enabled:
+            return sql, rewrite_note, None  # Already planned by the cost guard
+        return sql, rewrite_note, self._probe_query(sql, conn, probe)
+    
+    def is_standalone(self, question: str) -> bool:
+        """
+        True if a question can be answered without the conversation: it is the
+        first one, or it does not refer back (FOLLOW_UP_PATTERN). Decided per
+        question, so repeated suggested questions use the cache and the intent
+        parser at any point of a chat.
+        """
+        return len(self._conversation_history) <= 1 or not FOLLOW_UP_PATTERN.search(question)
+    
+    def _generate_with_llm(self, question: str, conn, max_retries: int, status_callback, probe: str,
+                           sql_callback, speculative: Optional[bool], standalone: bool, neighbours: list
+                           ) -> Tuple[str, bool, Optional[str], list, Optional[pd.DataFrame]]:
+        """The LLM part of generate_with_retry (speculative candidates, then serial retries)."""
         attempt_history = []
         last_error = None
         previous_attempts = []
+        first_attempt = 1
+        
+        if SPECULATIVE_ENABLED if speculative is None else speculative:
+            winner, candidates = self._speculate(question, conn, probe, status_callback, neighbours)
+            attempt_history.extend(candidates)
+            if winner is not None:
+                sql, result_df = winner
+                self._log_query(question, sql, 1)
+                if standalone:
+                    # Cache the SQL as generated: the cost guard runs again on a hit
+                    self.query_cache.put(question, attempt_history[-1]['generated_sql'])
+                return sql, True, None, attempt_history, result_df
+            # Continue with serial retries, learning from the candidates' errors
+            for record in candidates:
+                if record['sql'] and record['execution_error']:
+                    previous_attempts.append({'sql': record['sql'], 'error': record['execution_error']})
+                    last_error = record['execution_error']
+            first_attempt = 2
         
-        for attempt in range(1, max_retries + 1):
+        for attempt in range(first_attempt, max_retries + 1):
             if status_callback:
                 if attempt == 1:
                     status_callback(attempt, f"🔄 Generating SQL (attempt {attempt}/{max_retries})...")
@@ -151,13 +400,21 @@ class SQLGenerator:
                 modified_question = question
             
             # Generate SQL
-            sql, is_valid, validation_error = self.generate(modified_question, use_conversation=(attempt == 1))
+            sql, is_valid, validation_error = self.generate(
+                modified_question,
+                use_conversation=(attempt == 1),
+                similar_examples=[(q, example_sql) for _, q, example_sql in neighbours],
+                focused_schema=(attempt == 1),
+                on_token=sql_callback
+            )
             
             attempt_record = {
                 'attempt': attempt,
                 'sql': sql,
                 'validation_error': validation_error,
                 'execution_error': None,
+                'rewrite': None,
+                'cached': False,
                 'success': False
             }
             
@@ -169,16 +426,29 @@ class SQLGenerator:
                 attempt_history.append(attempt_record)
                 continue
             
-            # Try to execute the query
+            # Cost gate, then try the query (executed or EXPLAINed, see `probe`)
+            generated_sql = sql
             try:
-                pd.read_sql(sql, conn)
+                if self.cost_guard.enabled:
+                    sql, rewrite_note = self.cost_guard.check(sql, conn)
+                    if rewrite_note:
+                        attempt_record['sql'] = sql
+                        attempt_record['rewrite'] = rewrite_note
+                if probe == "explain" and self.cost_guard.enabled:
+                    result_df = None  # Already planned by the cost guard
+                else:
+                    result_df = self._probe_query(sql, conn, probe)
                 attempt_record['success'] = True
                 attempt_history.append(attempt_record)
                 
                 if status_callback and attempt > 1:
                     status_callback(attempt, f"✅ Success on attempt {attempt}!")
                 
-                return sql, True, None, attempt_history
+                self._log_query(question, sql, attempt)
+                if standalone:
+                    # Cache the SQL as generated, not a rewrite: the cost guard runs again on a hit
+                    self.query_cache.put(question, generated_sql)
+                return sql, True, None, attempt_history, result_df
                 
             except Exception as e:
                 exec_error = str(e)
@@ -192,19 +462,199 @@ class SQLGenerator:
         
         # All retries exhausted
         final_error = f"Failed after {max_retries} attempts. Last error: {last_error}"
-        return "", False, final_error, attempt_history
+        return "", False, final_error, attempt_history, None
+    
+    def _speculate(self, question: str, conn, probe: str, status_callback, neighbours: list
+                   ) -> Tuple[Optional[Tuple[str, Optional[pd.DataFrame]]], list]:
+        """
+        First attempt in speculative mode: generate candidates concurrently,
+        validate and EXPLAIN each as it arrives, then run the cheapest valid plan.
+        
+        Returns:
+            Tuple of ((sql, result_df) of the query that ran, or None if no
+            candidate worked; attempt records of the candidates, chosen one last)
+        """
+        try:
+            client = self._get_client()
+        except (ImportError, ValueError) as e:
+            return None, [self._candidate_record(1, candidate_variants(1)[0],
+                                                 validation_error=str(e), execution_error=str(e))]
+        
+        # Prompts are built here; worker threads only call the LLM and the database
+        follow_up = bool(self._conversation_history)
+        examples = [(q, example_sql) for _, q, example_sql in neighbours]
+        candidates = []
+        for variant in candidate_variants(SPECULATIVE_CANDIDATES):
+            messages, system_parts = self._build_messages(question, follow_up, examples, variant['focused_schema'])
+            candidates.append((variant, messages, system_parts))
+        candidates = candidates[:within_budget([estimate_tokens(c[1], SQL_MAX_TOKENS) for c in candidates])]
+        
+        if status_callback:
+            status_callback(1, f"🔄 Generating {len(candidates)} SQL candidates in parallel...")
+        
+        cancel = threading.Event()
+        records = {}
+        executor = ThreadPoolExecutor(max_workers=max(1, SPECULATIVE_CONCURRENCY), thread_name_prefix="sql-candidate")
+        futures = {
+            executor.submit(self._run_candidate, client, conn, number, *candidate, cancel): number
+            for number, candidate in enumerate(candidates, start=1)
+        }
+        
+        # Collect until all are done, or SPECULATIVE_WAIT seconds after the first valid plan
+        pending = set(futures)
+        deadline = None
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                record = future.result()
+                records[record['candidate']] = record
+                if record['cost'] is not None and deadline is None:
+                    deadline = time.monotonic() + SPECULATIVE_WAIT
+        
+        # Cancel the rest: queued candidates never start, streaming ones close their stream
+        cancel.set()
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+        for future in pending:
+            number = futures[future]
+            variant = candidates[number - 1][0]
+            records[number] = self._candidate_record(number, variant, execution_error="Cancelled: a valid plan was chosen")
+        
+        # Run the cheapest plan; if it fails at execution, fall back to the next one
+        planned = sorted((r for r in records.values() if r['cost'] is not None), key=lambda r: (r['cost'], r['candidate']))
+        for record in planned:
+            if status_callback:
+                status_callback(1, f"✅ Running the cheapest of {len(planned)} valid candidates (plan cost {record['cost']:,.0f})...")
+            try:
+                with self._db_lock:
+                    # Already planned by EXPLAIN; only executed queries need to run here
+                    result_df = None if probe == "explain" else self._probe_query(record['sql'], conn, probe)
+            except Exception as e:
+                record['execution_error'] = str(e)
+                continue
+            record['success'] = True
+            for other in planned:
+                if other is not record and other['execution_error'] is None:
+                    other['execution_error'] = f"Not run: plan cost {other['cost']:,.0f}, a cheaper valid plan was chosen"
+            history = [r for number, r in sorted(records.items()) if r is not record] + [record]
+            if not follow_up:
+                messages = candidates[record['candidate'] - 1][1]
+                self._conversation_history = messages[:1]
+            self._remember(question, record['sql'])
+            return (record['sql'], result_df), history
+        
+        return None, [r for _, r in sorted(records.items())]
     
-    def _generate_openai(self, client, messages: list) -> str:
-        """Generate SQL using OpenAI API."""
-        response = client.chat.completions.create(
+    def _candidate_record(self, number: int, variant: dict, **fields) -> dict:
+        """Attempt record of a speculative candidate."""
+        record = {
+            'attempt': 1,
+            'candidate': number,
+            'variant': f"{'focused' if variant['focused_schema'] else 'full'} schema, temperature {variant['temperature']:g}",
+            'sql': '',
+            'validation_error': None,
+            'execution_error': None,
+            'rewrite': None,
+            'cached': False,
+            'cost': None,
+            'success': False
+        }
+        record.update(fields)
+        return record
+    
+    def _run_candidate(self, client, conn, number: int, variant: dict, messages: list,
+                       system_parts: Tuple[str, str], cancel: threading.Event) -> dict:
+        """Generate, validate and EXPLAIN one candidate (runs on a worker thread)."""
+        def check_cancelled(text):
+            if cancel.is_set():
+                raise CandidateCancelled()
+        
+        # Without streaming a candidate cannot be stopped mid-response; it is discarded afterwards
+        try:
+            sql = self._call_llm(client, messages, system_parts,
+                                 check_cancelled if STREAMING_ENABLED else None, variant['temperature'])
+        except CandidateCancelled:
+            return self._candidate_record(number, variant, execution_error="Cancelled: a valid plan was chosen")
+        except Exception as e:
+            error = f"LLM API error: {str(e)}"
+            return self._candidate_record(number, variant, validation_error=error, execution_error=error)
+        
+        is_valid, cleaned_sql, validation_error = self.validator.validate(sql)
+        if not is_valid:
+            return self._candidate_record(number, variant, sql=cleaned_sql or sql,
+                                          validation_error=validation_error, execution_error=validation_error)
+        if cancel.is_set():
+            return self._candidate_record(number, variant, sql=cleaned_sql,
+                                          execution_error="Cancelled: a valid plan was chosen")
+        
+        try:
+            with self._db_lock:
+                sql, rewrite_note, cost = self.cost_guard.assess(cleaned_sql, conn)
+        except Exception as e:
+            return self._candidate_record(number, variant, sql=cleaned_sql, execution_error=str(e))
+        return self._candidate_record(number, variant, sql=sql, rewrite=rewrite_note, cost=cost,
+                                      generated_sql=cleaned_sql)
+    
+    def _probe_query(self, sql: str, conn, probe: str) -> Optional[pd.DataFrame]:
+        """Execute (returning the result) or EXPLAIN (returning None) a generated query."""
+        try:
+            if probe == "explain":
+                with conn.cursor() as cur:
+                    cur.execute(f"EXPLAIN {sql}")
+                    cur.fetchall()
+                return None
+            return pd.read_sql(sql, conn)
+        except Exception:
+            # A failed statement aborts the transaction; reset it for the next attempt
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+    
+    def _log_query(self, question: str, sql: str, attempts: int):
+        """Append a successful query to the AI query log (best effort; attempts 0 = cache hit)."""
+        record = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'provider': self.provider,
+            'question': question,
+            'sql': sql,
+            'attempts': attempts
+        }
+        try:
+            QUERY_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+            with open(QUERY_LOG_PATH, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError:
+            pass  # Logging must never break the assistant (e.g. read-only mount)
+    
+    def _generate_openai(self, client, messages: list, on_token=None, temperature: float = None) -> str:
+        """Generate SQL using OpenAI API (prompt prefixes are cached automatically)."""
+        request = dict(
             model=os.getenv("OPENAI_MODEL", "gpt-4o"),
             messages=messages,
-            temperature=0,  # Deterministic output for SQL
-            max_tokens=1000
+            temperature=temperature or 0,  # Deterministic output for SQL, unless a candidate varies it
+            max_tokens=SQL_MAX_TOKENS
         )
-        return response.choices[0].message.content.strip()
+        if on_token is None:
+            response = client.chat.completions.create(**request)
+            self.usage.record(parse_openai_usage(response.usage))
+            return response.choices[0].message.content.strip()
+        
+        stream = client.chat.completions.create(**request, stream=True, stream_options={"include_usage": True})
+        usage = {}
+        try:
+            return self._read_sql_stream(stream, openai_text(stream, usage), on_token)
+        finally:
+            # Usage comes in the last chunk, which a stream closed after the SQL never receives
+            self.usage.record(parse_openai_usage(usage['usage']) if 'usage' in usage else None)
     
-    def _generate_anthropic(self, client, messages: list, system_prompt: str) -> str:
+    def _generate_anthropic(self, client, messages: list, system_parts: Tuple[str, str], on_token=None,
+                            temperature: float = None) -> str:
         """Generate SQL using Anthropic API."""
         # Anthropic uses system prompt separately
         anthropic_messages = [
@@ -213,36 +663,59 @@ class SQLGenerator:
             if msg["role"] != "system"
         ]
         
-        response = client.messages.create(
+        prefix, suffix = system_parts
+        if PROMPT_CACHING:
+            # Cache breakpoint after the static prefix; the suffix changes with the question
+            system = [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}]
+            if suffix:
+                system.append({"type": "text", "text": suffix})
+        else:
+            system = prefix + suffix
+        
+        request = dict(
             model=os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4-20250514"),
-            max_tokens=1000,
-            system=system_prompt,
+            max_tokens=SQL_MAX_TOKENS,
+            system=system,
             messages=anthropic_messages
         )
-        return response.content[0].text.strip()
+        if temperature is not None:
+            request['temperature'] = temperature
+        if on_token is None:
+            response = client.messages.create(**request)
+            self.usage.record(parse_anthropic_usage(response.usage))
+            return response.content[0].text.strip()
+        
+        stream = client.messages.create(**request, stream=True)
+        usage = {}
+        try:
+            return self._read_sql_stream(stream, anthropic_text(stream, usage), on_token)
+        finally:
+            self.usage.record(parse_anthropic_usage(usage['usage']) if 'usage' in usage else None)
+    
+    def _read_sql_stream(self, stream, deltas: Iterator[str], on_token) -> str:
+        """Collect streamed SQL, reporting it as it grows; close the stream once the statement is complete."""
+        text = ""
+        try:
+            for delta in deltas:
+                text += delta
+                end = statement_end(text)
+                if end is not None:
+                    text = text[:end]
+                    on_token(text)
+                    break  # Stop paying for trailing tokens
+                on_token(text)
+        finally:
+            stream.close()
+        return text.strip()
     
     def clear_conversation(self):
         """Clear the conversation history."""
         self._conversation_history = []
     
-    def analyze_results(self, question: str, sql: str, df, max_rows: int = 20) -> str:
-        """
-        Analyze query results and provide insights.
-        
-        Args:
-            question: Original user question
-            sql: The SQL query that was executed
-            df: Pandas DataFrame with results
-            max_rows: Maximum rows to include in context
-            
-        Returns:
-            Human-readable analysis of the results
-        """
-        try:
-            client = self._get_client()
-        except (ImportError, ValueError) as e:
-            return f"Could not analyze results: {str(e)}"
-        
+    ANALYSIS_SYSTEM_PROMPT = "You are a data analyst providing insights on query results. Be concise and focus on actionable insights. Always format numbers appropriately: USD as $X,XXX.XX, percentages as X.X%, counts as X,XXX, days/hours with units."
+    
+    def _analysis_prompt(self, question: str, sql: str, df, max_rows: int = 20) -> str:
+        """Build the user prompt asking for an analysis of query results."""
         # Prepare data summary
         row_count = len(df)
         col_info = ", ".join([f"{col} ({df[col].dtype})" for col in df.columns])
@@ -250,8 +723,7 @@ class SQLGenerator:
         # Sample data (limit rows to control token usage)
         sample_data = df.head(max_rows).to_string(index=False)
         
-        # Build analysis prompt
-        analysis_prompt = f"""The user asked: "{question}"
+        return f"""The user asked: "{question}"
 
 This SQL was executed:
 ```sql
@@ -278,32 +750,100 @@ Provide a brief, insightful analysis of these results:
 - Rate/Ratio columns → Percentage or decimal
 
 Keep the response concise and business-focused. Use bullet points for clarity."""
+    
+    def analyze_results(self, question: str, sql: str, df, max_rows: int = 20) -> str:
+        """
+        Analyze query results and provide insights.
+        
+        Args:
+            question: Original user question
+            sql: The SQL query that was executed
+            df: Pandas DataFrame with results
+            max_rows: Maximum rows to include in context
+            
+        Returns:
+            Human-readable analysis of the results
+        """
+        try:
+            client = self._get_client()
+        except (ImportError, ValueError) as e:
+            return f"Could not analyze results: {str(e)}"
+        
+        analysis_prompt = self._analysis_prompt(question, sql, df, max_rows)
 
         try:
             if self.provider == "openai":
-                system_msg = "You are a data analyst providing insights on query results. Be concise and focus on actionable insights. Always format numbers appropriately: USD as $X,XXX.XX, percentages as X.X%, counts as X,XXX, days/hours with units."
                 response = client.chat.completions.create(
                     model=os.getenv("OPENAI_MODEL", "gpt-4o"),
                     messages=[
-                        {"role": "system", "content": system_msg},
+                        {"role": "system", "content": self.ANALYSIS_SYSTEM_PROMPT},
                         {"role": "user", "content": analysis_prompt}
                     ],
                     temperature=0.3,
                     max_tokens=500
                 )
+                self.usage.record(parse_openai_usage(response.usage))
                 return response.choices[0].message.content.strip()
             else:
-                system_msg = "You are a data analyst providing insights on query results. Be concise and focus on actionable insights. Always format numbers appropriately: USD as $X,XXX.XX, percentages as X.X%, counts as X,XXX, days/hours with units."
                 response = client.messages.create(
                     model=os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4-20250514"),
                     max_tokens=500,
-                    system=system_msg,
+                    system=self.ANALYSIS_SYSTEM_PROMPT,
                     messages=[{"role": "user", "content": analysis_prompt}]
                 )
+                self.usage.record(parse_anthropic_usage(response.usage))
                 return response.content[0].text.strip()
         except Exception as e:
             return f"Could not analyze results: {str(e)}"
     
+    def stream_analysis(self, question: str, sql: str, df, max_rows: int = 20) -> Iterator[str]:
+        """
+        Analyze query results, yielding the text as it arrives (for st.write_stream).
+        Same arguments as analyze_results; yields it whole if streaming is disabled.
+        """
+        if not STREAMING_ENABLED:
+            yield self.analyze_results(question, sql, df, max_rows)
+            return
+        try:
+            client = self._get_client()
+        except (ImportError, ValueError) as e:
+            yield f"Could not analyze results: {str(e)}"
+            return
+        
+        analysis_prompt = self._analysis_prompt(question, sql, df, max_rows)
+        usage = {}
+        try:
+            if self.provider == "openai":
+                stream = client.chat.completions.create(
+                    model=os.getenv("OPENAI_MODEL", "gpt-4o"),
+                    messages=[
+                        {"role": "system", "content": self.ANALYSIS_SYSTEM_PROMPT},
+                        {"role": "user", "content": analysis_prompt}
+                    ],
+                    temperature=0.3,
+                    max_tokens=500,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                deltas, parse_usage = openai_text(stream, usage), parse_openai_usage
+            else:
+                stream = client.messages.create(
+                    model=os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4-20250514"),
+                    max_tokens=500,
+                    system=self.ANALYSIS_SYSTEM_PROMPT,
+                    messages=[{"role": "user", "content": analysis_prompt}],
+                    stream=True
+                )
+                deltas, parse_usage = anthropic_text(stream, usage), parse_anthropic_usage
+            try:
+                yield from deltas
+            finally:
+                stream.close()
+        except Exception as e:
+            yield f"\n\nCould not analyze results: {str(e)}"
+            return
+        self.usage.record(parse_usage(usage['usage']) if 'usage' in usage else None)
+    
     def get_suggestions(self) -> list:
         """
         Get suggested questions based on available data.
@@ -26,6 +26,7 @@ class SQLValidator:
     DEFAULT_ALLOWED_TABLES = [
         'mart_sales', 'mart_customer_analytics', 'mart_product_analytics',
         'mart_operations', 'mart_employee_territory_performance', 'mart_metrics',
+        'mart_metrics_daily', 'mart_metrics_monthly',
         'fact_global_metrics', 'fact_sales_order', 'fact_sales_order_line',
         'fact_inventory', 'fact_purchase_order', 'fact_work_order',
         'fact_employee_quota', 'dim_customer', 'dim_product', 'dim_date',
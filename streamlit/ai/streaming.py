@@ -0,0 +1,88 @@
+"""
+Streaming
+=========
+Helpers for streamed LLM responses (stream=True on both provider APIs).
+
+- openai_text / anthropic_text: the text deltas of a stream, collecting the
+  usage metadata as it arrives
+- statement_end: where the first complete SQL statement of a partial
+  response ends, so SQL generation can close the stream there instead of
+  paying for trailing tokens
+
+Setting:
+    AI_STREAMING  - 0 waits for complete responses (default 1)
+"""
+
+import os
+import re
+from typing import Iterator, Optional
+
+STREAMING_ENABLED = os.getenv("AI_STREAMING", "1") != "0"
+
+# Tokens that matter when looking for the end of a statement
+_STATEMENT_TOKENS = re.compile(r"'(?:[^']|'')*'?|\"[^\"]*\"?|--[^\n]*|/\*.*?(?:\*/|$)|```|;", re.DOTALL)
+
+
+def statement_end(text: str) -> Optional[int]:
+    """
+    Position just after the first complete SQL statement in a partial response.
+
+    A statement is complete at a semicolon outside string literals, quoted
+    identifiers and comments, or at the fence closing a ```sql block.
+
+    Returns:
+        Index into text, or None if no statement is complete yet
+    """
+    fenced = text.lstrip().startswith('```')
+    fences = 0
+    for match in _STATEMENT_TOKENS.finditer(text):
+        token = match.group(0)
+        if token == ';':
+            return match.end()
+        if token == '```':
+            fences += 1
+            if fenced and fences == 2:
+                return match.end()
+    return None
+
+
+def openai_text(stream, usage: dict) -> Iterator[str]:
+    """
+    Text deltas of an OpenAI chat completion stream.
+
+    Args:
+        stream: Result of chat.completions.create(..., stream=True,
+                stream_options={"include_usage": True})
+        usage: Filled with the usage object of the final chunk, under 'usage'
+    """
+    for chunk in stream:
+        if getattr(chunk, 'usage', None) is not None:
+            usage['usage'] = chunk.usage
+        if chunk.choices:
+            text = chunk.choices[0].delta.content
+            if text:
+                yield text
+
+
+def anthropic_text(stream, usage: dict) -> Iterator[str]:
+    """
+    Text deltas of an Anthropic message stream.
+
+    Args:
+        stream: Result of messages.create(..., stream=True)
+        usage: Filled under 'usage' with the input usage of message_start,
+               updated with output_tokens from message_delta events
+    """
+    for event in stream:
+        if event.type == 'message_start':
+            start = event.message.usage
+            usage['usage'] = {
+                'input_tokens': getattr(start, 'input_tokens', 0) or 0,
+                'cache_read_input_tokens': getattr(start, 'cache_read_input_tokens', 0) or 0,
+                'cache_creation_input_tokens': getattr(start, 'cache_creation_input_tokens', 0) or 0,
+                'output_tokens': getattr(start, 'output_tokens', 0) or 0,
+            }
+        elif event.type == 'message_delta' and 'usage' in usage:
+            usage['usage']['output_tokens'] = getattr(event.usage, 'output_tokens', 0) or 0
+        elif event.type == 'content_block_delta' and getattr(event.delta, 'type', '') == 'text_delta':
+            yield event.delta.text
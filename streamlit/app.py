@@ -50,7 +50,7 @@ def get_db_connection():
         st.info("💡 Tip: If running locally, ensure PostgreSQL is running and accessible on localhost:5432")
         return None
 
-# Get report date (max sales transaction date)
+# Get report date (max sales transaction date, precomputed once per dbt run in dim_report_date)
 @st.cache_data(ttl=3600)  # Cache for 1 hour
 def get_report_date(_conn):
     """Get the maximum order date from sales transactions as the report date"""
@@ -58,7 +58,7 @@ def get_report_date(_conn):
         return None
     try:
         with _conn.cursor() as cur:
-            cur.execute("SELECT MAX(order_date) FROM mart_sales")
+            cur.execute("SELECT report_date FROM dim_report_date")
             result = cur.fetchone()
             return result[0] if result and result[0] else None
     except Exception:
@@ -28,6 +28,10 @@ except ImportError:
 
 from pages.utils import format_dataframe
 
+# How the retry loop checks generated SQL: "execute" (run once, reuse the result)
+# or "explain" (plan only, then run the final query once)
+AI_SQL_PROBE = os.getenv("AI_SQL_PROBE", "execute")
+
 # Import AI modules
 AI_AVAILABLE = False
 AI_IMPORT_ERROR = ""
@@ -36,11 +40,22 @@ try:
     from ai.sql_generator import SQLGenerator
     from ai.visualizer import ResultVisualizer
     from ai.sql_validator import SQLValidator
+    from ai.pipeline import TaskGraph, StageTimer
     AI_AVAILABLE = True
 except ImportError as e:
     AI_IMPORT_ERROR = str(e)
 
 
+@st.cache_data(ttl=3600, max_entries=20)  # One CSV per answer, reused by reruns
+def csv_export(sql: str, timestamp: float, _df: pd.DataFrame) -> str:
+    """
+    CSV of a query result. The dataframe itself is not hashed: the key is the
+    SQL plus the answer's timestamp, so a later answer to the same SQL (new
+    data, another sample) gets its own CSV.
+    """
+    return _df.to_csv(index=False)
+
+
 def render(conn):
     """Render the AI Analytics Assistant page."""
     
@@ -116,6 +131,35 @@ def render(conn):
                     st.success(f"✓ {api_provider.split()[0]} API key saved!")
                     st.rerun()
         
+        # Query cache statistics (shared across sessions)
+        if 'sql_generator' in st.session_state:
+            cache_stats = st.session_state.sql_generator.query_cache.stats()
+            if cache_stats['total_hits'] + cache_stats['total_misses']:
+                st.caption(
+                    f"🗄️ SQL cache: {cache_stats['entries']} questions, "
+                    f"{cache_stats['total_hit_rate']:.0%} hit rate "
+                    f"({cache_stats['total_hits']} of {cache_stats['total_hits'] + cache_stats['total_misses']})"
+                )
+            
+            # Intent fast path: template SQL instead of the LLM (this session)
+            intent_stats = st.session_state.sql_generator.intent_parser.stats()
+            if intent_stats['questions']:
+                llm = (f" vs {intent_stats['avg_fallback_ms'] / 1000:,.1f} s via LLM"
+                       if intent_stats['hits'] < intent_stats['questions'] else "")
+                st.caption(
+                    f"🧭 Template SQL: {intent_stats['hit_rate']:.0%} of {intent_stats['questions']} questions, "
+                    f"{intent_stats['avg_hit_ms']:,.0f} ms{llm}"
+                )
+            
+            # Provider-side prompt caching of the schema prefix (this session)
+            usage = st.session_state.sql_generator.usage.summary()
+            if usage['calls']:
+                unmetered = f", {usage['unmetered_calls']} without usage" if usage['unmetered_calls'] else ""
+                st.caption(
+                    f"🧠 Prompt cache: {usage['cached_ratio']:.0%} of "
+                    f"{usage['input_tokens']:,} input tokens cached ({usage['calls']} LLM calls{unmetered})"
+                )
+        
         # Clear conversation button
         if st.button("🗑️ Clear Conversation", key="clear_conv"):
             if 'messages' in st.session_state:
@@ -167,6 +211,9 @@ def render(conn):
                 if "error" in message:
                     st.error(message["error"])
                 else:
+                    if message.get("rewrite"):
+                        st.info(f"⚡ {message['rewrite']}")
+                    
                     # Show SQL in expander
                     if message.get("sql"):
                         with st.expander("🔍 View SQL Query", expanded=False):
@@ -201,15 +248,18 @@ def render(conn):
                             hide_index=True
                         )
                         
-                        # Download button
-                        csv = df.to_csv(index=False)
+                        # Download button (CSV built once per answer, see csv_export)
+                        timestamp = message.get('timestamp', datetime.now().timestamp())
                         st.download_button(
                             label="📥 Download CSV",
-                            data=csv,
+                            data=csv_export(message["sql"], timestamp, df),
                             file_name=f"query_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                             mime="text/csv",
-                            key=f"download_{message.get('timestamp', datetime.now().timestamp())}"
+                            key=f"download_{timestamp}"
                         )
+                        
+                        if message.get("timings"):
+                            st.caption(f"⏱️ {message['timings']}")
     
     # Check for pending question from suggestion buttons
     if hasattr(st.session_state, 'pending_question'):
@@ -251,12 +301,23 @@ def process_question(conn, question: str):
             def update_status(attempt, message):
                 status_placeholder.info(message)
             
-            # Generate with retry (up to 3 attempts)
-            sql, is_valid, error, attempt_history = sql_generator.generate_with_retry(
+            # SQL query expander, filled as the SQL streams in
+            sql_slot = st.empty()
+            with sql_slot.container():
+                with st.expander("🔍 View SQL Query", expanded=False):
+                    sql_placeholder = st.empty()
+            
+            def show_sql(text):
+                sql_placeholder.code(text, language="sql")
+            
+            # Generate with retry (up to 3 attempts); the successful query's result is returned
+            sql, is_valid, error, attempt_history, df = sql_generator.generate_with_retry(
                 question, 
                 conn, 
                 max_retries=3,
-                status_callback=update_status
+                status_callback=update_status,
+                probe=AI_SQL_PROBE,
+                sql_callback=show_sql
             )
             
             # Clear status after completion
@@ -267,6 +328,8 @@ def process_question(conn, question: str):
                 with st.expander(f"🔄 Attempted {len(attempt_history)} approaches", expanded=False):
                     for record in attempt_history:
                         attempt_num = record['attempt']
+                        if record.get('candidate'):
+                            attempt_num = f"{attempt_num}, candidate {record['candidate']} ({record['variant']})"
                         if record['success']:
                             st.success(f"✅ Attempt {attempt_num}: Success")
                         else:
@@ -275,6 +338,7 @@ def process_question(conn, question: str):
                             st.code(record['sql'][:300] + "..." if len(record['sql']) > 300 else record['sql'], language="sql")
             
             if not is_valid:
+                sql_slot.empty()
                 error_msg = f"❌ {error}" if error else "Could not generate a valid SQL query after multiple attempts."
                 st.error(error_msg)
                 st.session_state.messages.append({
@@ -285,67 +349,103 @@ def process_question(conn, question: str):
                 })
                 return
             
-            # Show successful SQL
-            with st.expander("🔍 View SQL Query", expanded=False):
-                st.code(sql, language="sql")
+            # Tell the user when the cost guard rewrote the query (rollup, date filter, sample)
+            rewrite_note = attempt_history[-1].get('rewrite') if attempt_history else None
+            if rewrite_note:
+                st.info(f"⚡ {rewrite_note}")
+            if attempt_history and attempt_history[-1].get('cached'):
+                similar_to = attempt_history[-1].get('similar_to')
+                if similar_to:
+                    st.caption(f"⚡ SQL reused from a similar question: \"{similar_to}\" (no LLM call)")
+                else:
+                    st.caption("⚡ SQL from the query cache (no LLM call)")
+            elif attempt_history and attempt_history[-1].get('intent'):
+                st.caption(f"⚡ Template SQL for: {attempt_history[-1]['intent']} (no LLM call)")
             
-            # Execute final query (already validated in retry loop)
-            df = pd.read_sql(sql, conn)
+            # Show successful SQL (as run: the cost guard may have rewritten it)
+            show_sql(sql)
             
-            # Generate visualization
-            figure, chart_type = visualizer.analyze_and_visualize(df, question)
-            metric_cards = visualizer.create_metric_cards(df) if len(df) == 1 else None
+            # Reuse the result from the retry loop; only EXPLAIN-probed queries run here
+            if df is None:
+                df = pd.read_sql(sql, conn)
             
-            # Generate AI analysis of results
-            analysis = None
-            if len(df) > 0:
-                with st.spinner("🧠 Analyzing results..."):
-                    analysis = sql_generator.analyze_results(question, sql, df)
+            # Post-query work runs on worker threads (chart, cards, table)
+            # while the analysis streams in; each piece renders when it is ready
+            timer = StageTimer()
+            pipeline = TaskGraph(timer=timer)
+            pipeline.add("chart", lambda: visualizer.analyze_and_visualize(df, question))
+            if len(df) == 1:
+                pipeline.add("metric_cards", lambda: visualizer.create_metric_cards(df))
+            pipeline.add("table", lambda: format_dataframe(df.head(100)))
             
-            # Display AI analysis first
-            if analysis:
-                st.markdown("### 💡 Analysis")
-                st.markdown(analysis)
-                st.divider()
+            # Placeholders keep the layout order whatever finishes first
+            analysis_slot = st.container()
+            chart_slot = st.empty()
+            cards_slot = st.empty()
+            table_slot = st.empty()
+            download_slot = st.empty()
+            results = {}
+            timestamp = datetime.now().timestamp()
             
-            # Display visualization
-            if figure:
-                st.plotly_chart(figure, use_container_width=True)
+            def show(name, result):
+                results[name] = result
+                if name == "chart" and result[0]:
+                    chart_slot.plotly_chart(result[0], use_container_width=True)
+                elif name == "metric_cards" and result:
+                    with cards_slot.container():
+                        cols = st.columns(len(result))
+                        for i, card in enumerate(result):
+                            with cols[i]:
+                                st.metric(label=card["label"], value=card["value"])
+                elif name == "table":
+                    with table_slot.container():
+                        st.markdown(f"**Results:** {len(df):,} rows")
+                        st.dataframe(result, use_container_width=True, hide_index=True)
             
-            if metric_cards:
-                cols = st.columns(len(metric_cards))
-                for i, card in enumerate(metric_cards):
-                    with cols[i]:
-                        st.metric(label=card["label"], value=card["value"])
+            def analysis_chunks():
+                for chunk in sql_generator.stream_analysis(question, sql, df):
+                    yield chunk
+                    for name, result in pipeline.completed():
+                        show(name, result)
             
-            # Show data table
-            st.markdown(f"**Results:** {len(df):,} rows")
-            st.dataframe(
-                format_dataframe(df.head(100)),
-                use_container_width=True,
-                hide_index=True
-            )
+            pipeline.start()
             
-            # Download button
-            csv = df.to_csv(index=False)
-            timestamp = datetime.now().timestamp()
-            st.download_button(
+            # Stream the AI analysis of results into the message, shown first
+            analysis = None
+            if len(df) > 0:
+                with analysis_slot, timer.stage("analysis"):
+                    st.markdown("### 💡 Analysis")
+                    analysis = st.write_stream(analysis_chunks())
+                    st.divider()
+            
+            for name, result in pipeline.wait():
+                show(name, result)
+            
+            # Built after the rest, once per answer; history reruns reuse it
+            download_slot.download_button(
                 label="📥 Download CSV",
-                data=csv,
+                data=csv_export(sql, timestamp, df),
                 file_name=f"query_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                 mime="text/csv",
                 key=f"download_{timestamp}"
             )
             
+            figure, chart_type = results["chart"]
+            metric_cards = results.get("metric_cards")
+            timings = timer.format()
+            st.caption(f"⏱️ {timings}")
+            
             # Store in session state
             st.session_state.messages.append({
                 "role": "assistant",
                 "sql": sql,
+                "rewrite": rewrite_note,
                 "analysis": analysis,
                 "dataframe": df,
                 "figure": figure,
                 "chart_type": chart_type,
                 "metric_cards": metric_cards,
+                "timings": timings,
                 "timestamp": timestamp
             })
             
@@ -16,7 +16,7 @@ def render(conn):
     # Show report date note
     try:
         with conn.cursor() as cur:
-            cur.execute("SELECT MAX(order_date) FROM mart_sales")
+            cur.execute("SELECT report_date FROM dim_report_date")
             result = cur.fetchone()
             if result and result[0]:
                 st.info(f"📅 **Report Date:** All analyses are based on data up to {result[0].strftime('%B %d, %Y')} (most recent sales transaction date).")
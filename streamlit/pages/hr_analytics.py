@@ -16,7 +16,7 @@ def render(conn):
     # Show report date note
     try:
         with conn.cursor() as cur:
-            cur.execute("SELECT MAX(order_date) FROM mart_sales")
+            cur.execute("SELECT report_date FROM dim_report_date")
             result = cur.fetchone()
             if result and result[0]:
                 st.info(f"📅 **Report Date:** All analyses are based on data up to {result[0].strftime('%B %d, %Y')} (most recent sales transaction date).")
@@ -39,12 +39,12 @@ def render(conn):
                         jobtitle,
                         department_name,
                         territory_name,
-                        COUNT(DISTINCT performance_id) as employee_count,
+                        COUNT(*) as employee_count,
                         AVG(sales_year_to_date) as avg_sales_ytd,
                         AVG(quota_achievement_percent) as avg_quota_achievement,
-                        SUM(monthly_revenue) as total_revenue
-                    FROM mart_employee_territory_performance
-                    WHERE performance_type = 'employee'
+                        SUM(revenue) as total_revenue
+                    FROM fact_performance_monthly
+                    WHERE performance_type = 'employee' AND period_grain = 'all_time'
                     GROUP BY jobtitle, department_name, territory_name
                     ORDER BY total_revenue DESC
                 """)
@@ -102,8 +102,9 @@ def render(conn):
                         COUNT(CASE WHEN quota_status = 'Achieved' THEN 1 END) as achieved_count,
                         COUNT(CASE WHEN quota_status = 'Near Target' THEN 1 END) as near_target_count,
                         COUNT(CASE WHEN quota_status = 'Below Target' THEN 1 END) as below_target_count
-                    FROM mart_employee_territory_performance
-                    WHERE performance_type = 'employee' AND quota_achievement_percent IS NOT NULL
+                    FROM fact_performance_monthly
+                    WHERE performance_type = 'employee' AND period_grain = 'all_time'
+                        AND quota_achievement_percent IS NOT NULL
                     GROUP BY territory_name
                     ORDER BY avg_quota_achievement DESC
                 """)
@@ -119,8 +120,9 @@ def render(conn):
                             COUNT(CASE WHEN quota_status = 'Achieved' THEN 1 END) as achieved_count,
                             COUNT(CASE WHEN quota_status = 'Near Target' THEN 1 END) as near_target_count,
                             COUNT(CASE WHEN quota_status = 'Below Target' THEN 1 END) as below_target_count
-                        FROM mart_employee_territory_performance
-                        WHERE performance_type = 'employee' AND quota_achievement_percent IS NOT NULL
+                        FROM fact_performance_monthly
+                        WHERE performance_type = 'employee' AND period_grain = 'all_time'
+                            AND quota_achievement_percent IS NOT NULL
                         ORDER BY avg_quota_achievement DESC
                     """)
                     quota_data = pd.DataFrame(cur.fetchall(),
@@ -175,7 +177,8 @@ def render(conn):
                             COUNT(CASE WHEN quota_achievement_percent IS NOT NULL THEN 1 END) as has_quota_percent,
                             COUNT(CASE WHEN quota_status IS NOT NULL THEN 1 END) as has_quota_status,
                             COUNT(CASE WHEN territory_name IS NOT NULL THEN 1 END) as has_territory
-                        FROM mart_employee_territory_performance
+                        FROM fact_performance_monthly
+                        WHERE period_grain = 'all_time'
                     """)
                     diag = cur.fetchone()
                     st.warning(f"**Data Availability:** Total records: {diag[0]}, Employee records: {diag[1]}, Has quota_achievement_percent: {diag[2]}, Has quota_status: {diag[3]}, Has territory: {diag[4]}")
@@ -194,9 +197,10 @@ def render(conn):
                         AVG(current_pay_rate) as avg_pay_rate,
                         AVG(sales_year_to_date) as avg_sales_ytd,
                         AVG(years_of_service) as avg_years_service,
-                        COUNT(DISTINCT performance_id) as employee_count
-                    FROM mart_employee_territory_performance
-                    WHERE performance_type = 'employee' AND current_pay_rate IS NOT NULL
+                        COUNT(*) as employee_count
+                    FROM fact_performance_monthly
+                    WHERE performance_type = 'employee' AND period_grain = 'all_time'
+                        AND current_pay_rate IS NOT NULL
                     GROUP BY department_name, jobtitle
                     ORDER BY avg_pay_rate DESC
                 """)
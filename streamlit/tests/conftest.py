@@ -0,0 +1,8 @@
+"""Make the ai package importable as in the app (streamlit/ is the working directory)."""
+
+import os
+import sys
+
+STREAMLIT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if STREAMLIT_DIR not in sys.path:
+    sys.path.insert(0, STREAMLIT_DIR)
@@ -0,0 +1,122 @@
+"""
+Intent Parser Tests
+===================
+Template SQL for common question shapes, and the questions that must fall
+back to the LLM. The metric catalog and the dimension values are served by
+a fake connection; no database is needed.
+
+Run from streamlit/:
+    python -m pytest tests
+"""
+
+import pandas as pd
+import pytest
+
+from ai import intent_parser
+from ai.intent_parser import IntentParser
+
+METRICS = pd.DataFrame([
+    {'metric_key': 'SO_REVENUE', 'metric_name': 'Sales Order Revenue', 'metric_unit': 'USD'},
+    {'metric_key': 'SO_FREIGHT', 'metric_name': 'Sales Order Freight', 'metric_unit': 'USD'},
+])
+
+VALUES = {
+    'dim_territory': ['Northwest', 'Southwest', 'Canada', 'France'],
+    'dim_product': ['Bikes', 'Accessories', 'Clothing', 'Components'],
+}
+
+
+class FakeSchemaContext:
+    conn = None
+
+    def get_metrics_catalog(self):
+        return METRICS
+
+
+def fake_read_sql(query, conn):
+    for table, names in VALUES.items():
+        if table in query:
+            return pd.DataFrame({'name': names})
+    raise RuntimeError(f"unexpected query: {query}")
+
+
+@pytest.fixture
+def parser(monkeypatch):
+    monkeypatch.setattr(intent_parser.pd, 'read_sql', fake_read_sql)
+    return IntentParser(FakeSchemaContext())
+
+
+def sql_of(parser, question):
+    result = parser.parse(question)
+    assert result is not None
+    assert result['confidence'] == 1.0
+    return " ".join(result['sql'].split())
+
+
+def test_total_by_dimension(parser):
+    sql = sql_of(parser, "What is our total revenue by territory?")
+    assert "SUM(net_line_amount) AS revenue" in sql
+    assert "GROUP BY territory_name" in sql
+
+
+def test_top_n_by_dimension(parser):
+    sql = sql_of(parser, "Top 5 territories by profit in 2013")
+    assert "order_year = 2013" in sql
+    assert sql.endswith("ORDER BY profit DESC LIMIT 5")
+
+
+def test_values_of_one_column_use_in(parser):
+    sql = sql_of(parser, "Revenue for Northwest and Canada")
+    assert "territory_name IN ('Northwest', 'Canada')" in sql
+    assert "territory_name = " not in sql
+
+
+def test_values_of_different_columns_use_and(parser):
+    sql = sql_of(parser, "Units sold for Bikes in Canada")
+    assert "category_name = 'Bikes'" in sql
+    assert "territory_name = 'Canada'" in sql
+
+
+def test_listed_years_use_in(parser):
+    sql = sql_of(parser, "Revenue in 2012, 2013 and 2014")
+    assert "order_year IN (2012, 2013, 2014)" in sql
+    assert "BETWEEN" not in sql
+
+
+@pytest.mark.parametrize("question", [
+    "Revenue between 2012 and 2013",
+    "Revenue from 2012 to 2013",
+])
+def test_year_range(parser, question):
+    assert "order_year BETWEEN 2012 AND 2013" in sql_of(parser, question)
+
+
+def test_since_year(parser):
+    assert "order_year >= 2012" in sql_of(parser, "Revenue and orders by year since 2012")
+
+
+def test_listed_years_on_date_keys(parser):
+    sql = sql_of(parser, "Daily sales order freight in 2013 and 2014")
+    assert "FROM mart_metrics_daily m" in sql
+    assert "(m.date_key BETWEEN 20130101 AND 20131231 OR m.date_key BETWEEN 20140101 AND 20141231)" in sql
+
+
+def test_metric_from_catalog(parser):
+    sql = sql_of(parser, "Sales Order Revenue by month in Northwest")
+    assert "m.metric_key = 'SO_REVENUE'" in sql
+    assert "dt.territory_name = 'Northwest'" in sql
+
+
+@pytest.mark.parametrize("question", [
+    "Revenue by year for the top 5 territories",   # top N of territory-year rows, not territories
+    "Revenue since 2012 and 2014",                 # a year no rule uses
+    "What is the average revenue by territory?",   # unmodelled modifier
+    "Revenue by territory excluding 2014",
+])
+def test_falls_back_to_llm(parser, question):
+    result = parser.parse(question)
+    assert result is None or result['confidence'] < parser.min_confidence
+
+
+def test_no_known_measure(parser):
+    assert parser.parse("Show me employee quota achievement rates") is None